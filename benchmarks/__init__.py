@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""route-ctl benchmarks.
+
+Run a benchmark from the repository root, e.g.::
+
+    $ python -m benchmarks.bench_parser
+
+or the whole suite, see ``benchmarks.suite``::
+
+    $ python -m benchmarks.suite -o results.json
+
+"""
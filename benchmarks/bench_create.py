@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the batch-insert (``create_items``) path."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from route_ctl.manager import RouteManager
+
+from .generator import generate_route_file, generate_routes
+
+
+def linear_exists(mgr, item, items):
+    """The previous linear-scan conflict check, for comparison."""
+    return (any(mgr._find_same(item, items, keys=('name',))) or
+            any(mgr._find_same(item, items, keys=('network', 'netmask'))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--routes', type=int, default=20000,
+                        help='routes in the file')
+    parser.add_argument('-m', '--new', type=int, default=500,
+                        help='routes to insert (half of them conflicting)')
+    args = parser.parse_args()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, 'routes.pp')
+        with open(filename, 'w') as route_file:
+            route_file.write(generate_route_file(args.routes))
+        first = args.routes - args.new // 2
+        new_items = list(generate_routes(first + args.new))[first:]
+        mgr = RouteManager(filename)
+        current = list(mgr.parse())
+
+        def linear():
+            items = list(current)
+            for item in new_items:
+                if not linear_exists(mgr, item, items):
+                    items.append(item)
+
+        def create_items():
+            shutil.copy(filename + '.orig', filename)
+            RouteManager(filename).create_items(items=list(new_items))
+
+        def create_items_splice():
+            shutil.copy(filename + '.orig', filename)
+            RouteManager(filename, splice=True).create_items(
+                items=list(new_items))
+
+        shutil.copy(filename, filename + '.orig')
+        print('routes: {0}, inserted: {1}'.format(args.routes, args.new))
+        print('linear checks:         {0:7.3f} s'.format(
+            min(timeit.repeat(linear, number=1, repeat=1))))
+        print('create_items (total):  {0:7.3f} s'.format(
+            min(timeit.repeat(create_items, number=1, repeat=3))))
+        print('create_items (splice): {0:7.3f} s'.format(
+            min(timeit.repeat(create_items_splice, number=1, repeat=3))))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Benchmark fleet mode queries over many route files by worker count."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from route_ctl.fleet import cpu_count, expand, query
+
+from .generator import generate_route_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--files', type=int, default=2000,
+                        help='route files')
+    parser.add_argument('-m', '--routes', type=int, default=50,
+                        help='routes per file')
+    parser.add_argument('-j', '--max-jobs', type=int, default=cpu_count(),
+                        help='largest worker count (default: CPUs)')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        text = generate_route_file(args.routes)
+        for number in range(args.files):
+            filename = os.path.join(tmp_dir, 'host-{0:06d}.pp'.format(number))
+            with open(filename, 'w') as route_file:
+                route_file.write(text)
+        filenames = expand(tmp_dir)
+        params = {'key': 'gateway', 'value': '10.0.1.1'}
+        print('files: {0}, routes per file: {1}'.format(
+            args.files, args.routes))
+        jobs = 1
+        baseline = None
+        while True:
+            def run(jobs=jobs):
+                for _ in query(filenames, 'find', params, jobs=jobs):
+                    pass
+            best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+            baseline = baseline or best
+            print('jobs: {0:3d} {1:8.3f} s {2:10.0f} files/s  x{3:.2f}'.format(
+                jobs, best, args.files / best, baseline / best))
+            if jobs >= args.max_jobs:
+                break
+            jobs = min(jobs * 2, args.max_jobs)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
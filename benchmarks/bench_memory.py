@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Compare memory held by parsed entries: dicts vs compact records."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import gc
+import tracemalloc
+
+from route_ctl.parser import RouteParser
+from route_ctl.record import RouteRecord
+
+from .generator import generate_route_file
+
+
+def held(lines, **parser_kwargs):
+    """Return bytes still allocated while all parsed entries are kept."""
+    gc.collect()
+    tracemalloc.start()
+    routes = list(RouteParser(lines, **parser_kwargs).parse())
+    gc.collect()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del routes
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--routes', type=int, default=100000)
+    args = parser.parse_args()
+    lines = generate_route_file(args.routes).splitlines(True)
+    results = [
+        ('dict', held(lines)),
+        ('dict (interned)', held(lines, intern_values=True)),
+        ('RouteRecord (interned)',
+         held(lines, record=RouteRecord, intern_values=True)),
+    ]
+    baseline = results[0][1]
+    print('routes: {0}'.format(args.routes))
+    for label, size in results:
+        print('{0:24} {1:10.1f} MiB {2:6.1%}'.format(
+            label, size / 2.0 ** 20, size / float(baseline)))
+
+
+if __name__ == '__main__':
+    main()
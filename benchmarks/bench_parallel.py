@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Benchmark chunked parallel parsing of a single route file by job count."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from route_ctl.fleet import cpu_count
+from route_ctl.parser import RouteParser
+
+from .generator import generate_route_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--routes', type=int, default=200000,
+                        help='routes in the file')
+    parser.add_argument('-j', '--max-jobs', type=int, default=cpu_count(),
+                        help='largest job count (default: CPUs)')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, 'routes.pp')
+        with open(filename, 'w') as route_file:
+            route_file.write(generate_route_file(args.routes))
+        print('routes: {0}, size: {1:.1f} MiB'.format(
+            args.routes, os.path.getsize(filename) / float(1 << 20)))
+
+        def sequential():
+            for _ in RouteParser(use_mmap=True).parse(filename):
+                pass
+
+        baseline = min(timeit.repeat(sequential, number=1, repeat=args.repeat))
+        print('sequential (mmap): {0:8.3f} s'.format(baseline))
+        jobs = 1
+        while True:
+            def chunked(jobs=jobs):
+                for _ in RouteParser(jobs=jobs).iter_chunks(filename):
+                    pass
+            best = min(timeit.repeat(chunked, number=1, repeat=args.repeat))
+            print('jobs: {0:3d}         {1:8.3f} s  x{2:.2f}'.format(
+                jobs, best, baseline / best))
+            if jobs >= args.max_jobs:
+                break
+            jobs = min(jobs * 2, args.max_jobs)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
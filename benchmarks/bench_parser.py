@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Compare route parser engines in lines per second."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from route_ctl.parser import RouteParser
+
+from .generator import generate_route_file
+
+
+def bench(text, repeat, **parser_kwargs):
+    """Return the best lines per second rate of ``repeat`` runs."""
+    lines = text.splitlines(True)
+
+    def run():
+        for _ in RouteParser(lines, **parser_kwargs).parse():
+            pass
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return len(lines) / best
+
+
+def bench_file(text, repeat, **parser_kwargs):
+    """Return the best lines per second rate parsing ``text`` from a file."""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, 'routes.pp')
+        with open(filename, 'w') as route_file:
+            route_file.write(text)
+
+        def run():
+            parser = RouteParser(filename=filename, **parser_kwargs)
+            for _ in parser.parse():
+                pass
+
+        best = min(timeit.repeat(run, number=1, repeat=repeat))
+    finally:
+        shutil.rmtree(tmp_dir)
+    return text.count('\n') / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--routes', type=int, default=20000)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+    text = generate_route_file(args.routes)
+    legacy = bench(text, args.repeat, block_line=None)
+    classifier = bench(text, args.repeat)
+    text_file = bench_file(text, args.repeat)
+    mapped_file = bench_file(text, args.repeat, use_mmap=True)
+    print('routes:     {0}'.format(args.routes))
+    print('legacy:     {0:12.0f} lines/s'.format(legacy))
+    print('classifier: {0:12.0f} lines/s'.format(classifier))
+    print('speedup:    {0:12.2f}x'.format(classifier / legacy))
+    print('text file:  {0:12.0f} lines/s'.format(text_file))
+    print('mmap file:  {0:12.0f} lines/s'.format(mapped_file))
+
+
+if __name__ == '__main__':
+    main()
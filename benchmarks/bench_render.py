@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Compare rendering entries with ``RouteFormatter.format`` and compiled
+templates.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import timeit
+
+from route_ctl.builder import TEMPLATE, RouteBuilder, RouteFormatter
+
+from .generator import generate_routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--routes', type=int, default=100000,
+                        help='routes to render')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+    items = list(generate_routes(args.routes))
+    formatter = RouteFormatter()
+    builder = RouteBuilder()
+
+    def generic():
+        for item in items:
+            formatter.format(TEMPLATE, **item)
+
+    def compiled():
+        for item in items:
+            builder.render(item)
+
+    print('routes: {0}'.format(args.routes))
+    for name, run in (('format', generic), ('compiled', compiled)):
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print('{0:10} {1:8.3f} s {2:12.0f} routes/s'.format(
+            name, best, args.routes / best))
+
+
+if __name__ == '__main__':
+    main()
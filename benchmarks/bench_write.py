@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Compare the previous ``writelines`` output path with ``BulkWriter``."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import timeit
+
+from route_ctl.builder import FOOTER, HEADER, RouteBuilder
+from route_ctl.writer import DURABILITY, BulkWriter
+
+from .generator import generate_routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--routes', type=int, default=100000,
+                        help='routes to write')
+    parser.add_argument('-b', '--buffer-size', type=int, default=1 << 20)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+    builder = RouteBuilder()
+    chunks = [HEADER] + [builder.render(item)
+                         for item in generate_routes(args.routes)] + [FOOTER]
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, 'routes.pp')
+
+        def writelines():
+            with io.open(filename, 'w', encoding='utf-8') as dest_file:
+                for lines in chunks:
+                    dest_file.writelines(lines)
+
+        def bulk(durability):
+            fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+            with BulkWriter(fd, filename, args.buffer_size,
+                            durability) as writer:
+                writer.writelines(chunks)
+            return writer
+
+        size = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+        print('routes: {0}, size: {1:.1f} MiB'.format(
+            args.routes, size / float(1 << 20)))
+        best = min(timeit.repeat(writelines, number=1, repeat=args.repeat))
+        print('{0:28} {1:8.3f} s'.format('writelines (previous)', best))
+        for durability in DURABILITY:
+            best = min(timeit.repeat(lambda: bulk(durability), number=1,
+                                     repeat=args.repeat))
+            print('{0:28} {1:8.3f} s  ({2} writes)'.format(
+                'bulk ' + durability, best, bulk(durability).writes))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
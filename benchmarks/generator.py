@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Deterministic synthetic route file generator.
+
+Plain files are rendered exactly like ``route-ctl`` writes them. Mixed files
+look like hand-edited ones: full-line and trailing comments, commented-out
+keys, ``$variable`` values and both quote styles. The same entries can be
+written as a JSON input file.
+
+Generate files from the repository root, e.g.::
+
+    $ python -m benchmarks.generator -n 1000000 --mixed -o routes.pp \\
+        --json routes.json
+
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import io
+import json
+
+from route_ctl.builder import FOOTER, HEADER, TEMPLATE, RouteFormatter
+
+# NOTE: route file sizes the benchmarks are run at
+SIZES = (1000, 10000, 100000, 1000000)
+
+VARIABLE = '$uplink'
+
+# NOTE: every n-th entry of a mixed file gets the feature
+VARIABLE_EVERY = 5
+
+COMMENT_EVERY = 10
+
+DOUBLE_QUOTE_EVERY = 2
+
+MIXED_HEADER = '''\
+# Routes of a synthetic host, generated by benchmarks.generator
+class netroutes::routes {  # managed by route-ctl
+'''
+
+MIXED_FOOTER = '''\
+}  # end of routes
+'''
+
+KEYS = ('ensure', 'gateway', 'interface', 'netmask', 'network', 'options')
+
+
+def generate_routes(count, variables=False):
+    """Generate ``count`` unique route entries.
+
+    With ``variables`` every ``VARIABLE_EVERY``-th entry has a ``$variable``
+    interface, as in mixed route files.
+    """
+    for index in range(count):
+        third, fourth = divmod(index, 256)
+        second, third = divmod(third, 256)
+        network = '10.{0}.{1}.{2}'.format(second % 256, third, fourth)
+        if variables and not index % VARIABLE_EVERY:
+            interface = VARIABLE
+        else:
+            interface = 'eth{0}'.format(index % 2)
+        yield {
+            'name': '{0}/32'.format(network),
+            'ensure': 'present',
+            'gateway': '10.0.{0}.1'.format(index % 4),
+            'interface': interface,
+            'netmask': '255.255.255.255',
+            'network': network,
+            'options': 'table {0}'.format(100 + index % 8),
+        }
+
+
+def render_mixed(index, route):
+    """Render an entry of a mixed route file."""
+    quote = '"' if index % DOUBLE_QUOTE_EVERY else "'"
+    commented = not index % COMMENT_EVERY
+    lines = []
+    if commented:
+        lines.append('  # route {0}\n'.format(index))
+    lines.append('  network_route {{ {0}{1}{0}:{2}\n'.format(
+        quote, route['name'], '  # trailing comment' if commented else ''))
+    for key in KEYS:
+        value = route[key]
+        if not value.startswith('$'):
+            value = '{0}{1}{0}'.format(quote, value)
+        lines.append('    {0:<9} => {1},\n'.format(key, value))
+        if commented and key == 'gateway':
+            lines.append('    # gateway   => {0}10.0.9.1{0},\n'.format(quote))
+    lines.append('  }\n')
+    return ''.join(lines)
+
+
+def iter_route_file(count, mixed=False):
+    """Iterate over the chunks of a route file with ``count`` entries."""
+    if not mixed:
+        formatter = RouteFormatter()
+        yield HEADER
+        for route in generate_routes(count):
+            yield formatter.format(TEMPLATE, **route)
+        yield FOOTER
+        return
+    yield MIXED_HEADER
+    for index, route in enumerate(generate_routes(count, variables=True)):
+        yield render_mixed(index, route)
+    yield MIXED_FOOTER
+
+
+def generate_route_file(count, mixed=False):
+    """Render a route file with ``count`` entries into a string."""
+    return ''.join(iter_route_file(count, mixed))
+
+
+def write_route_file(filename, count, mixed=False):
+    """Write a route file with ``count`` entries."""
+    with io.open(filename, 'w', encoding='utf-8') as route_file:
+        for chunk in iter_route_file(count, mixed):
+            route_file.write(chunk)
+
+
+def write_json_file(filename, count, variables=False, key='routes'):
+    """Write ``count`` entries as a JSON input file (``{key: [...]}``)."""
+    with io.open(filename, 'w', encoding='utf-8') as json_file:
+        json_file.write('{{"{0}": [\n'.format(key))
+        for index, route in enumerate(generate_routes(count, variables)):
+            if index:
+                json_file.write(',\n')
+            json_file.write('{0}'.format(json.dumps(route, sort_keys=True)))
+        json_file.write('\n]}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic route file.')
+    parser.add_argument('-n', '--routes', type=int, default=SIZES[0],
+                        help='routes to generate (default: %(default)s)')
+    parser.add_argument('-m', '--mixed', action='store_true',
+                        help='comments, $variables and both quote styles')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='route file to write')
+    parser.add_argument('--json', metavar='FILE', dest='json_file',
+                        help='JSON input file of the same routes to write')
+    args = parser.parse_args()
+    if args.output is None and args.json_file is None:
+        parser.error('nothing to write: --output or --json is required')
+    if args.output is not None:
+        write_route_file(args.output, args.routes, args.mixed)
+    if args.json_file is not None:
+        write_json_file(args.json_file, args.routes, args.mixed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""Run the benchmark suite, save the results as JSON and flag regressions.
+
+Every case is timed at every route file size, the best and median of
+``--repeat`` runs are reported. Results of an earlier run given with
+``--baseline`` are compared case by case, a case slower by more than
+``--threshold`` is a regression and makes the run exit with status 1.
+
+Run the suite from the repository root, e.g.::
+
+    $ python -m benchmarks.suite -n 1000 100000 -o new.json -b old.json
+
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from collections import OrderedDict
+
+from route_ctl.backup import Backup
+from route_ctl.builder import RouteBuilder
+from route_ctl.fleet import cpu_count
+from route_ctl.manager import RouteManager
+from route_ctl.parser import RouteParser
+
+from .generator import SIZES, generate_routes, write_json_file, write_route_file
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def exhaust(items):
+    for _ in items:
+        pass
+
+
+class Fixture(object):
+    """Route file and JSON input of a given size in a temporary directory.
+
+    Writing cases restore the route file from a pristine copy before each
+    run (see ``restore``), outside of the timed code.
+    """
+
+    def __init__(self, directory, routes, mixed=True):
+        self.routes = routes
+        self.mixed = mixed
+        self.filename = os.path.join(directory, 'routes.pp')
+        self.original = os.path.join(directory, 'routes.pp.orig')
+        self.json_file = os.path.join(directory, 'routes.json')
+        self.changed_json_file = os.path.join(directory, 'changed.json')
+        write_route_file(self.original, routes, mixed)
+        write_json_file(self.json_file, routes, mixed)
+        self.items = list(generate_routes(routes, mixed))
+        self.changed = [dict(item) for item in self.items]
+        for item in self.changed[::100]:
+            item['gateway'] = '10.0.9.1'
+        with io.open(self.changed_json_file, 'w',
+                     encoding='utf-8') as json_file:
+            json_file.write('{0}'.format(json.dumps({'routes': self.changed})))
+        # NOTE: half of the new entries conflict with existing ones
+        first = max(0, routes - routes // 200)
+        self.new_items = list(generate_routes(first + routes // 100))[first:]
+        self.middle = self.items[routes // 2]
+        self.restore()
+
+    def restore(self):
+        shutil.copy(self.original, self.filename)
+
+    def manager(self, **kwargs):
+        return RouteManager(self.filename, backup=Backup('none'), **kwargs)
+
+    def cli(self, *args):
+        """Run ``route-ctl`` in a new interpreter, as a user would."""
+        command = [sys.executable, '-m', 'route_ctl'] + list(args)
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(command, stdout=devnull)
+
+
+# NOTE: cases return a ``(run, setup)`` pair of callables, ``setup`` (if
+# any) runs before each timed ``run``
+
+def parse_text(fixture):
+    return lambda: exhaust(RouteParser(filename=fixture.filename).parse()), None
+
+
+def parse_mmap(fixture):
+    return (lambda: exhaust(
+        RouteParser(filename=fixture.filename, use_mmap=True).parse()), None)
+
+
+def parse_fields(fixture):
+    return (lambda: exhaust(RouteParser(filename=fixture.filename).parse(
+        fields=('name', 'gateway'))), None)
+
+
+def find_exact(fixture):
+    value = fixture.middle['name']
+    return (lambda: exhaust(fixture.manager().iter_found(value, 'name')),
+            None)
+
+
+def find_ignore_case(fixture):
+    value = fixture.middle['name']
+    return (lambda: exhaust(
+        fixture.manager().iter_found(value, 'name', ignore_case=True)), None)
+
+
+def find_partial(fixture):
+    return (lambda: exhaust(fixture.manager().iter_found(
+        '10.0.1', 'gateway', exact_match=False)), None)
+
+
+def find_first(fixture):
+    return (lambda: exhaust(
+        fixture.manager().iter_found('eth1', 'interface', limit=1)), None)
+
+
+def find_query(fixture):
+    query = "interface=eth1 and gateway~'^10\\.0\\.1\\.'"
+    return lambda: exhaust(fixture.manager().iter_query(query)), None
+
+
+def find_contains(fixture):
+    address = fixture.middle['network']
+    return lambda: fixture.manager().find_covering(address), None
+
+
+def create_items(fixture):
+    return (lambda: fixture.manager().create_items(
+        items=list(fixture.new_items)), fixture.restore)
+
+
+def create_items_splice(fixture):
+    return (lambda: fixture.manager(splice=True).create_items(
+        items=list(fixture.new_items)), fixture.restore)
+
+
+def replace_unchanged(fixture):
+    # NOTE: mixed files are never rendered identically, restore them
+    return (lambda: fixture.manager().replace(items=list(fixture.items)),
+            fixture.restore)
+
+
+def replace_changed(fixture):
+    return (lambda: fixture.manager().replace(items=list(fixture.changed)),
+            fixture.restore)
+
+
+def write(fixture):
+    builder = RouteBuilder(fixture.filename, backup=Backup('none'))
+    return lambda: builder.write(fixture.items), fixture.restore
+
+
+def cli_find(fixture):
+    value = fixture.middle['name']
+    return lambda: fixture.cli('find', '-F', fixture.filename, value), None
+
+
+def cli_list(fixture):
+    return (lambda: fixture.cli('list', '-F', fixture.filename, '-f', 'csv'),
+            None)
+
+
+def cli_batch_replace(fixture):
+    return (lambda: fixture.cli('batch-replace', '-F', fixture.filename,
+                                '--backup', 'none', fixture.changed_json_file),
+            fixture.restore)
+
+
+CASES = OrderedDict((
+    ('parse.text', parse_text),
+    ('parse.mmap', parse_mmap),
+    ('parse.fields', parse_fields),
+    ('find.exact', find_exact),
+    ('find.ignore_case', find_ignore_case),
+    ('find.partial', find_partial),
+    ('find.first', find_first),
+    ('find.query', find_query),
+    ('find.contains', find_contains),
+    ('create_items', create_items),
+    ('create_items.splice', create_items_splice),
+    ('replace.unchanged', replace_unchanged),
+    ('replace.changed', replace_changed),
+    ('write', write),
+    ('cli.find', cli_find),
+    ('cli.list', cli_list),
+    ('cli.batch_replace', cli_batch_replace),
+))
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(case, fixture, repeat):
+    """Time a case, return its result record."""
+    run, setup = case(fixture)
+    times = timeit.repeat(run, setup=setup or (lambda: None), number=1,
+                          repeat=repeat)
+    best = min(times)
+    return OrderedDict((
+        ('best', best),
+        ('median', median(times)),
+        ('times', times),
+        ('routes_per_second', fixture.routes / best if best else None),
+    ))
+
+
+def run_suite(sizes, names, repeat, mixed=True, report=None):
+    """Run the cases at every size, return the results keyed by case and
+    size (``<case>@<routes>``).
+    """
+    results = OrderedDict()
+    for routes in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            fixture = Fixture(directory, routes, mixed)
+            for name in names:
+                key = '{0}@{1}'.format(name, routes)
+                results[key] = measure(CASES[name], fixture, repeat)
+                if report is not None:
+                    report(key, results[key])
+        finally:
+            shutil.rmtree(directory)
+    return results
+
+
+def environment():
+    """Describe where the suite ran, results are only comparable between
+    runs on the same machine and interpreter.
+    """
+    return OrderedDict((
+        ('date', time.strftime('%Y-%m-%dT%H:%M:%S%z')),
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('platform', platform.platform()),
+        ('machine', platform.machine()),
+        ('cpus', cpu_count()),
+    ))
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare best times to a baseline.
+
+    Returns ``(key, baseline, current, ratio, regressed)`` tuples of the
+    cases present in both, a case regressed if it is slower by more than
+    ``threshold`` (a fraction).
+    """
+    changes = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        old = baseline[key]['best']
+        new = result['best']
+        ratio = new / old if old else float('inf')
+        changes.append((key, old, new, ratio, ratio > 1.0 + threshold))
+    return changes
+
+
+def print_result(key, result):
+    print('{0:32} {1:10.4f} s {2:10.4f} s'.format(
+        key, result['best'], result['median']), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run the route-ctl benchmark suite.')
+    parser.add_argument('-n', '--routes', type=int, nargs='+',
+                        default=list(SIZES[:2]), metavar='N',
+                        help='route file sizes (default: %(default)s, up to '
+                             '{0})'.format(SIZES[-1]))
+    parser.add_argument('-k', '--case', dest='cases', action='append',
+                        metavar='PREFIX',
+                        help='run only cases starting with PREFIX '
+                             '(repeatable, one of: {0})'.format(
+                                 ', '.join(CASES)))
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--plain', dest='mixed', action='store_false',
+                        help='generate plain route files without comments, '
+                             '$variables and mixed quotes')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write JSON results to FILE (default: stdout)')
+    parser.add_argument('-b', '--baseline', metavar='FILE',
+                        help='JSON results of an earlier run to compare to')
+    parser.add_argument('-t', '--threshold', type=float,
+                        default=DEFAULT_THRESHOLD,
+                        help='slowdown flagged as a regression '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+    names = [name for name in CASES
+             if not args.cases or name.startswith(tuple(args.cases))]
+    if not names:
+        parser.error('no cases match: {0}'.format(', '.join(args.cases)))
+    baseline = None
+    if args.baseline is not None:
+        with io.open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+    print('{0:32} {1:>12} {2:>12}'.format('case', 'best', 'median'),
+          file=sys.stderr)
+    results = run_suite(args.routes, names, args.repeat, args.mixed,
+                        report=print_result)
+    document = OrderedDict((
+        ('environment', environment()),
+        ('repeat', args.repeat),
+        ('mixed', args.mixed),
+        ('results', results),
+    ))
+    text = json.dumps(document, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with io.open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write('{0}\n'.format(text))
+    if baseline is None:
+        return
+    changes = compare(results, baseline['results'], args.threshold)
+    regressions = [change for change in changes if change[4]]
+    print('\n{0:32} {1:>12} {2:>12} {3:>8}'.format(
+        'case', 'baseline', 'current', 'ratio'), file=sys.stderr)
+    for key, old, new, ratio, regressed in changes:
+        print('{0:32} {1:10.4f} s {2:10.4f} s {3:7.2f}x{4}'.format(
+            key, old, new, ratio, '  REGRESSION' if regressed else ''),
+            file=sys.stderr)
+    if regressions:
+        print('{0} of {1} cases regressed by more than {2:.0%}'.format(
+            len(regressions), len(changes), args.threshold), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,9 +5,21 @@ from __future__ import absolute_import, unicode_literals
 
 import json
 import logging
+import os
+import signal
+import socket
+import sys
 from gettext import translation
 
-from .manager import RouteManager
+from .backup import Backup
+from .cache import ParseCache
+from .client import RouteClient, RouteClientError
+from .encoders import encode
+from .fleet import FILE_KEY, FLEET_FIELDS, expand, is_fleet, query
+from .manager import InvalidOperation, RouteError, RouteManager, paginate
+from .query import Query
+from .server import NOT_SERVED, RouteServer
+from .writer import DEFAULT_BUFFER_SIZE
 
 # logging
 log = logging.getLogger(__name__)
@@ -15,18 +27,201 @@ log = logging.getLogger(__name__)
 # l18n
 _ = translation(__name__, 'locale', fallback=True).gettext
 
+# NOTE: writes forwarded to a daemon use the options of the daemon, so
+# they are only forwarded without any of these options set
+WRITE_DEFAULTS = {
+    'append': False,
+    'splice': False,
+    'backup': 'copy',
+    'keep_backups': None,
+    'backup_max_age': None,
+    'compress_backups': None,
+    'buffer_size': DEFAULT_BUFFER_SIZE,
+    'durability': 'none',
+    'lock_timeout': None,
+}
 
-def list_items(route_file, *args, **kwargs):
-    mgr = RouteManager(route_file)
-    result = mgr.list_items()
-    return json.dumps(result, indent=2)
 
+def _manager(route_file, use_mmap=False, cache=False, cache_dir=None,
+             input_format='json', append=False, splice=False,
+             backup='copy', keep_backups=None, backup_max_age=None,
+             compress_backups=None, jobs=None,
+             buffer_size=DEFAULT_BUFFER_SIZE, durability='none',
+             lock_timeout=None, *args, **kwargs):
+    """Create a route manager configured from command-line options."""
+    max_age = backup_max_age * 86400 if backup_max_age is not None else None
+    return RouteManager(route_file,
+                        use_mmap=use_mmap,
+                        cache=ParseCache(cache_dir) if cache else None,
+                        input_format=input_format,
+                        append=append,
+                        splice=splice,
+                        jobs=jobs,
+                        buffer_size=buffer_size,
+                        durability=durability,
+                        lock_timeout=lock_timeout,
+                        backup=Backup(backup, keep=keep_backups,
+                                      max_age=max_age,
+                                      compression=compress_backups))
 
-def find_items(route_file, key, value, ignore_case, exact_match, *args,
-               **kwargs):
-    mgr = RouteManager(route_file)
-    result = mgr.find_items(value, key, ignore_case, exact_match)
-    return json.dumps(result, indent=2)
+
+def _write_options(options):
+    """Return the names of write options differing from the defaults."""
+    return sorted(name for name, default in WRITE_DEFAULTS.items()
+                  if options.get(name, default) != default)
+
+
+def _client(socket_path):
+    """Connect to a running daemon, return ``None`` if there is none."""
+    if not socket_path:
+        return None
+    client = RouteClient(socket_path)
+    try:
+        client.connect()
+    except socket.error as err:
+        log.debug(_('daemon not available (%s), running locally'), err)
+        return None
+    return client
+
+
+def _file_params(route_file):
+    """Select the route file served by a daemon.
+
+    The path is made absolute, the daemon runs in another directory.
+    """
+    return {'file': os.path.abspath(route_file)} if route_file else {}
+
+
+def _remote(socket_path, route_file, method, **params):
+    """Call a method of a running daemon serving the route file.
+
+    Returns a ``(served, result)`` tuple, ``served`` is false if there is
+    no daemon or it does not serve the file, to run locally instead.
+    """
+    client = _client(socket_path)
+    if client is None:
+        return False, None
+    params.update(_file_params(route_file))
+    with client:
+        try:
+            return True, client.call(method, **params)
+        except RouteClientError as err:
+            if err.code != NOT_SERVED:
+                raise
+            log.debug(_('route file not served by the daemon (%s), '
+                        'running locally'), err)
+            return False, None
+
+
+def _fleet(route_file, method, params=None, use_mmap=False, cache=False,
+           cache_dir=None, jobs=None, lock_timeout=None, *args, **kwargs):
+    """Query all route files of a directory or glob pattern in parallel."""
+    filenames = expand(route_file)
+    if not filenames:
+        raise InvalidOperation(_('no route files found: %r') % (route_file,))
+    options = {
+        'use_mmap': use_mmap,
+        'cache': ParseCache(cache_dir) if cache else None,
+        'lock_timeout': lock_timeout,
+    }
+    return query(filenames, method, params, options, jobs)
+
+
+def _encode(items, out_file, output_format, fields=None):
+    """Write entries, only their ``fields`` if given."""
+    extra = {'fields': fields} if fields else {}
+    encode(items, out_file or sys.stdout, output_format, **extra)
+
+
+def _route_fields(fields, fleet=False):
+    """Return the ``fields`` to parse, without the ``file`` key only known
+    in fleet mode.
+    """
+    if fields is None or FILE_KEY not in fields:
+        return fields
+    if not fleet:
+        raise InvalidOperation(_(
+            'the %r field requires a directory or glob of route files') % (
+                FILE_KEY,))
+    return tuple(field for field in fields if field != FILE_KEY)
+
+
+def _encode_fleet(items, out_file, output_format, fields=None):
+    """Write entries tagged with their route file."""
+    if fields:
+        fields = (FILE_KEY,) + _route_fields(fields, fleet=True)
+    elif output_format == 'csv':
+        fields = FLEET_FIELDS
+    _encode(items, out_file, output_format, fields)
+
+
+def list_items(route_file, out_file=None, output_format='json',
+               socket_path=None, fields=None, *args, **kwargs):
+    if is_fleet(route_file):
+        items = _fleet(route_file, 'list',
+                       {'fields': _route_fields(fields, fleet=True)}, **kwargs)
+        return _encode_fleet(items, out_file, output_format, fields)
+    _route_fields(fields)
+    served, result = _remote(socket_path, route_file, 'list', fields=fields)
+    if served:
+        items = result['routes']
+    else:
+        items = _manager(route_file, **kwargs).iter_items(fields=fields)
+    _encode(items, out_file, output_format, fields)
+
+
+def find_items(route_file, key, value, ignore_case, exact_match,
+               contains=None, within=None, query=None, offset=0, limit=None,
+               out_file=None, output_format='json', socket_path=None,
+               fields=None, *args, **kwargs):
+    if query is not None:
+        # NOTE: fail early on invalid queries
+        query = Query(query, ignore_case)
+        log.debug(_('query plan: %s'), query)
+    if is_fleet(route_file):
+        if (value is None and contains is None and within is None and
+                query is None):
+            raise InvalidOperation(_('nothing to find: VALUE is required'))
+        params = {
+            'key': key,
+            'value': value,
+            'ignore_case': ignore_case,
+            'exact_match': exact_match,
+            'contains': contains,
+            'within': within,
+            'query': query.expression if query is not None else None,
+            # NOTE: no file contributes more than offset + limit entries
+            'limit': offset + limit if limit is not None else None,
+            'fields': _route_fields(fields, fleet=True),
+        }
+        items = _fleet(route_file, 'find', params, **kwargs)
+        return _encode_fleet(paginate(items, offset, limit), out_file,
+                             output_format, fields)
+    _route_fields(fields)
+    params = {}
+    if query is not None:
+        params['query'] = query.expression
+    served, result = _remote(
+        socket_path, route_file, 'find', key=key, value=value,
+        ignore_case=ignore_case, exact_match=exact_match, contains=contains,
+        within=within, offset=offset, limit=limit, fields=fields, **params)
+    if served:
+        _encode(result['routes'], out_file, output_format, fields)
+        return
+    mgr = _manager(route_file, **kwargs)
+    if query is not None:
+        items = mgr.iter_query(query, offset=offset, limit=limit,
+                               fields=fields)
+    elif contains is not None:
+        items = paginate(mgr.find_covering(contains)['routes'], offset, limit)
+    elif within is not None:
+        items = paginate(mgr.find_within(within)['routes'], offset, limit)
+    elif value is not None:
+        items = mgr.iter_found(value, key, ignore_case, exact_match,
+                               offset=offset, limit=limit, fields=fields)
+    else:
+        raise InvalidOperation(_('nothing to find: VALUE is required'))
+    _encode(items, out_file, output_format, fields)
 
 
 def validate_item(route_file,
@@ -50,29 +245,33 @@ def validate_item(route_file,
     }
     # Drop None values to prevent unnecessary validation
     route = dict(filter(lambda item: item[1] is not None, _route.items()))
-    mgr = RouteManager(route_file)
+    mgr = _manager(route_file, **kwargs)
     result = mgr.validate_item(route)
-    return json.dumps(result, indent=2)
+    return json.dumps(result, indent=2, default=dict)
 
 
 def batch_insert_items(route_file, source_file, *args, **kwargs):
-    mgr = RouteManager(route_file)
+    mgr = _manager(route_file, **kwargs)
     mgr.create_items(json_file=source_file)
 
 
 def batch_update_items(route_file, source_file, *args, **kwargs):
-    mgr = RouteManager(route_file)
+    mgr = _manager(route_file, **kwargs)
     mgr.update_items(json_file=source_file)
 
 
 def batch_validate_items(route_file, source_file, *args, **kwargs):
-    mgr = RouteManager(route_file)
+    mgr = _manager(route_file, **kwargs)
     result = mgr.validate_items(json_file=source_file)
-    return json.dumps(result, indent=2)
+    return json.dumps(result, indent=2, default=dict)
 
 
-def batch_replace_items(route_file, source_file, *args, **kwargs):
-    mgr = RouteManager(route_file)
+def batch_replace_items(route_file, source_file, plan=False, *args,
+                        **kwargs):
+    mgr = _manager(route_file, **kwargs)
+    if plan:
+        result = mgr.plan(json_file=source_file)
+        return json.dumps(result, indent=2, default=dict)
     mgr.replace(json_file=source_file)
 
 
@@ -97,7 +296,17 @@ def create_or_update_item(route_file,
     }
     # Drop None values
     route = dict(filter(lambda item: item[1] is not None, _route.items()))
-    mgr = RouteManager(route_file)
+    socket_path = kwargs.get('socket_path')
+    options = _write_options(kwargs)
+    if socket_path and options:
+        # NOTE: the daemon writes with its own options
+        log.debug(_('write options given (%s), not using the daemon'),
+                  ', '.join(options))
+        socket_path = None
+    served, _result = _remote(socket_path, route_file, 'create', item=route)
+    if served:
+        return
+    mgr = _manager(route_file, **kwargs)
     mgr.create_item(route)
 
 
@@ -122,11 +331,51 @@ def update_item(route_file,
     }
     # Drop None values
     route = dict(filter(lambda item: item[1] is not None, _route.items()))
-    mgr = RouteManager(route_file)
+    mgr = _manager(route_file, **kwargs)
     mgr.update_item(route)
 
 
 def delete_items(route_file, key, value, ignore_case, exact_match, *args,
                  **kwargs):
-    mgr = RouteManager(route_file)
+    mgr = _manager(route_file, **kwargs)
     mgr.delete_items(key, value, ignore_case, exact_match)
+
+
+def exec_operations(route_file, script_file, *args, **kwargs):
+    """Run a script of operations as a single transaction.
+
+    The script holds one JSON operation per line (see
+    ``Transaction.apply``), blank lines and lines starting with ``#`` are
+    skipped.
+    """
+    mgr = _manager(route_file, **kwargs)
+    with mgr.transaction() as tx:
+        for number, line in enumerate(script_file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                tx.apply(json.loads(line))
+            except (RouteError, ValueError, KeyError, TypeError) as err:
+                raise InvalidOperation(
+                    _('line %d: %s: %s') % (number, type(err).__name__, err))
+
+
+def serve(route_file, socket_path, route_files=(), *args, **kwargs):
+    """Serve route files over a Unix socket until terminated."""
+    filenames = ([route_file] if route_file else []) + list(route_files)
+    if not filenames:
+        raise InvalidOperation(_('no route files to serve'))
+    if not socket_path:
+        raise InvalidOperation(_('no socket to listen on: --socket is required'))
+    server = RouteServer(
+        socket_path, [_manager(filename, **kwargs) for filename in filenames])
+    # NOTE: exit cleanly (removing the socket) on SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    log.info(_('serving %d route files on %r'), len(filenames), socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
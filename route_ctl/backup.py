@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""route-ctl backup strategies, compression and retention."""
+
+from __future__ import absolute_import, unicode_literals, with_statement
+
+import errno
+import gzip
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from gettext import translation
+from logging import getLogger
+
+from .fsutil import clone_file
+
+try:
+    import zstandard
+except ImportError:
+    # NOTE: optional dependency
+    zstandard = None
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+
+class BackupError(Exception):
+    pass
+
+
+def _gzip_compress(src_file, dst):
+    with gzip.open(dst, 'wb') as dst_file:
+        shutil.copyfileobj(src_file, dst_file, 1 << 20)
+
+
+def _zstd_compress(src_file, dst):
+    with open(dst, 'wb') as dst_file:
+        zstandard.ZstdCompressor().copy_stream(src_file, dst_file)
+
+
+STRATEGIES = {
+    'copy': shutil.copy2,
+    'reflink': clone_file,
+    'hardlink': os.link,
+    'none': None,
+}
+
+COMPRESSORS = {
+    'gzip': ('.gz', _gzip_compress),
+    'zstd': ('.zst', _zstd_compress),
+}
+
+
+class Backup(object):
+    """Backup file policy of a route file.
+
+    Backups are named ``<file>.<stamp>.backup`` and made with one of the
+    ``STRATEGIES``:
+
+    ``copy``
+        a full copy (the default);
+    ``reflink``
+        a copy sharing the data with the original where the file system
+        supports it, a kernel-side copy otherwise;
+    ``hardlink``
+        a hard link to the original, which keeps the old content once the
+        original is replaced by a rename;
+    ``none``
+        no backups.
+
+    Backups are optionally compressed in a background thread and pruned to
+    the ``keep`` most recent ones and to those younger than ``max_age``
+    seconds, once compressed.
+    """
+
+    def __init__(self, strategy='copy', keep=None, max_age=None,
+                 compression=None, stamp='%F_%H%M%S'):
+        if strategy not in STRATEGIES:
+            raise BackupError(_('unknown backup strategy: %r') % (strategy,))
+        if compression is not None and compression not in COMPRESSORS:
+            raise BackupError(
+                _('unknown backup compression: %r') % (compression,))
+        if compression == 'zstd' and zstandard is None:
+            raise BackupError(
+                _('zstd compression requires the zstandard package'))
+        self.strategy = strategy
+        self.keep = keep
+        self.max_age = max_age
+        self.compression = compression
+        self.stamp = stamp
+        self.__threads = []
+        # NOTE: held while a backup is renamed to its compressed path and
+        # while pruning, so no backup is ever listed under both paths
+        self.__lock = threading.Lock()
+        self.__log = getLogger(__name__)
+
+    def path(self, filename):
+        """Return the backup file path of a file for the current time."""
+        tstamp = datetime.now().strftime(self.stamp)
+        return '{0}.{1}.backup'.format(filename, tstamp)
+
+    def create(self, filename, replaced=True):
+        """Back up a file before it is written.
+
+        ``replaced`` tells that the file is going to be replaced by a rename
+        rather than modified in place; otherwise hard links fall back to
+        copies. Returns the backup file path or ``None``.
+        """
+        if self.strategy == 'none':
+            self.prune(filename)
+            return None
+        dfn = self.path(filename)
+        copy = STRATEGIES[self.strategy]
+        if self.strategy == 'hardlink':
+            if not replaced:
+                copy = shutil.copy2
+            elif os.path.lexists(dfn):
+                os.unlink(dfn)
+        self.__log.debug(_('creating backup file (original: %r, backup: %r)'),
+                         filename, dfn)
+        try:
+            copy(filename, dfn)
+        except OSError as err:
+            if copy is not os.link:
+                raise
+            self.__log.warning(_('unable to hard link backup (%s), copying'),
+                               err)
+            shutil.copy2(filename, dfn)
+        if self.compression is not None:
+            # NOTE: pruned once compressed, finished threads are dropped
+            self.__threads = [thread for thread in self.__threads
+                              if thread.is_alive()]
+            thread = threading.Thread(target=self.__compress_and_prune,
+                                      args=(dfn, filename))
+            thread.start()
+            self.__threads.append(thread)
+        else:
+            self.prune(filename)
+        return dfn
+
+    def __compress_and_prune(self, path, filename):
+        self.compress(path)
+        self.prune(filename)
+
+    def compress(self, path):
+        """Replace a backup file with its compressed counterpart."""
+        suffix, compressor = COMPRESSORS[self.compression]
+        tmp_path = '{0}{1}.tmp'.format(path, suffix)
+        try:
+            with open(path, 'rb') as src_file:
+                compressor(src_file, tmp_path)
+            shutil.copystat(path, tmp_path)
+            with self.__lock:
+                os.rename(tmp_path, path + suffix)
+                os.unlink(path)
+        except (IOError, OSError) as err:
+            self.__log.warning(_('unable to compress backup %r: %s'), path, err)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return None
+        self.__log.debug(_('compressed backup file: %r'), path + suffix)
+        return path + suffix
+
+    def wait(self):
+        """Wait for background compression to finish."""
+        while self.__threads:
+            self.__threads.pop().join()
+
+    def backups(self, filename):
+        """Return the backup files of a file, most recent first.
+
+        Only backups with a stamp without dots are recognized.
+        """
+        dirname, basename = os.path.split(os.path.abspath(filename))
+        pattern = re.compile(r'{0}\.[^.]+\.backup(\.gz|\.zst)?$'.format(
+            re.escape(basename)))
+        found = []
+        for name in os.listdir(dirname):
+            if pattern.match(name):
+                path = os.path.join(dirname, name)
+                try:
+                    # NOTE: ctime is the time of the backup, the mtime is
+                    # that of the original file
+                    found.append((os.lstat(path).st_ctime, path))
+                except OSError:
+                    continue
+        return [path for _ctime, path in sorted(found, reverse=True)]
+
+    def prune(self, filename, now=None):
+        """Remove backups over the ``keep`` count or ``max_age`` age.
+
+        Returns the removed backup file paths.
+        """
+        if self.keep is None and self.max_age is None:
+            return []
+        now = time.time() if now is None else now
+        removed = []
+        with self.__lock:
+            for number, path in enumerate(self.backups(filename)):
+                try:
+                    age = now - os.lstat(path).st_ctime
+                    if ((self.keep is not None and number >= self.keep) or
+                            (self.max_age is not None and age > self.max_age)):
+                        os.unlink(path)
+                        removed.append(path)
+                except OSError as err:
+                    if err.errno != errno.ENOENT:
+                        raise
+        if removed:
+            self.__log.info(_('removed %d old backup files'), len(removed))
+        return removed
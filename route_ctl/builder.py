@@ -3,13 +3,26 @@
 
 from __future__ import absolute_import, unicode_literals, with_statement
 
-import shutil
+import errno
+import hashlib
+import os
+import re
 import string
-import tempfile
+from collections import defaultdict, deque
 from gettext import translation
-from datetime import datetime
 from logging import getLogger
 
+from .backup import Backup
+from .fsutil import (
+    atomic_tempfile,
+    copy_range,
+    file_digest,
+    fsync_dir,
+    replace_file,
+)
+from .lock import lock_exclusive
+from .writer import DEFAULT_BUFFER_SIZE, DURABILITY, BulkWriter
+
 try:
     unicode
     basestring
@@ -44,6 +57,66 @@ FOOTER = '''\
 '''
 
 
+class SpliceWriter(object):
+    """Output file writer mixing byte ranges of a source file and new data.
+
+    Adjacent source ranges are merged and copied with a single
+    ``copy_range`` call, ``ranges`` counts the calls.
+    """
+
+    def __init__(self, src, dst):
+        self.__src = src
+        self.__dst = dst
+        self.__pending = None
+        self.copied = 0
+        self.written = 0
+        self.ranges = 0
+
+    def copy(self, start, stop):
+        """Copy the ``[start, stop)`` byte range of the source file."""
+        if start >= stop:
+            return
+        if self.__pending is not None and self.__pending[1] == start:
+            self.__pending[1] = stop
+            return
+        self.flush()
+        self.__pending = [start, stop]
+
+    def write(self, data):
+        """Write new data."""
+        self.flush()
+        written = 0
+        while written < len(data):
+            written += os.write(self.__dst, data[written:])
+        self.written += written
+
+    def flush(self):
+        """Copy the pending source range."""
+        if self.__pending is not None:
+            start, stop = self.__pending
+            self.__pending = None
+            copy_range(self.__src, self.__dst, start, stop - start)
+            self.copied += stop - start
+            self.ranges += 1
+
+
+def _read_range(fd, start, stop):
+    """Read the ``[start, stop)`` byte range of a file."""
+    os.lseek(fd, start, os.SEEK_SET)
+    chunks = []
+    remaining = stop - start
+    while remaining > 0:
+        chunk = os.read(fd, remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+FIELD_NAME = re.compile(r'[A-Za-z_]\w*$')
+
+
 class RouteFormatter(string.Formatter):
     """Silently skips missing values by inserting empty strings and formats
     literals prefixed by a token.
@@ -73,6 +146,58 @@ class RouteFormatter(string.Formatter):
             value = self.missing
         return super(RouteFormatter, self).format_field(value, format_spec)
 
+    def __overrides(self, name):
+        """Check if a subclass overrides a formatting hook."""
+        method = getattr(type(self), name)
+        base = getattr(RouteFormatter, name)
+        return getattr(method, '__func__', method) is not \
+            getattr(base, '__func__', base)
+
+    def compile(self, template):
+        """Parse a template once, return a function rendering an entry.
+
+        ``compile(template)(item)`` gives the same output as
+        ``format(template, **item)``. Templates with positional, nested,
+        attribute or index fields and subclasses overriding the field hooks
+        fall back to ``format``.
+        """
+        def fallback(item):
+            return self.format(template, **item)
+
+        if any(self.__overrides(name) for name in
+               ('get_value', 'get_field', 'convert_field', 'format_field')):
+            return fallback
+        slots = []
+        for literal, name, spec, conversion in self.parse(template):
+            if name is not None and (not FIELD_NAME.match(name) or
+                                     '{' in spec):
+                return fallback
+            slots.append((literal, name, spec, conversion))
+        missing = self.missing
+        var = self.var
+        convert = self.convert_field
+
+        def render(item):
+            get = item.get
+            chunks = []
+            append = chunks.append
+            for literal, name, spec, conversion in slots:
+                if literal:
+                    append(literal)
+                if name is None:
+                    continue
+                value = get(name)
+                if isinstance(value, basestring) and not value.startswith(var):
+                    value = repr(str(value))
+                if conversion:
+                    value = convert(value, conversion)
+                if value is None:
+                    value = missing
+                append(value if not spec and type(value) is str
+                       else format(value, spec))
+            return ''.join(chunks)
+        return render
+
 
 class RouteBuilder(object):
     """Route output file builder."""
@@ -82,54 +207,286 @@ class RouteBuilder(object):
                  template=TEMPLATE,
                  header=HEADER,
                  footer=FOOTER,
-                 formatter=RouteFormatter):
+                 formatter=RouteFormatter,
+                 backup=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE,
+                 durability='none',
+                 lock_timeout=None):
+        if durability not in DURABILITY:
+            raise ValueError(_('unknown durability policy: %r') % (durability,))
         self.filename = filename
         self.__template = template
         self.__header = header
         self.__footer = footer
         self.__formatter = formatter()
+        self.__render = self.__formatter.compile(template)
+        self.__backup = backup if backup is not None else Backup()
+        self.__buffer_size = buffer_size
+        self.__durability = durability
+        self.__lock_timeout = lock_timeout
         self.__log = getLogger(__name__)
 
+    def render(self, item):
+        """Render a single entry."""
+        return self.__render(item)
+
     def __build(self, items):
         """Iteratively build the output."""
         if self.__header:
             yield self.__header
         for item in items:
-            yield self.__formatter.format(self.__template, **item)
+            yield self.render(item)
         if self.__footer:
             yield self.__footer
 
-    def backup(self, stamp='%F_%H%M%S', copy=shutil.copy2):
-        """Create timestamped backup files."""
-        tstamp = datetime.now().strftime(stamp)
-        sfn = self.filename
-        dfn = '{0}.{1}.backup'.format(self.filename, tstamp)
-        self.__log.debug(_('creating backup file (original: %r, backup: %r)'), sfn, dfn)
-        copy(sfn, dfn)
-
-    def __write(self, items, dest_file):
-        """Write formatted routes to file (low-level implementation)."""
-        with dest_file:
-            for lines in self.__build(items):
-                dest_file.writelines(lines)
-
-    def write(self, items, atomic=True, move=shutil.move):
+    def backup(self, replaced=True):
+        """Back up the file before it is written (see ``Backup.create``)."""
+        return self.__backup.create(self.filename, replaced=replaced)
+
+    @property
+    def journal(self):
+        """Path of the journal file used by in-place appends."""
+        return '{0}.journal'.format(self.filename)
+
+    def recover(self):
+        """Roll back an interrupted in-place ``append``.
+
+        Returns ``True`` if the file was restored from the journal.
+        """
+        try:
+            with open(self.journal, 'rb') as journal:
+                offset, size = [
+                    int(field) for field in journal.readline().split()]
+                tail = journal.read()
+        except (IOError, OSError) as err:
+            if err.errno == errno.ENOENT:
+                return False
+            raise
+        except ValueError:
+            tail, offset, size = b'', 0, -1
+        restored = len(tail) == size - offset
+        if restored:
+            self.__log.warning(_('rolling back interrupted append: %r'),
+                               self.filename)
+            with open(self.filename, 'r+b') as file_:
+                lock_exclusive(file_.fileno(), self.__lock_timeout,
+                               self.filename)
+                file_.seek(offset)
+                file_.write(tail)
+                file_.truncate(size)
+                file_.flush()
+                os.fsync(file_.fileno())
+        # NOTE: an incomplete journal means the file was never modified
+        os.unlink(self.journal)
+        return restored
+
+    def append(self, items, offset):
+        """Insert formatted routes at a byte offset of the file in place.
+
+        Only the new entries and whatever follows ``offset`` (the file
+        footer) are written. The overwritten tail and the original size are
+        recorded in a journal first, so an interrupted append is rolled back
+        by ``recover``. The file is locked against readers meanwhile (see
+        ``FileLock``). Entries are written with the line ending of the
+        footer line at ``offset``, or else of the first line of the file.
+        """
+        self.recover()
+        block = ''.join(self.render(item) for item in items).encode('utf-8')
+        with open(self.filename, 'r+b') as file_:
+            lock_exclusive(file_.fileno(), self.__lock_timeout, self.filename)
+            file_.seek(0, os.SEEK_END)
+            size = file_.tell()
+            file_.seek(offset)
+            tail = file_.read()
+            if self.__line_ending(file_, tail) == b'\r\n':
+                block = block.replace(b'\n', b'\r\n')
+            self.__log.debug(_('writing append journal: %r'), self.journal)
+            with open(self.journal, 'wb') as journal:
+                journal.write('{0} {1}\n'.format(offset, size).encode('ascii'))
+                journal.write(tail)
+                journal.flush()
+                os.fsync(journal.fileno())
+            self.__log.info(_('appending entries to file: %r'), self.filename)
+            file_.seek(offset)
+            file_.write(block + tail)
+            file_.flush()
+            os.fsync(file_.fileno())
+        os.unlink(self.journal)
+
+    @staticmethod
+    def __line_ending(file_, tail):
+        """Return the line ending of the first line of ``tail``, or else of
+        the first line of the file.
+        """
+        eol = tail.find(b'\n')
+        if eol < 0:
+            file_.seek(0)
+            tail = file_.readline()
+            eol = len(tail) - 1
+        if eol > 0 and tail[eol - 1:eol] == b'\r':
+            return b'\r\n'
+        return b'\n'
+
+    def write(self, items, atomic=True, move=replace_file,
+              skip_unchanged=False):
         """Safely write formatted routes to file.
 
-        ``atomic`` operation writes the output to a temporary file and moves
-        it over the original.
+        ``atomic`` operation writes the output to a temporary file in the
+        same directory, with the mode and owner of the original, and
+        renames it over the original.
+
+        Non-``atomic`` operation modifies the original file in place,
+        holding it locked against readers (see ``FileLock``).
 
-        Non-``atomic`` operation modifies the original file in place.
+        Output is written in ``buffer_size`` chunks (see ``BulkWriter``) and
+        synced according to the ``durability`` policy. Returns the
+        ``BulkWriter`` statistics.
+
+        With ``skip_unchanged`` (``atomic`` operation only) output identical
+        to the current file is discarded before the backup, leaving the file
+        untouched, and ``None`` is returned.
         """
-        self.backup()
+        self.recover()
+        if not atomic:
+            self.backup(replaced=False)
+        durability = self.__durability
+        digest = None
         if atomic:
             self.__log.debug(_('opening a temporary file for writing (atomic operation)'))
-            file_ = tempfile.NamedTemporaryFile(mode='w', delete=False)
+            fd, path = atomic_tempfile(self.filename)
+            # NOTE: the directory entry to persist is the one of the
+            # original file, synced after the move
+            if durability != 'none':
+                durability = 'fsync-file'
+            if skip_unchanged:
+                digest = hashlib.sha256()
         else:
             self.__log.debug(_('overwriting file in place (non-atomic operation)'))
-            file_ = open(self.filename, 'w')
+            fd = os.open(self.filename, os.O_WRONLY | os.O_CREAT, 0o666)
+            try:
+                # NOTE: truncated only once readers are done
+                lock_exclusive(fd, self.__lock_timeout, self.filename)
+                os.ftruncate(fd, 0)
+            except Exception:
+                os.close(fd)
+                raise
+            path = self.filename
         self.__log.info(_('writing entries to file: %r'), self.filename)
-        self.__write(items, dest_file=file_)
+        writer = BulkWriter(fd, path, self.__buffer_size, durability,
+                            digest=digest)
+        try:
+            with writer:
+                writer.writelines(self.__build(items))
+        except Exception:
+            if atomic:
+                os.unlink(path)
+            raise
         if atomic:
-            self.__log.debug(_('moving temporary file over the original'))
-            move(file_.name, self.filename)
+            if digest is not None and self.__unchanged(writer.bytes, digest):
+                os.unlink(path)
+                return None
+            self.backup()
+            self.__log.debug(_('renaming temporary file over the original'))
+            move(path, self.filename)
+            self.__sync_dir()
+        self.__log.info(_('wrote %d bytes in %d writes (%.3f s)'),
+                        writer.bytes, writer.writes, writer.seconds)
+        return writer.stats()
+
+    def __unchanged(self, size, digest):
+        """Check if the file has the given size and ``sha256`` digest."""
+        try:
+            if os.path.getsize(self.filename) != size:
+                return False
+        except OSError:
+            return False
+        if file_digest(self.filename) != digest.digest():
+            return False
+        self.__log.info(_('file content unchanged, not writing: %r'),
+                        self.filename)
+        return True
+
+    def __sync_dir(self):
+        """Sync the directory of the file with ``fsync-file-and-dir``."""
+        if self.__durability == 'fsync-file-and-dir':
+            fsync_dir(os.path.dirname(os.path.abspath(self.filename)))
+
+    def splice(self, items, spans, footer=None, encoding='utf-8',
+               move=replace_file, skip_unchanged=False):
+        """Safely write formatted routes to file reusing unchanged blocks.
+
+        ``spans`` are the ``(route, start, stop)`` entry block offsets of
+        the current file (see ``RouteParser.parse_spans``). With no entry
+        blocks the ``footer`` offset (see ``RouteParser.find_footer``) is
+        required instead.
+
+        Entries are matched to the current blocks by name. Blocks of
+        unchanged entries, the text between blocks, the file header and
+        footer are copied verbatim, preserving comments and formatting.
+        Only new and changed entries are rendered. Blocks of entries that
+        are gone are dropped together with the text preceding them.
+
+        With ``skip_unchanged`` output identical to the current file (the
+        whole file copied as a single range) is discarded before the
+        backup. Returns whether the file was written.
+        """
+        if not spans and footer is None:
+            raise ValueError(_('either entry block spans or footer required'))
+        self.recover()
+        head = spans[0][1] if spans else footer
+        tail = spans[-1][2] if spans else footer
+        blocks = defaultdict(deque)
+        previous = head
+        for route, start, stop in spans:
+            blocks[route.get('name')].append((route, previous, start, stop))
+            previous = stop
+        self.__log.debug(_('opening a temporary file for writing (atomic operation)'))
+        fd, tmpname = atomic_tempfile(self.filename)
+        reused = rendered = 0
+        try:
+            with open(self.filename, 'rb') as src:
+                writer = SpliceWriter(src.fileno(), fd)
+                writer.copy(0, head)
+                for item in items:
+                    matching = blocks.get(item.get('name'))
+                    data = None
+                    if matching:
+                        route, lead, start, stop = matching.popleft()
+                        writer.copy(lead, start)
+                        if dict(route) != dict(item):
+                            # NOTE: entries may differ only in keys that
+                            # render the same (e.g. missing options)
+                            data = self.render(item).encode(encoding)
+                        if data is None or (
+                                len(data) == stop - start and _read_range(
+                                    src.fileno(), start, stop) == data):
+                            writer.copy(start, stop)
+                            reused += 1
+                            continue
+                    writer.write(data or self.render(item).encode(encoding))
+                    rendered += 1
+                size = os.fstat(src.fileno()).st_size
+                writer.copy(tail, size)
+                writer.flush()
+            if self.__durability != 'none':
+                os.fsync(fd)
+        except Exception:
+            os.close(fd)
+            os.unlink(tmpname)
+            raise
+        os.close(fd)
+        self.__log.info(_('spliced entries to file: %r (%d reused, %d rendered,'
+                          ' %d bytes copied, %d bytes written)'),
+                        self.filename, reused, rendered, writer.copied,
+                        writer.written)
+        if (skip_unchanged and not writer.written and writer.ranges == 1
+                and writer.copied == size):
+            self.__log.info(_('file content unchanged, not writing: %r'),
+                            self.filename)
+            os.unlink(tmpname)
+            return False
+        self.backup()
+        self.__log.debug(_('renaming temporary file over the original'))
+        move(tmpname, self.filename)
+        self.__sync_dir()
+        return True
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""route-ctl persistent parse cache."""
+
+from __future__ import absolute_import, unicode_literals, with_statement
+
+import binascii
+import hashlib
+import json
+import os
+import tempfile
+from gettext import translation
+from logging import getLogger
+
+from .fsutil import file_digest, file_stat
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+# NOTE: version 2 keys entries on the SHA-256 digest of ``file_digest``
+CACHE_VERSION = 2
+
+
+def default_cache_dir():
+    """Return the XDG cache directory for route-ctl."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'route-ctl')
+
+
+def _hex_digest(filename):
+    """Return the hex digest of the file contents (see ``file_digest``)."""
+    return binascii.hexlify(file_digest(filename)).decode('ascii')
+
+
+class ParseCache(object):
+    """On-disk cache of parsed route entries.
+
+    Entries are keyed on the file identity: path, inode, size, modification
+    time and content hash. Any mismatch or unreadable cache file is treated
+    as a miss.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+        self.__log = getLogger(__name__)
+
+    def path(self, filename):
+        """Return the cache file path for a route file."""
+        key = os.path.realpath(filename).encode('utf-8')
+        return os.path.join(
+            self.directory, '{0}.json'.format(hashlib.sha1(key).hexdigest()))
+
+    def load(self, filename):
+        """Return cached entries or ``None`` if they are missing or stale."""
+        cache_path = self.path(filename)
+        try:
+            with open(cache_path, 'r') as cache_file:
+                cached = json.load(cache_file)
+            identity = cached['identity']
+            if cached.get('version') != CACHE_VERSION:
+                return None
+            if identity['stat'] != file_stat(filename):
+                self.__log.debug(_('cache miss (stat changed): %r'), filename)
+                return None
+            if identity['digest'] != _hex_digest(filename):
+                self.__log.debug(_('cache miss (content changed): %r'), filename)
+                return None
+            routes = cached['routes']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            self.__log.debug(_('cache miss: %r'), filename)
+            return None
+        self.__log.debug(_('cache hit: %r'), filename)
+        return routes
+
+    def store(self, filename, items, stat=None):
+        """Store parsed entries for a route file.
+
+        ``stat`` is the file identity taken before parsing; nothing is
+        stored if the file has changed since.
+        """
+        try:
+            current = file_stat(filename)
+            if stat is not None and stat != current:
+                self.__log.debug(_('file changed while parsing: %r'), filename)
+                return
+            digest = _hex_digest(filename)
+            if current != file_stat(filename):
+                return
+            cached = {
+                'version': CACHE_VERSION,
+                'identity': {'stat': current, 'digest': digest},
+                'routes': items,
+            }
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            file_ = tempfile.NamedTemporaryFile(
+                mode='w', dir=self.directory, suffix='.tmp', delete=False)
+            try:
+                with file_:
+                    json.dump(cached, file_, default=dict)
+                os.rename(file_.name, self.path(filename))
+            except Exception:
+                os.unlink(file_.name)
+                raise
+        except (IOError, OSError, TypeError, ValueError) as err:
+            self.__log.warning(_('unable to store parse cache: %s'), err)
+            return
+        self.__log.debug(_('cache stored: %r'), filename)
+
+    def invalidate(self, filename):
+        """Drop the cached entries of a route file."""
+        try:
+            os.unlink(self.path(filename))
+        except OSError:
+            pass
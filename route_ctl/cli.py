@@ -15,10 +15,17 @@ from .actions import (
     batch_update_items,
     create_or_update_item,
     delete_items,
+    exec_operations,
     find_items,
     list_items,
+    serve,
     update_item,
 )
+from .backup import COMPRESSORS, STRATEGIES
+from .decoders import INPUT_FORMATS
+from .encoders import FORMATS
+from .fleet import FLEET_FIELDS
+from .writer import DEFAULT_BUFFER_SIZE, DURABILITY
 
 # logging
 log = logging.getLogger(__name__)
@@ -31,6 +38,43 @@ def _help(*args, **kwargs):
     parser.print_help()
     parser.exit()
 
+
+def _count(value):
+    """Parse a non-negative number of entries."""
+    try:
+        count = int(value)
+    except ValueError:
+        count = -1
+    if count < 0:
+        raise argparse.ArgumentTypeError(
+            _('not a non-negative integer: %r') % (value,))
+    return count
+
+
+def _positive(value):
+    """Parse a positive number (of jobs or bytes)."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            _('not a positive integer: %r') % (value,))
+    return number
+
+
+def _field_list(value):
+    """Split a comma-separated list of field names."""
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    if not fields:
+        raise argparse.ArgumentTypeError(_('no fields given'))
+    unknown = [field for field in fields if field not in FLEET_FIELDS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            _('unknown fields: %s (choose from %s)') % (
+                ', '.join(unknown), ', '.join(FLEET_FIELDS)))
+    return fields
+
 # generics
 
 common_args = argparse.ArgumentParser(add_help=False)
@@ -62,6 +106,40 @@ log_group.add_argument(
     help=_('less verbose'),
 )
 
+format_args = argparse.ArgumentParser(add_help=False)
+format_args.add_argument(
+    '-f',
+    '--format',
+    dest='output_format',
+    default='json',
+    choices=FORMATS,
+    help=_('output format (default: json)'),
+)
+format_args.add_argument(
+    '--fields',
+    metavar='FIELDS',
+    type=_field_list,
+    default=None,
+    help=_('comma-separated fields to parse and output, e.g. name,gateway, '
+           'file for directories and globs of route files (default: all)'),
+)
+
+input_args = argparse.ArgumentParser(add_help=False)
+input_args.add_argument(
+    'source_file',
+    metavar='JSON_FILE',
+    type=argparse.FileType('r'),
+    help=_('JSON file'),
+)
+input_args.add_argument(
+    '-I',
+    '--input-format',
+    dest='input_format',
+    default='json',
+    choices=INPUT_FORMATS,
+    help=_('input format (default: json)'),
+)
+
 config_args = argparse.ArgumentParser(add_help=False)
 config_args.add_argument(
     '-F',
@@ -69,13 +147,121 @@ config_args.add_argument(
     metavar='FILE',
     dest='route_file',
     default=os.environ.get('ROUTE_FILE'),
-    help=_('route file (default: ROUTE_FILE environment variable)'),
+    help=_('route file, or a directory or glob pattern of route files for '
+           'list and find (default: ROUTE_FILE environment variable)'),
+)
+config_args.add_argument(
+    '--mmap',
+    dest='use_mmap',
+    action='store_true',
+    default=False,
+    help=_('memory-map the route file and parse it as bytes'),
+)
+config_args.add_argument(
+    '--cache',
+    action='store_true',
+    default=bool(os.environ.get('ROUTE_CTL_CACHE')),
+    help=_('use the persistent parse cache '
+           '(default: ROUTE_CTL_CACHE environment variable)'),
+)
+config_args.add_argument(
+    '--cache-dir',
+    metavar='DIR',
+    dest='cache_dir',
+    default=None,
+    help=_('parse cache directory (default: $XDG_CACHE_HOME/route-ctl)'),
+)
+config_args.add_argument(
+    '-j',
+    '--jobs',
+    metavar='N',
+    type=_positive,
+    default=None,
+    help=_('worker processes parsing a route file in byte ranges, or a '
+           'directory or glob of route files (default: one for a single '
+           'file, number of CPUs for many files)'),
+)
+config_args.add_argument(
+    '--lock-timeout',
+    metavar='SECONDS',
+    dest='lock_timeout',
+    type=float,
+    default=None,
+    help=_('give up waiting for other writers of the route file after '
+           'SECONDS, readers only wait for writers modifying it in place '
+           '(default: wait indefinitely)'),
+)
+config_args.add_argument(
+    '--socket',
+    metavar='PATH',
+    dest='socket_path',
+    default=os.environ.get('ROUTE_CTL_SOCKET'),
+    help=_('daemon socket, requests are forwarded to a running daemon '
+           '(default: ROUTE_CTL_SOCKET environment variable)'),
+)
+
+write_args = argparse.ArgumentParser(add_help=False)
+write_args.add_argument(
+    '--splice',
+    action='store_true',
+    default=bool(os.environ.get('ROUTE_CTL_SPLICE')),
+    help=_('only rewrite changed entries, copy the rest of the file verbatim '
+           '(default: ROUTE_CTL_SPLICE environment variable)'),
+)
+
+write_args.add_argument(
+    '--backup',
+    dest='backup',
+    default=os.environ.get('ROUTE_CTL_BACKUP', 'copy'),
+    choices=sorted(STRATEGIES),
+    help=_('backup strategy (default: ROUTE_CTL_BACKUP environment variable '
+           'or copy)'),
+)
+write_args.add_argument(
+    '--keep-backups',
+    metavar='N',
+    dest='keep_backups',
+    type=_count,
+    default=None,
+    help=_('keep only N most recent backup files'),
+)
+write_args.add_argument(
+    '--backup-max-age',
+    metavar='DAYS',
+    dest='backup_max_age',
+    type=float,
+    default=None,
+    help=_('remove backup files older than DAYS'),
+)
+write_args.add_argument(
+    '--compress-backups',
+    dest='compress_backups',
+    default=None,
+    choices=sorted(COMPRESSORS),
+    help=_('compress backup files in the background'),
+)
+write_args.add_argument(
+    '--buffer-size',
+    metavar='BYTES',
+    dest='buffer_size',
+    type=_positive,
+    default=DEFAULT_BUFFER_SIZE,
+    help=_('output buffer size (default: %(default)s)'),
+)
+write_args.add_argument(
+    '--durability',
+    default=os.environ.get('ROUTE_CTL_DURABILITY', 'none'),
+    choices=DURABILITY,
+    help=_('sync written files (and their directory) to disk '
+           '(default: ROUTE_CTL_DURABILITY environment variable or none)'),
 )
 
 retrieve_delete_parser = argparse.ArgumentParser(add_help=False)
 retrieve_delete_parser.add_argument(
     'value',
     metavar='VALUE',
+    nargs='?',
+    default=None,
     help=_('filter by value'),
 )
 retrieve_delete_parser.add_argument(
@@ -183,6 +369,7 @@ list_action = subparsers.add_parser(
     parents=[
         common_args,
         config_args,
+        format_args,
     ]
 )
 list_action.set_defaults(action=list_items)
@@ -194,10 +381,52 @@ find_action = subparsers.add_parser(
     parents=[
         common_args,
         config_args,
+        format_args,
         retrieve_delete_parser,
     ]
 )
 find_action.set_defaults(action=find_items)
+find_action.add_argument(
+    '--offset',
+    metavar='N',
+    type=_count,
+    default=0,
+    help=_('skip the first N matching routes'),
+)
+limit_group = find_action.add_mutually_exclusive_group()
+limit_group.add_argument(
+    '--limit',
+    metavar='N',
+    type=_count,
+    default=None,
+    help=_('stop after N matching routes'),
+)
+limit_group.add_argument(
+    '--first',
+    dest='limit',
+    action='store_const',
+    const=1,
+    help=_('stop after the first matching route'),
+)
+prefix_group = find_action.add_mutually_exclusive_group()
+prefix_group.add_argument(
+    '--contains',
+    metavar='IP',
+    help=_('find routes containing an address (longest prefix first)'),
+)
+prefix_group.add_argument(
+    '--within',
+    metavar='CIDR',
+    help=_('find routes inside a network'),
+)
+prefix_group.add_argument(
+    '-Q',
+    '--query',
+    metavar='QUERY',
+    help=_("find routes matching a query of KEY=VALUE, KEY!=VALUE, "
+           "KEY~REGEX and KEY!~REGEX conditions combined with and, or, not "
+           "and parentheses, e.g. 'interface=eth1 and gateway~^10\\.'"),
+)
 
 # validate subcommand
 # validate_action = subparsers.add_parser(
@@ -235,15 +464,16 @@ batch_replace_action = subparsers.add_parser(
     parents=[
         common_args,
         config_args,
+        input_args,
+        write_args,
     ]
 )
-batch_replace_action.set_defaults(action=batch_replace_items)
 batch_replace_action.add_argument(
-    'source_file',
-    metavar='JSON_FILE',
-    type=argparse.FileType('r'),
-    help=_('JSON file'),
+    '--plan',
+    action='store_true',
+    help=_('only print the added, removed and changed entries'),
 )
+batch_replace_action.set_defaults(action=batch_replace_items)
 
 # batch-insert subcommand
 batch_insert_action = subparsers.add_parser(
@@ -252,15 +482,11 @@ batch_insert_action = subparsers.add_parser(
     parents=[
         common_args,
         config_args,
+        input_args,
+        write_args,
     ]
 )
 batch_insert_action.set_defaults(action=batch_insert_items)
-batch_insert_action.add_argument(
-    'source_file',
-    metavar='JSON_FILE',
-    type=argparse.FileType('r'),
-    help=_('JSON file'),
-)
 
 # batch-update subcommand
 # batch_update_action = subparsers.add_parser(
@@ -279,6 +505,45 @@ batch_insert_action.add_argument(
 #     help=_('JSON file'),
 # )
 
+# serve subcommand
+serve_action = subparsers.add_parser(
+    'serve',
+    help=_('serve route files to clients over a Unix socket'),
+    parents=[
+        common_args,
+        config_args,
+        write_args,
+    ]
+)
+serve_action.set_defaults(action=serve)
+serve_action.add_argument(
+    'route_files',
+    metavar='FILE',
+    nargs='*',
+    help=_('additional route files to serve'),
+)
+
+# exec subcommand
+exec_action = subparsers.add_parser(
+    'exec',
+    help=_('run a script of operations as a single transaction'),
+    parents=[
+        common_args,
+        config_args,
+        write_args,
+    ]
+)
+exec_action.set_defaults(action=exec_operations)
+exec_action.add_argument(
+    'script_file',
+    metavar='SCRIPT',
+    nargs='?',
+    type=argparse.FileType('r'),
+    default='-',
+    help=_('file with one JSON operation per line, e.g. '
+           '{"op": "create", "name": ...} (default: standard input)'),
+)
+
 # create subcommand
 create_action = subparsers.add_parser(
     'create',
@@ -287,9 +552,16 @@ create_action = subparsers.add_parser(
         common_args,
         config_args,
         create_update_parser,
+        write_args,
     ]
 )
 create_action.set_defaults(action=create_or_update_item)
+create_action.add_argument(
+    '--append',
+    action='store_true',
+    default=False,
+    help=_('append the route in place instead of rewriting the file'),
+)
 
 # update subcommand
 # update_action = subparsers.add_parser(
@@ -316,16 +588,39 @@ create_action.set_defaults(action=create_or_update_item)
 # delete_action.set_defaults(action=delete_items)
 
 
+def parse_args(args=None):
+    """Parse command-line arguments, exit on errors argparse cannot detect
+    itself.
+    """
+    args = parser.parse_args(args)
+    if getattr(args, 'action', None) is find_items:
+        # NOTE: a positional argument cannot join a mutually exclusive group
+        # of options, VALUE is checked against them here
+        selected = [option for option, dest in (('--contains', 'contains'),
+                                                ('--within', 'within'),
+                                                ('-Q/--query', 'query'))
+                    if getattr(args, dest) is not None]
+        if args.value is not None and selected:
+            find_action.error(_('argument VALUE: not allowed with argument '
+                                '%s') % (selected[0],))
+        if args.value is None and not selected:
+            find_action.error(_('one of the arguments VALUE --contains '
+                                '--within -Q/--query is required'))
+    return args
+
+
 def main():
     """CLI entrypoint."""
     from sys import exit
-    args = parser.parse_args()
+    args = parse_args()
     log_level = max(logging.DEBUG, min(logging.CRITICAL, sum(args.verbosity)))
     debug_on = log_level <= logging.DEBUG
     logging.basicConfig(level=log_level)
     log.debug(_('Starting with cli arguments: %r'), vars(args))
     try:
-        print(args.action(**vars(args)), file=args.out_file)
+        result = args.action(**vars(args))
+        if result is not None:
+            print(result, file=args.out_file)
         exit(0)
     except Exception as e:
         log.error(e, exc_info=debug_on)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""route-ctl client of the resident daemon."""
+
+from __future__ import absolute_import, unicode_literals, with_statement
+
+import itertools
+import json
+import socket
+from gettext import translation
+from logging import getLogger
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+
+class RouteClientError(Exception):
+    """Error response of the daemon."""
+
+    def __init__(self, message, code=None, data=None):
+        super(RouteClientError, self).__init__(message)
+        self.code = code
+        self.data = data
+
+
+class RouteClient(object):
+    """JSON-RPC client of a ``route-ctl serve`` daemon.
+
+    Example:
+
+    >>> with RouteClient('/run/route-ctl.sock') as client:
+    ...     client.call('find', key='name', value='default')
+
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.__socket = None
+        self.__file = None
+        self.__ids = itertools.count(1)
+        self.__log = getLogger(__name__)
+
+    def connect(self):
+        """Connect to the daemon, raises ``socket.error`` if it's not running."""
+        if self.__socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except socket.error:
+                sock.close()
+                raise
+            self.__socket = sock
+            self.__file = sock.makefile('rwb')
+        return self
+
+    def close(self):
+        """Close the connection."""
+        if self.__socket is not None:
+            self.__file.close()
+            self.__socket.close()
+            self.__socket = self.__file = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def call(self, method, **params):
+        """Call a daemon method and return its result."""
+        self.connect()
+        request = {
+            'jsonrpc': '2.0',
+            'id': next(self.__ids),
+            'method': method,
+            'params': params,
+        }
+        self.__log.debug(_('calling daemon method: %r'), method)
+        self.__file.write(json.dumps(request, default=dict).encode('utf-8'))
+        self.__file.write(b'\n')
+        self.__file.flush()
+        line = self.__file.readline()
+        if not line:
+            self.close()
+            raise RouteClientError(_('connection closed by the daemon'))
+        response = json.loads(line.decode('utf-8'))
+        error = response.get('error')
+        if error is not None:
+            raise RouteClientError(
+                error.get('message'), error.get('code'), error.get('data'))
+        return response.get('result')
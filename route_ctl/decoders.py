@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""route-ctl incremental JSON input decoders."""
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import re
+from gettext import translation
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# NOTE: longest token a truncated value may end in (a ``\uXXXX`` escape),
+# errors closer than this to the end of the buffer may be due to truncation
+TRUNCATED_TAIL = 6
+
+
+class JSONStream(object):
+    """Buffered reader decoding JSON values one at a time from a file.
+
+    Only the unconsumed part of the buffer and the value being decoded are
+    held in memory. A value spanning chunks is decoded again after reading
+    twice as much as before, so large values are decoded in linear time,
+    and malformed input is reported without reading any further.
+    """
+
+    def __init__(self, json_file, chunk_size=1 << 16):
+        self.__file = json_file
+        self.__chunk_size = chunk_size
+        self.__decoder = json.JSONDecoder()
+        self.__buf = ''
+        self.__pos = 0
+        self.__eof = False
+
+    def __fill(self, size=None):
+        """Read the next chunk, drop the consumed part of the buffer."""
+        chunk = self.__file.read(size or self.__chunk_size)
+        if not chunk:
+            self.__eof = True
+            return
+        self.__buf = self.__buf[self.__pos:] + chunk
+        self.__pos = 0
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end)."""
+        while True:
+            self.__pos = WHITESPACE.match(self.__buf, self.__pos).end()
+            if self.__pos < len(self.__buf):
+                return self.__buf[self.__pos]
+            if self.__eof:
+                return ''
+            self.__fill()
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                _('expected one of %r, got %r') % (chars, char or 'EOF'))
+        self.__pos += 1
+        return char
+
+    def __truncated(self, err):
+        """Tell whether a decoding error may be due to the value continuing
+        in the next chunk.
+        """
+        pos = getattr(err, 'pos', None)
+        if pos is None:
+            # NOTE: PY2 compat, errors carry no position
+            return True
+        return (len(self.__buf) - pos <= TRUNCATED_TAIL or
+                err.msg.startswith('Unterminated string'))
+
+    def value(self):
+        """Decode the next JSON value."""
+        self.peek()
+        size = self.__chunk_size
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buf, self.__pos)
+            except ValueError as err:
+                if self.__eof or not self.__truncated(err):
+                    raise
+                self.__fill(size)
+                size *= 2
+                continue
+            if end == len(self.__buf) and not self.__eof:
+                # NOTE: a number or literal may continue in the next chunk
+                self.__fill(size)
+                size *= 2
+                continue
+            self.__pos = end
+            return value
+
+
+def iter_json_array(json_file, key='routes', chunk_size=1 << 16):
+    """Iterate over the items of the ``key`` array of a JSON object.
+
+    Example:
+
+    >>> with open('routes.json') as json_file:
+    ...     for route in iter_json_array(json_file):
+    ...         print(route)
+
+    """
+    stream = JSONStream(json_file, chunk_size)
+    stream.expect('{')
+    if stream.peek() == '}':
+        raise KeyError(key)
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name != key:
+            stream.value()
+        else:
+            stream.expect('[')
+            if stream.peek() == ']':
+                return
+            while True:
+                yield stream.value()
+                if stream.expect(',]') == ']':
+                    return
+        if stream.expect(',}') == '}':
+            raise KeyError(key)
+
+
+def iter_ndjson(json_file, key=None):
+    """Iterate over newline-delimited JSON values, skipping blank lines.
+
+    ``key`` is accepted for interface compatibility and ignored.
+    """
+    for line in json_file:
+        if line.strip():
+            yield json.loads(line)
+
+
+DECODERS = {
+    'json': iter_json_array,
+    'ndjson': iter_ndjson,
+}
+
+INPUT_FORMATS = sorted(DECODERS)
+
+
+def decode(json_file, input_format='json', key='routes'):
+    """Iterate over entries of a JSON or NDJSON file."""
+    try:
+        decoder = DECODERS[input_format]
+    except KeyError:
+        raise ValueError(_('unknown input format: %r') % (input_format,))
+    return decoder(json_file, key=key)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""route-ctl streaming output encoders."""
+
+from __future__ import absolute_import, unicode_literals
+
+import csv
+import json
+from gettext import translation
+
+from .record import FIELDS, project
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+
+def _projected(items, fields):
+    """Project entries on ``fields``, if given."""
+    if fields is None:
+        return items
+    return (project(item, fields) for item in items)
+
+
+def encode_json(items, out, key='routes', indent=2, fields=None):
+    """Write entries as a JSON document, one entry at a time.
+
+    The output is the same as ``json.dumps({key: list(items)}, indent=2)``.
+    With ``fields`` only these keys of entries are written.
+    """
+    items = _projected(items, fields)
+    pad = ' ' * indent
+    separator = '[\n' + pad * 2
+    out.write('{{\n{0}{1}: '.format(pad, json.dumps(key)))
+    for item in items:
+        out.write(separator)
+        out.write(json.dumps(item, indent=indent, default=dict).replace(
+            '\n', '\n' + pad * 2))
+        separator = ',\n' + pad * 2
+    out.write('[]\n}\n' if separator.startswith('[') else
+              '\n{0}]\n}}\n'.format(pad))
+
+
+def encode_json_compact(items, out, key='routes', fields=None):
+    """Write entries as a compact (whitespace-free) JSON document."""
+    items = _projected(items, fields)
+    separator = '['
+    out.write('{{{0}:'.format(json.dumps(key)))
+    for item in items:
+        out.write(separator)
+        out.write(json.dumps(item, separators=(',', ':'), default=dict))
+        separator = ','
+    out.write('[]}\n' if separator == '[' else ']}\n')
+
+
+def encode_ndjson(items, out, key='routes', fields=None):
+    """Write entries as newline-delimited JSON, one entry per line."""
+    items = _projected(items, fields)
+    for item in items:
+        out.write(json.dumps(item, separators=(',', ':'), default=dict))
+        out.write('\n')
+
+
+def encode_csv(items, out, key='routes', fields=None):
+    """Write entries as CSV with a header row of ``fields`` (by default
+    ``FIELDS``).
+    """
+    writer = csv.DictWriter(out, fieldnames=fields or FIELDS,
+                            extrasaction='ignore',
+                            lineterminator='\n')
+    writer.writeheader()
+    for item in items:
+        writer.writerow(item)
+
+
+ENCODERS = {
+    'json': encode_json,
+    'json-compact': encode_json_compact,
+    'ndjson': encode_ndjson,
+    'csv': encode_csv,
+}
+
+FORMATS = sorted(ENCODERS)
+
+
+def encode(items, out, output_format='json', **kwargs):
+    """Write entries to ``out`` in an output format, as they are produced."""
+    try:
+        encoder = ENCODERS[output_format]
+    except KeyError:
+        raise ValueError(_('unknown output format: %r') % (output_format,))
+    encoder(items, out, **kwargs)
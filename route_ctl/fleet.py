@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""route-ctl fleet mode: querying many route files in parallel."""
+
+from __future__ import absolute_import, unicode_literals
+
+import glob
+import os
+from collections import deque
+from functools import partial
+from gettext import translation
+from itertools import islice
+from logging import getLogger
+
+from .lock import LockError
+from .manager import RouteManager, paginate
+from .parser import RouteParserError, cpu_count
+from .query import QueryError
+from .record import FIELDS
+from .trie import RouteTrieError
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # NOTE: PY2 compat: requires the ``futures`` backport
+    ProcessPoolExecutor = None
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+# logging
+log = getLogger(__name__)
+
+DEFAULT_PATTERN = '*.pp'
+
+FILE_KEY = 'file'
+
+FLEET_FIELDS = (FILE_KEY,) + FIELDS
+
+
+def is_fleet(path):
+    """Check if a path is a directory or a glob pattern of route files."""
+    return bool(path) and (os.path.isdir(path) or glob.has_magic(path))
+
+
+def expand(path, pattern=DEFAULT_PATTERN):
+    """Return the sorted route files of a directory or glob pattern.
+
+    Directories are searched (non-recursively) for files matching
+    ``pattern``.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, pattern)
+    return sorted(filename for filename in glob.glob(path)
+                  if os.path.isfile(filename))
+
+
+def query_file(filename, method='list', params=None, options=None):
+    """Run a query on a single route file (in a worker process).
+
+    Returns a ``(filename, items, error)`` tuple, items are tagged with the
+    ``file`` key. A ``limit`` parameter stops the query early, ``fields``
+    limits the keys parsed.
+    """
+    try:
+        mgr = RouteManager(filename, **(options or {}))
+        params = params or {}
+        fields = params.get('fields')
+        if method == 'list':
+            items = mgr.iter_items(fields=fields)
+        elif params.get('query') is not None:
+            items = mgr.iter_query(params['query'],
+                                   params.get('ignore_case', False),
+                                   fields=fields)
+        elif params.get('contains') is not None:
+            items = mgr.find_covering(params['contains'])['routes']
+        elif params.get('within') is not None:
+            items = mgr.find_within(params['within'])['routes']
+        else:
+            items = mgr.iter_found(params['value'], params['key'],
+                                   params.get('ignore_case', False),
+                                   params.get('exact_match', True),
+                                   fields=fields)
+        tagged = []
+        for item in paginate(items, 0, params.get('limit')):
+            item = dict(item)
+            item[FILE_KEY] = filename
+            tagged.append(item)
+        return filename, tagged, None
+    except (RouteParserError, RouteTrieError, QueryError, LockError,
+            ValueError, EnvironmentError) as err:
+        # NOTE: ValueError covers undecodable files (UnicodeDecodeError)
+        return filename, [], '{0}: {1}'.format(type(err).__name__, err)
+
+
+def query_files(filenames, method='list', params=None, options=None):
+    """Run a query on a batch of route files (in a worker process)."""
+    return [query_file(filename, method, params, options)
+            for filename in filenames]
+
+
+def chunk_size(count, jobs, per_job=4, limit=64):
+    """Pick a task batch size giving each worker a few batches."""
+    return max(1, min(limit, count // (jobs * per_job)))
+
+
+def _windowed(executor, task, batches, window):
+    """Iterate over the results of tasks run on batches, in order.
+
+    Only ``window`` batches are submitted ahead of the one being consumed,
+    the ones not started yet are cancelled when the iterator is closed.
+    """
+    batches = iter(batches)
+    pending = deque(executor.submit(task, batch)
+                    for batch in islice(batches, window))
+    try:
+        while pending:
+            future = pending.popleft()
+            for batch in islice(batches, 1):
+                pending.append(executor.submit(task, batch))
+            for result in future.result():
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def query(filenames, method='list', params=None, options=None, jobs=None,
+          chunksize=None, window=2):
+    """Iterate over the results of a query run on many route files.
+
+    Files are processed by ``jobs`` worker processes in batches of
+    ``chunksize`` files, up to ``window`` batches per worker are queued
+    ahead. Entries are yielded in file order as soon as the file and all
+    files before it are done, each tagged with the ``file`` key. Files
+    that fail to parse are logged and skipped. Closing the iterator early
+    stops querying the files not started yet.
+    """
+    filenames = list(filenames)
+    jobs = jobs or cpu_count()
+    if jobs == 1 or len(filenames) < 2 or ProcessPoolExecutor is None:
+        if ProcessPoolExecutor is None and jobs > 1:
+            log.warning(_('concurrent.futures not available, '
+                          'running in a single process'))
+        results = (query_file(filename, method, params, options)
+                   for filename in filenames)
+        executor = None
+    else:
+        chunksize = chunksize or chunk_size(len(filenames), jobs)
+        log.debug(_('querying %d files with %d jobs (chunk size: %d)'),
+                  len(filenames), jobs, chunksize)
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        task = partial(query_files, method=method, params=params,
+                       options=options)
+        batches = (filenames[start:start + chunksize]
+                   for start in range(0, len(filenames), chunksize))
+        results = _windowed(executor, task, batches, jobs * window)
+    failed = 0
+    try:
+        for filename, items, error in results:
+            if error is not None:
+                failed += 1
+                log.warning(_('skipping route file %r: %s'), filename, error)
+                continue
+            for item in items:
+                yield item
+    finally:
+        results.close()
+        if executor is not None:
+            executor.shutdown(wait=True)
+    if failed:
+        log.warning(_('%d out of %d route files skipped'), failed,
+                    len(filenames))
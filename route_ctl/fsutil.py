@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""route-ctl file copying helpers."""
+
+from __future__ import absolute_import, unicode_literals, with_statement
+
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+from gettext import translation
+from logging import getLogger
+
+try:
+    import fcntl
+except ImportError:
+    # NOTE: not available on Windows
+    fcntl = None
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+# logging
+log = getLogger(__name__)
+
+# NOTE: ``FICLONE`` ioctl request number (``_IOW(0x94, 9, int)``) on Linux
+FICLONE = 0x40049409
+
+# NOTE: errors meaning that a copy method is not supported for the given
+# pair of files, the next method is tried instead
+UNSUPPORTED_COPY_ERRNOS = frozenset(
+    getattr(errno, name) for name in
+    ('EXDEV', 'ENOSYS', 'EINVAL', 'ENOTSUP', 'EOPNOTSUPP')
+    if hasattr(errno, name))
+
+
+def _copy_file_range(src, dst, offset, count):
+    return os.copy_file_range(src, dst, count, offset)
+
+
+def _sendfile(src, dst, offset, count):
+    return os.sendfile(dst, src, offset, count)
+
+
+def _read_write(src, dst, offset, count, chunk_size=1 << 20):
+    os.lseek(src, offset, os.SEEK_SET)
+    data = os.read(src, min(count, chunk_size))
+    written = 0
+    while written < len(data):
+        written += os.write(dst, data[written:])
+    return len(data)
+
+
+COPY_METHODS = tuple(
+    method for name, method in (('copy_file_range', _copy_file_range),
+                                ('sendfile', _sendfile))
+    if hasattr(os, name)) + (_read_write,)
+
+
+def copy_range(src, dst, offset, count):
+    """Copy ``count`` bytes at ``offset`` of file descriptor ``src`` to the
+    current position of file descriptor ``dst``.
+
+    The copy is done in the kernel with ``os.copy_file_range`` or
+    ``os.sendfile`` where available, falling back to reads and writes.
+    """
+    methods = list(COPY_METHODS)
+    while count > 0:
+        try:
+            copied = methods[0](src, dst, offset, count)
+        except OSError as err:
+            if len(methods) == 1 or err.errno not in UNSUPPORTED_COPY_ERRNOS:
+                raise
+            methods.pop(0)
+            continue
+        if not copied:
+            raise IOError(errno.EIO, _('unexpected end of file'))
+        offset += copied
+        count -= copied
+
+
+def clone_file(src, dst):
+    """Copy a file with its permission bits and timestamps.
+
+    The data is shared with a reflink (``FICLONE``) on file systems that
+    support it, e.g. Btrfs or XFS, and copied with ``copy_range``
+    otherwise.
+    """
+    with open(src, 'rb') as src_file:
+        with open(dst, 'wb') as dst_file:
+            try:
+                if fcntl is None:
+                    raise OSError(errno.ENOSYS, _('reflinks not supported'))
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            except (IOError, OSError) as err:
+                if err.errno not in UNSUPPORTED_COPY_ERRNOS and \
+                        err.errno != errno.ENOTTY:
+                    raise
+                copy_range(src_file.fileno(), dst_file.fileno(), 0,
+                           os.fstat(src_file.fileno()).st_size)
+    shutil.copystat(src, dst)
+
+
+def fsync_dir(path):
+    """Sync a directory, persisting the entries renamed or created in it."""
+    flags = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+    try:
+        fd = os.open(path, flags)
+    except OSError as err:
+        # NOTE: directories cannot be opened on some platforms (Windows)
+        if err.errno in (errno.EACCES, errno.EISDIR, errno.EPERM):
+            return
+        raise
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def file_digest(path, algorithm='sha256', chunk_size=1 << 20):
+    """Return the digest of a file's contents, ``None`` if it is missing."""
+    digest = hashlib.new(algorithm)
+    try:
+        with open(path, 'rb') as file_:
+            for chunk in iter(lambda: file_.read(chunk_size), b''):
+                digest.update(chunk)
+    except IOError as err:
+        if err.errno == errno.ENOENT:
+            return None
+        raise
+    return digest.digest()
+
+
+def file_stat(filename):
+    """Return the ``[path, inode, size, mtime_ns]`` identity of a file."""
+    path = os.path.realpath(filename)
+    status = os.stat(path)
+    # NOTE: PY2 compat: ``st_mtime_ns`` is available since Python 3.3
+    mtime_ns = getattr(status, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(status.st_mtime * 1e9)
+    return [path, status.st_ino, status.st_size, mtime_ns]
+
+
+def atomic_tempfile(target, suffix='.tmp'):
+    """Create a hidden temporary file in the directory of ``target``.
+
+    Returns the ``(fd, path)`` pair. The file is on the same file system as
+    ``target``, so that ``replace_file`` is an atomic rename, and takes the
+    permission bits and ownership of ``target`` if it exists.
+    """
+    dirname, basename = os.path.split(os.path.abspath(target))
+    fd, path = tempfile.mkstemp(
+        dir=dirname, prefix='.{0}.'.format(basename), suffix=suffix)
+    try:
+        try:
+            target_stat = os.stat(target)
+        except OSError as err:
+            if err.errno == errno.ENOENT:
+                return fd, path
+            raise
+        os.fchmod(fd, stat.S_IMODE(target_stat.st_mode))
+        temp_stat = os.fstat(fd)
+        owner = target_stat.st_uid, target_stat.st_gid
+        if owner != (temp_stat.st_uid, temp_stat.st_gid):
+            try:
+                os.fchown(fd, *owner)
+            except OSError as err:
+                if err.errno != errno.EPERM:
+                    raise
+                log.warning(_('unable to keep the owner of %r: %s'),
+                            target, err)
+    except Exception:
+        os.close(fd)
+        os.unlink(path)
+        raise
+    return fd, path
+
+
+def replace_file(src, dst):
+    """Atomically replace ``dst`` with ``src`` on the same file system."""
+    # NOTE: PY2 compat: ``os.replace`` is available since Python 3.3,
+    # ``os.rename`` replaces the destination on POSIX systems too
+    getattr(os, 'replace', os.rename)(src, dst)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""route-ctl in-memory entry indexes."""
+
+from __future__ import absolute_import, unicode_literals
+
+try:
+    unicode
+    basestring
+except NameError:
+    # NOTE: PY2 compat
+    unicode = basestring = str
+
+
+def normalize(value, var='$'):
+    """Normalize an address value for comparison.
+
+    Strips surrounding whitespace and lowercases (IPv6) addresses, variables
+    prefixed by ``var`` are case-sensitive and left as is.
+    """
+    if not isinstance(value, basestring):
+        return value
+    value = value.strip()
+    return value if value.startswith(var) else value.lower()
+
+
+def net_key(item):
+    """Return the normalized ``(network, netmask)`` key of an entry."""
+    return normalize(item.get('network')), normalize(item.get('netmask'))
+
+
+def name_key(item):
+    """Return the ``name`` key of an entry."""
+    return item.get('name')
+
+
+class RouteIndex(object):
+    """Hash indexes of entries on ``name`` and ``(network, netmask)``.
+
+    Keeps conflict checks O(1) per entry while entries are added or removed.
+    """
+
+    def __init__(self, items=()):
+        self.__names = {}
+        self.__nets = {}
+        for item in items:
+            self.add(item)
+
+    @staticmethod
+    def __add(index, key, item):
+        index.setdefault(key, []).append(item)
+
+    @staticmethod
+    def __discard(index, key, item):
+        items = index.get(key, [])
+        for position, other in enumerate(items):
+            if other is item:
+                del items[position]
+                break
+        if not items:
+            index.pop(key, None)
+
+    def add(self, item):
+        """Index an entry."""
+        self.__add(self.__names, name_key(item), item)
+        self.__add(self.__nets, net_key(item), item)
+
+    def discard(self, item):
+        """Remove an entry (the same object) from the index if present."""
+        self.__discard(self.__names, name_key(item), item)
+        self.__discard(self.__nets, net_key(item), item)
+
+    def by_name(self, name):
+        """Return entries with a given name."""
+        return list(self.__names.get(name, ()))
+
+    def by_net(self, network, netmask):
+        """Return entries with a given network/netmask pair."""
+        key = normalize(network), normalize(netmask)
+        return list(self.__nets.get(key, ()))
+
+    def has_name(self, item):
+        """Check if an entry with the same name is indexed."""
+        return name_key(item) in self.__names
+
+    def has_net(self, item):
+        """Check if an entry with the same network/netmask pair is indexed."""
+        return net_key(item) in self.__nets
+
+    def __len__(self):
+        return sum(len(items) for items in self.__names.values())
+
+
+class FieldIndex(object):
+    """Hash indexes of entry positions in a list on any key.
+
+    The index of a key is built on its first lookup and kept, which pays
+    off for long-lived entry lists (e.g. in the daemon).
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.__fields = {}
+
+    def positions(self, key, value):
+        """Return the sorted positions of entries with a given value.
+
+        Returns ``None`` if the values of the key cannot be indexed.
+        """
+        index = self.__fields.get(key)
+        if index is None:
+            index = {}
+            try:
+                for position, item in enumerate(self.items):
+                    index.setdefault(item.get(key, ''), []).append(position)
+            except TypeError:
+                # NOTE: unhashable values (e.g. lists from JSON input)
+                return None
+            self.__fields[key] = index
+        try:
+            return index.get(value, [])
+        except TypeError:
+            return None
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""route-ctl advisory file locking."""
+
+from __future__ import absolute_import, unicode_literals, with_statement
+
+import errno
+import os
+import time
+from gettext import translation
+from logging import getLogger
+
+try:
+    import fcntl
+except ImportError:
+    # NOTE: not available on Windows
+    fcntl = None
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+
+class LockError(Exception):
+    pass
+
+
+class LockTimeoutError(LockError):
+    pass
+
+
+def flock(fd, operation, timeout=None, poll_interval=0.05, path=None):
+    """Take a ``flock`` of an open file, waiting up to ``timeout`` seconds.
+
+    Without a ``timeout`` waits indefinitely, otherwise gives up with a
+    ``LockTimeoutError`` (naming ``path``).
+    """
+    if timeout is None:
+        fcntl.flock(fd, operation)
+        return
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+            return
+        except (IOError, OSError) as err:
+            if err.errno not in (errno.EAGAIN, errno.EACCES,
+                                 errno.EWOULDBLOCK):
+                raise
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise LockTimeoutError(
+                _('timed out waiting for lock: %r') % (path or fd,))
+        time.sleep(min(poll_interval, remaining))
+
+
+def lock_shared(fd, timeout=None, path=None):
+    """Lock an open route file for reading, waiting up to ``timeout``
+    seconds for in-place writers (see ``flock``).
+
+    The lock is released when the file is closed.
+    """
+    if fcntl is not None:
+        flock(fd, fcntl.LOCK_SH, timeout, path=path)
+
+
+def lock_exclusive(fd, timeout=None, path=None):
+    """Lock an open route file for modifying it in place, waiting up to
+    ``timeout`` seconds for readers (see ``lock_shared``).
+
+    The lock is released when the file is closed.
+    """
+    if fcntl is not None:
+        flock(fd, fcntl.LOCK_EX, timeout, path=path)
+
+
+class FileLock(object):
+    """Exclusive advisory lock of a route file for writers.
+
+    The lock is taken with ``flock`` on a separate ``<file>.lock`` file, as
+    the route file itself is replaced on every atomic write. The lock is
+    re-entrant within the same object.
+
+    Readers take no writer lock. They take a shared ``flock`` of the route
+    file itself (``lock_shared``), which only writers modifying the file in
+    place (appends, non-atomic writes, append recovery) take exclusively
+    (``lock_exclusive``). Readers thus never wait for atomic writers and
+    never see a half-written file. Readers are not told whether a writer
+    modifies the file in place, so they always take the shared lock.
+
+    With a ``timeout`` (in seconds) ``acquire`` gives up with a
+    ``LockTimeoutError``, otherwise it waits indefinitely.
+    """
+
+    def __init__(self, filename, timeout=None, poll_interval=0.05):
+        self.path = '{0}.lock'.format(filename)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.__fd = None
+        self.__depth = 0
+        self.__log = getLogger(__name__)
+
+    @property
+    def locked(self):
+        return self.__depth > 0
+
+    def acquire(self):
+        """Take the lock, waiting up to ``timeout`` seconds."""
+        if self.__depth:
+            self.__depth += 1
+            return
+        if fcntl is None:
+            self.__log.debug(_('file locking not supported, not locking'))
+            self.__depth = 1
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self.__flock(fd)
+        except Exception:
+            os.close(fd)
+            raise
+        self.__fd = fd
+        self.__depth = 1
+
+    def __flock(self, fd):
+        if self.timeout is None:
+            self.__log.debug(_('waiting for lock: %r'), self.path)
+        flock(fd, fcntl.LOCK_EX, self.timeout, self.poll_interval, self.path)
+
+    def release(self):
+        """Release the lock (the outermost ``release`` unlocks)."""
+        if not self.__depth:
+            raise LockError(_('lock not held: %r') % (self.path,))
+        self.__depth -= 1
+        if self.__depth or self.__fd is None:
+            return
+        # NOTE: the lock file is kept, unlinking it would let another
+        # process lock a different inode under the same name
+        fcntl.flock(self.__fd, fcntl.LOCK_UN)
+        os.close(self.__fd)
+        self.__fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
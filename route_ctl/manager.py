@@ -3,13 +3,25 @@
 
 from __future__ import absolute_import, unicode_literals, with_statement
 
+import hashlib
 import json
 import re
+from collections import Counter, defaultdict, deque
+from functools import wraps
 from gettext import translation
+from itertools import islice
 from logging import getLogger
 
 from .builder import RouteBuilder
+from .decoders import decode
+from .fsutil import file_stat
+from .index import RouteIndex
+from .lock import FileLock
 from .parser import RouteParser
+from .query import Query
+from .record import FIELDS, RouteRecord, project
+from .trie import RouteTrie
+from .writer import DEFAULT_BUFFER_SIZE
 
 try:
     from itertools import ifilter as filter, imap as map, izip as zip
@@ -46,20 +58,388 @@ class InvalidOperation(RouteError):
     pass
 
 
-class RouteManager(RouteParser, RouteBuilder):
+def matcher(value, key, ignore_case=False, exact_match=True):
+    """Return a predicate matching entries by a key-value criteria."""
+    if not ignore_case:
+        if exact_match:
+            return lambda item: value == item.get(key, '')
+        return lambda item: value in item.get(key, '')
+    regexp = re.compile(value, flags=re.IGNORECASE)
+    if exact_match:
+        return lambda item: regexp.match(item.get(key, ''))
+    return lambda item: regexp.search(item.get(key, ''))
+
+
+def _close(items):
+    close = getattr(items, 'close', None)
+    if close is not None:
+        close()
+
+
+def select(predicate, items):
+    """Iterate over entries matching a predicate.
+
+    ``items`` (e.g. a parser generator, which closes its file) are closed
+    as soon as iteration stops, even if it stops early.
+    """
+    try:
+        for item in items:
+            if predicate(item):
+                yield item
+    finally:
+        _close(items)
+
+
+def paginate(items, offset=0, limit=None):
+    """Iterate over up to ``limit`` entries after skipping ``offset``.
+
+    Stops consuming ``items`` once the last entry is produced and closes
+    them right away.
+    """
+    stop = None if limit is None else offset + limit
+    try:
+        for item in islice(items, offset, stop):
+            yield item
+    finally:
+        _close(items)
+
+
+def entry_digest(item):
+    """Return the digest of an entry's canonical JSON form.
+
+    Only the rendered ``FIELDS`` count, missing, ``None`` and empty values
+    are the same, as they render the same.
+    """
+    canonical = json.dumps(
+        dict((key, item[key]) for key in FIELDS if item.get(key) not in
+             (None, '')),
+        sort_keys=True, separators=(',', ':'), default=dict)
+    return hashlib.sha1(canonical.encode('utf-8')).digest()
+
+
+def locked(method):
+    """Run a ``RouteManager`` method holding the writer lock."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Transaction(object):
+    """Batch of entry changes applied in memory and written once.
+
+    The file is parsed when the transaction is started and written by
+    ``commit`` only if anything changed. Used as a context manager the
+    transaction is committed on success and discarded on error. The
+    writer lock of the manager is held from the start until the
+    transaction is committed or discarded.
+
+    Example:
+
+    >>> with RouteManager('routes.pp').transaction() as tx:
+    ...     tx.create({'name': '10.1.0.0/16', 'network': '10.1.0.0'})
+    ...     tx.delete('name', 'default')
 
-    def __init__(self, filename, dict_key='routes'):
-        RouteParser.__init__(self)
-        RouteBuilder.__init__(self)
+    """
+
+    OPERATIONS = ('create', 'update', 'delete', 'replace')
+
+    def __init__(self, manager):
+        self.__manager = manager
+        self.__log = getLogger(__name__)
+        self.__locked = False
+        manager.lock.acquire()
+        self.__locked = True
+        try:
+            manager.recover()
+            self.__reset(manager._parse_for_write())
+        except Exception:
+            self.__release()
+            raise
+        self.changed = False
+        self.counts = dict((operation, 0) for operation in self.OPERATIONS)
+
+    def __release(self):
+        if self.__locked:
+            self.__locked = False
+            self.__manager.lock.release()
+
+    def __reset(self, items):
+        self.__items = []
+        self.__positions = {}
+        self.__index = RouteIndex()
+        for item in items:
+            self.__insert(item)
+
+    def __insert(self, item):
+        self.__positions[id(item)] = len(self.__items)
+        self.__items.append(item)
+        self.__index.add(item)
+
+    def __remove(self, item):
+        self.__items[self.__positions.pop(id(item))] = None
+        self.__index.discard(item)
+
+    def __iter__(self):
+        """Iterate over the current entries."""
+        return (item for item in self.__items if item is not None)
+
+    def __len__(self):
+        return len(self.__index)
+
+    def create(self, item, force=False):
+        """Create a new entry."""
+        if self.__index.has_name(item) or self.__index.has_net(item):
+            if not force:
+                raise EntryAlreadyExistsError(
+                    _('unable to create item. A matching entry already exists.'))
+            self.__log.warning(_('forcing route entry creation (dangerous)'))
+        self.__insert(item)
+        self.counts['create'] += 1
+        self.changed = True
+
+    def update(self, item, create=False):
+        """Update the entry with the same name, optionally create it.
+
+        Keys missing from ``item`` keep their current values.
+        """
+        found = self.__index.by_name(item.get('name'))
+        if not found:
+            if not create:
+                raise EntryNotFoundError(
+                    _('unable to update entry. No matching entry found.'))
+            return self.create(item)
+        if len(found) > 1:
+            raise MultipleEntriesFoundError(
+                _('unable to update entry. Multiple entries found.'))
+        current = found[0]
+        updated = dict(current)
+        updated.update(item)
+        if updated == dict(current):
+            return
+        same_net = self.__index.by_net(updated.get('network'),
+                                       updated.get('netmask'))
+        if any(other is not current for other in same_net):
+            raise EntryAlreadyExistsError(
+                _('unable to update entry. A matching entry already exists.'))
+        position = self.__positions.pop(id(current))
+        self.__index.discard(current)
+        self.__positions[id(updated)] = position
+        self.__items[position] = updated
+        self.__index.add(updated)
+        self.counts['update'] += 1
+        self.changed = True
+
+    def delete(self, key, value, ignore_case=False, exact_match=True):
+        """Delete entries matching key-value, return their count."""
+        if key == 'name' and exact_match and not ignore_case:
+            found = self.__index.by_name(value)
+        else:
+            found = list(filter(
+                matcher(value, key, ignore_case, exact_match), self))
+        for item in found:
+            self.__remove(item)
+        self.counts['delete'] += len(found)
+        self.changed = self.changed or bool(found)
+        return len(found)
+
+    def replace(self, items):
+        """Replace all entries."""
+        self.__reset(items)
+        self.counts['replace'] += 1
+        self.changed = True
+
+    def apply(self, operation):
+        """Apply an operation given as a dictionary.
+
+        The ``op`` key names the operation, the other keys are:
+
+        - ``create``: the entry, optionally ``force``;
+        - ``update``: the entry, optionally ``create``;
+        - ``delete``: ``value``, optionally ``key`` (``name`` by default),
+          ``ignore_case`` and ``exact_match``;
+        - ``replace``: ``routes``, a list of entries.
+        """
+        operation = dict(operation)
+        name = operation.pop('op', None)
+        if name == 'create':
+            force = operation.pop('force', False)
+            return self.create(operation, force=force)
+        elif name == 'update':
+            create = operation.pop('create', False)
+            return self.update(operation, create=create)
+        elif name == 'delete':
+            return self.delete(operation.get('key', 'name'),
+                               operation['value'],
+                               operation.get('ignore_case', False),
+                               operation.get('exact_match', True))
+        elif name == 'replace':
+            return self.replace(operation['routes'])
+        raise InvalidOperation(_('unknown operation: %r') % (name,))
+
+    def commit(self):
+        """Write the entries if anything changed and release the lock."""
+        try:
+            if not self.changed:
+                self.__log.info(_('nothing changed, not writing'))
+                return
+            self.__log.info(_('committing: %s'), ', '.join(
+                '{0} {1}'.format(self.counts[name], name)
+                for name in self.OPERATIONS))
+            self.__manager.write(iter(self))
+            self.changed = False
+        finally:
+            self.__release()
+
+    def rollback(self):
+        """Discard the changes and release the lock."""
+        self.__log.warning(_('transaction discarded'))
+        self.__release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class RouteManager(RouteParser, RouteBuilder):
+    """Read and modify the entries of a route file.
+
+    Writers (``create_item``, ``create_items``, ``replace`` and
+    transactions) hold an exclusive lock of the file for the whole
+    read-modify-write cycle, waiting up to ``lock_timeout`` seconds for
+    it. Readers take no writer lock and see the last committed file,
+    they only wait for writers modifying the file in place (``append``
+    and append recovery, see ``FileLock``), also up to ``lock_timeout``
+    seconds.
+    """
+
+    def __init__(self,
+                 filename,
+                 dict_key='routes',
+                 use_mmap=False,
+                 cache=None,
+                 compact=False,
+                 input_format='json',
+                 append=False,
+                 splice=False,
+                 backup=None,
+                 jobs=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE,
+                 durability='none',
+                 lock_timeout=None):
+        RouteParser.__init__(self,
+                             use_mmap=use_mmap,
+                             jobs=jobs,
+                             record=RouteRecord if compact else dict,
+                             intern_values=compact,
+                             lock_timeout=lock_timeout)
+        RouteBuilder.__init__(self,
+                              backup=backup,
+                              buffer_size=buffer_size,
+                              durability=durability,
+                              lock_timeout=lock_timeout)
         self.filename = filename
+        self.lock = FileLock(filename, timeout=lock_timeout)
         self.__log = getLogger(__name__)
         self.__key = dict_key
+        self.__cache = cache
+        self.__input_format = input_format
+        self.__append = append
+        self.__splice = splice
+        self.__spans = None
+
+    def parse(self, filename=None, fields=None):
+        """Parse all entries or load them from the parse ``cache``.
+
+        With ``fields`` only these keys are kept in entries (see
+        ``RouteParser.parse``). The cache always stores whole entries.
+        """
+        if self.__cache is None or filename is not None:
+            return RouteParser.parse(self, filename, fields)
+        return self.__parse_cached(fields)
+
+    def __parse_cached(self, fields=None):
+        """Load entries from the parse cache, reparse and store on a miss."""
+        items = self.__cache.load(self.filename)
+        if items is None:
+            stat = file_stat(self.filename)
+            items = list(RouteParser.parse(self))
+            self.__cache.store(self.filename, items, stat=stat)
+        else:
+            items = map(self.build_record, items)
+        for item in items:
+            yield item if fields is None else project(item, fields)
+
+    def _parse_for_write(self):
+        """Parse the entries a writer is about to modify.
+
+        With ``splice`` the entry block spans are recorded on the way, so
+        that ``write`` does not have to scan the file again.
+        """
+        if not self.__splice:
+            return list(self.parse())
+        stat = file_stat(self.filename)
+        spans = list(self.parse_spans())
+        self.__spans = stat, spans
+        return [route for route, _start, _stop in spans]
+
+    def __current_spans(self):
+        """Return the recorded entry block spans if the file is unchanged
+        since, parse them otherwise.
+        """
+        recorded, self.__spans = self.__spans, None
+        if recorded is not None and recorded[0] == file_stat(self.filename):
+            return recorded[1]
+        return list(self.parse_spans())
+
+    def __refresh_cache(self):
+        """Store the entries of the written file in the parse ``cache``."""
+        if self.__cache is not None:
+            self.__log.debug(_('refreshing parse cache'))
+            stat = file_stat(self.filename)
+            self.__cache.store(
+                self.filename, list(RouteParser.parse(self)), stat=stat)
+
+    def write(self, items, *args, **kwargs):
+        """Write entries to file and refresh the parse ``cache``.
+
+        With ``splice`` only new and changed entry blocks are rendered, the
+        rest of the file is copied verbatim. The entry block spans recorded
+        by the last ``_parse_for_write`` are reused if the file has not
+        changed since.
+        """
+        if self.__splice:
+            spans = self.__current_spans()
+            footer = None if spans else self.find_footer()
+            if spans or footer is not None:
+                skip_unchanged = kwargs.get('skip_unchanged', False)
+                if self.splice(items, spans, footer,
+                               skip_unchanged=skip_unchanged):
+                    self.__refresh_cache()
+                return
+            self.__log.warning(
+                _('no entry blocks or file footer found, rewriting the whole file'))
+        stats = RouteBuilder.write(self, items, *args, **kwargs)
+        if stats is not None:
+            self.__refresh_cache()
+        return stats
+
+    def append(self, items, offset):
+        """Append entries in place and refresh the parse ``cache``."""
+        RouteBuilder.append(self, items, offset)
+        self.__refresh_cache()
 
     def from_json(self, json_file):
-        """Read items from a JSON file."""
+        """Iteratively read items from a JSON (or NDJSON) file."""
         file_name = getattr(json_file, 'name', repr(json_file))
         self.__log.info(_('loading entries from JSON file: %r'), file_name)
-        return json.load(json_file)[self.__key]
+        return decode(json_file, self.__input_format, self.__key)
 
     def __items_or_json(self, items, json_file):
         """Pick either items or parse a JSON file which are mutually exclusive."""
@@ -70,29 +450,92 @@ class RouteManager(RouteParser, RouteBuilder):
         raise InvalidOperation(
             _("cannot use both arguments: 'items' and 'json_file'"))
 
+    def iter_items(self, fields=None):
+        """Iterate over all entries.
+
+        With ``fields`` only these keys are parsed and kept in entries.
+        """
+        self.__log.info(_('listing all entries'))
+        return self.parse(fields=fields)
+
     def list_items(self):
         """List all entries."""
-        self.__log.info(_('listing all entries'))
-        items = self.parse()
-        return {self.__key: list(items)}
+        return {self.__key: list(self.iter_items())}
+
+    def iter_found(self, value, key, ignore_case=False, exact_match=True,
+                   offset=0, limit=None, fields=None):
+        """Iterate over entries matching key-value.
+
+        With ``offset`` and ``limit`` only a slice of the matching entries
+        is produced and parsing stops right after the last one.
+
+        With ``fields`` only these keys (and the searched ``key``) are
+        parsed and kept in entries.
+        """
+        self.__log.info(_('listing entries matching criteria'))
+        predicate = matcher(value, key, ignore_case, exact_match)
+        if fields is not None:
+            fields = frozenset(fields) | frozenset([key])
+        items = self.__parse_containing(
+            None if ignore_case else value, fields)
+        return paginate(select(predicate, items), offset, limit)
 
     def find_items(self, value, key, ignore_case=False, exact_match=True):
         """List entries matching key-value."""
-        self.__log.info(_('listing entries matching criteria'))
-        if not ignore_case:
-            if exact_match:
-                matcher = lambda item: value == item.get(key, '')
-            else:
-                matcher = lambda item: value in item.get(key, '')
-        else:
-            regexp = re.compile(value, flags=re.IGNORECASE)
-            if exact_match:
-                matcher = lambda item: regexp.match(item.get(key, ''))
-            else:
-                matcher = lambda item: regexp.search(item.get(key, ''))
-        items = filter(matcher, self.parse())
+        items = self.iter_found(value, key, ignore_case, exact_match)
         return {self.__key: list(items)}
 
+    def iter_query(self, query, ignore_case=False, offset=0, limit=None,
+                   fields=None):
+        """Iterate over entries matching a query (see ``Query``).
+
+        The query is compiled once and evaluated in a single pass, which
+        stops early with a ``limit`` and parses only the ``fields`` and the
+        keys of the query (see ``iter_found``).
+        """
+        if not isinstance(query, Query):
+            query = Query(query, ignore_case)
+        self.__log.info(_('listing entries matching query: %s'), query)
+        if fields is not None:
+            fields = frozenset(fields) | query.keys
+        items = self.__parse_containing(query.literal, fields)
+        return paginate(select(query, items), offset, limit)
+
+    def __parse_containing(self, literal, fields=None):
+        """Parse only the entries containing a literal the searched entries
+        must contain (see ``RouteParser.parse_containing``), if any.
+
+        Entries from the parse ``cache`` are all loaded instead.
+        """
+        if not literal or self.__cache is not None:
+            return self.parse(fields=fields)
+        self.__log.debug(_('parsing entry blocks containing %r'), literal)
+        return self.parse_containing(literal, fields=fields)
+
+    def transaction(self):
+        """Start a transaction (see ``Transaction``)."""
+        return Transaction(self)
+
+    def build_trie(self, items=None):
+        """Build a prefix trie of entries for CIDR queries."""
+        trie = RouteTrie(items if items is not None else self.parse())
+        if trie.skipped:
+            self.__log.debug(_('%d entries without a literal prefix skipped'),
+                             trie.skipped)
+        return trie
+
+    def find_covering(self, address, trie=None):
+        """List entries containing an address, longest prefix first."""
+        self.__log.info(_('listing entries containing address: %r'), address)
+        trie = trie if trie is not None else self.build_trie()
+        return {self.__key: trie.covering(address)}
+
+    def find_within(self, network, trie=None):
+        """List entries inside a network (CIDR notation)."""
+        self.__log.info(_('listing entries within network: %r'), network)
+        trie = trie if trie is not None else self.build_trie()
+        return {self.__key: trie.within(network)}
+
     def _find_same(self, item, items=None, keys=('name')):
         """Find all items with matching values for given set of keys."""
         items = items if items else self.parse()
@@ -100,24 +543,35 @@ class RouteManager(RouteParser, RouteBuilder):
             return all([this.get(key) == item.get(key) for key in keys])
         return filter(same, items)
 
-    def _exists(self, item, items=None):
-        """Check if an entry is already present."""
+    def _exists(self, item, items=None, index=None):
+        """Check if an entry is already present.
+
+        Pass an ``index`` (a ``RouteIndex`` of ``items``) to make repeated
+        checks O(1).
+        """
         self.__log.debug(_('checking if entry exists'))
-        items = items if items else self.parse()
-        found_with_same_name = any(self._find_same(item, items, keys=('name',)))
-        found_with_same_net = any(self._find_same(item, items, keys=('network', 'netmask')))
-        if found_with_same_name:
+        if index is None:
+            index = RouteIndex(items if items else self.parse())
+        if index.has_name(item):
             self.__log.debug(_('entry with matching name exists'))
             return True
-        elif found_with_same_net:
+        elif index.has_net(item):
             self.__log.info(_('entry with matching subnet/netmask pair exists'))
             return True
         return False
 
+    @locked
+    def create_item(self, item, force=False, items=None):
+        """Create a new entry.
 
-    def create_item(self, item, force=False):
-        """Create a new entry."""
-        items = list(self.parse())  # eager read
+        With ``append`` the entry is written in place before the file
+        footer instead of rewriting the whole file.
+
+        The current entries are parsed unless passed as ``items`` by a
+        caller holding the writer lock and knowing them to be current.
+        """
+        self.recover()
+        items = self._parse_for_write() if items is None else list(items)
         if self._exists(item, items):
             if not force:
                 raise EntryAlreadyExistsError(
@@ -125,23 +579,37 @@ class RouteManager(RouteParser, RouteBuilder):
             else:
                 self.__log.warning(_('forcing route entry creation (dangerous)'))
         self.__log.info(_('creating a new entry'))
+        if self.__append:
+            offset = self.find_footer()
+            if offset is not None:
+                self.append([item], offset)
+                return
+            self.__log.warning(
+                _('file footer not found, rewriting the whole file'))
         items.append(item)
         self.write(items)
 
+    @locked
     def create_items(self, items=None, json_file=None):
         """Create many entries."""
         new_items = self.__items_or_json(items, json_file)
-        current_items = list(self.parse())  # eager read
-        total = len(new_items)
+        self.recover()
+        current_items = self._parse_for_write()
+        index = RouteIndex(current_items)
+        total = 0
         conflicting = 0
         added = 0
         for item in new_items:
-            if self._exists(item, current_items):
-                self.__log.debug(_('item already exists: %r'), json.dumps(item))
+            total += 1
+            if self._exists(item, current_items, index):
+                self.__log.debug(_('item already exists: %r'),
+                                 json.dumps(item, default=dict))
                 conflicting += 1
             else:
-                self.__log.info(_('adding item: %r'), json.dumps(item))
+                self.__log.info(_('adding item: %r'),
+                                json.dumps(item, default=dict))
                 current_items.append(item)
+                index.add(item)
                 added += 1
         if conflicting == total:
             self.__log.warning(_('no new entries added - all entries already exist'))
@@ -155,49 +623,85 @@ class RouteManager(RouteParser, RouteBuilder):
 
     def update_item(self, item, create=False):
         """Update an existing entry or create a new one."""
-        items = list(self.parse())  # eager read
-        if not self._exists(item, items):
-            if not create:
-                raise EntryNotFoundError(
-                    _('unable to update entry. No matching entry found.'))
-            self.__log.info(_('creating a new entry'))
-            items.append(item)
-        else:
-            self.__log.info(_('updating an existing entry'))
-            raise NotImplementedError(_('Not implemented'))  # TODO
-        self.write(items)
+        self.__log.info(_('updating an entry'))
+        with self.transaction() as tx:
+            tx.update(item, create=create)
 
     def update_items(self, items=None, json_file=None, create=True):
         """Update many entries."""
         self.__log.info(_('updating entries'))
         new_items = self.__items_or_json(items, json_file)
-        current_items = list(self.parse())  # eager read
-        updated = 0
-        added = 0
-        for item in new_items:
-            if not self._exists(item, current_items):
-                if not create:
-                    raise EntryNotFoundError(
-                        _('Unable to update entry. No matching entry found.'))
-                self.__log.info(_('Creating a new entry'))
-                added += 1
-                current_items.append(item)
-            else:
-                updated += 1
-                raise NotImplementedError(_('Not implemented'))  # TODO
-        self.__log.info(_('Updated items: %d, added items: %d'), updated, added)
-        self.write(current_items)
+        with self.transaction() as tx:
+            for item in new_items:
+                tx.update(item, create=create)
+        self.__log.info(_('Updated items: %d, added items: %d'),
+                        tx.counts['update'], tx.counts['create'])
 
     def delete_items(self, key, value, ignore_case=False, exact_match=True):
         """Delete entries."""
         self.__log.info(_('Deleting entries'))
-        raise NotImplementedError(_('Not implemented'))  # TODO 
-
+        with self.transaction() as tx:
+            deleted = tx.delete(key, value, ignore_case, exact_match)
+        if not deleted:
+            raise EntryNotFoundError(
+                _('unable to delete entries. No matching entry found.'))
+        self.__log.info(_('Deleted items: %d'), deleted)
+
+    @locked
     def replace(self, items=None, json_file=None):
-        """Replace all entries."""
+        """Replace all entries.
+
+        Entries read from ``json_file`` are streamed straight to the output.
+        The file is left untouched (no write, no backup) if the output is
+        identical to it.
+        """
         self.__log.info(_('Replacing all entries'))
         items = self.__items_or_json(items, json_file)
-        self.write(items)
+        self.write(items, skip_unchanged=True)
+
+    def plan(self, items=None, json_file=None):
+        """Compare entries to the current ones without writing.
+
+        Entries are matched by name and compared by the digest of their
+        canonical form (see ``entry_digest``). Entries sharing a name are
+        matched in order, like blocks of a spliced write, and reported
+        in the log. Returns a dictionary of ``added`` and ``removed``
+        entries and ``changed`` pairs of ``old`` and ``new`` entries.
+        """
+        self.__log.info(_('Planning replacement of all entries'))
+        items = self.__items_or_json(items, json_file)
+        current = defaultdict(deque)
+        order = []
+        for item in self.parse():
+            current[item.get('name')].append(item)
+            order.append(item)
+        self.__warn_duplicates(
+            Counter(item.get('name') for item in order), _('current'))
+        added = []
+        changed = []
+        matched = set()
+        names = Counter()
+        for item in items:
+            name = item.get('name')
+            names[name] += 1
+            if not current.get(name):
+                added.append(item)
+                continue
+            old = current[name].popleft()
+            matched.add(id(old))
+            if entry_digest(item) != entry_digest(old):
+                changed.append({'old': old, 'new': item})
+        self.__warn_duplicates(names, _('new'))
+        removed = [item for item in order if id(item) not in matched]
+        return {'added': added, 'removed': removed, 'changed': changed}
+
+    def __warn_duplicates(self, names, kind):
+        """Log names shared by many entries."""
+        duplicates = sorted('{0}'.format(name)
+                            for name, count in names.items() if count > 1)
+        if duplicates:
+            self.__log.warning(_('duplicate names in %s entries: %s'),
+                               kind, ', '.join(duplicates))
 
     def validate_item(self, item):
         """Validate an entry."""
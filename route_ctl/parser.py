@@ -3,10 +3,24 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import mmap
+import multiprocessing
+import os
 import re
+from contextlib import contextmanager
+from functools import partial
 from gettext import translation
 from logging import getLogger
 
+from .lock import lock_shared
+from .record import INTERNED_FIELDS
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # NOTE: PY2 compat: requires the ``futures`` backport
+    ProcessPoolExecutor = None
+
 # l18n
 _ = translation(__name__, 'locale', fallback=True).gettext
 
@@ -60,6 +74,61 @@ CLOSE_BRACE = re.compile(
     ''',
     flags=re.VERBOSE)
 
+# NOTE: literal every ``ROUTE_BLOCK_HEAD`` line contains
+BLOCK_HEAD_KEYWORD = b'network_route'
+
+# NOTE: single-dispatch classifier for entry block lines. Closing brace is
+# tried first, then a key-value pair, exactly like the ``CLOSE_BRACE`` and
+# ``ROUTE_BLOCK_BODY`` pair, but with a single match per line.
+ROUTE_BLOCK_LINE = re.compile(
+    r'''
+    ^(\s*)                      # indentation
+    (?:
+        (?P<close>})            # closing brace
+      |
+        (?P<key>\S+)\s*         # Ruby hash key
+        =>\s*                   # Ruby hash arrow
+        (?P<quote>[\'"]?)       # maybe quotes
+        (?P<value>.*?)          # Ruby hash value
+        (?P=quote)              # closing quote
+        ,?                      # maybe a comma
+                                # (commas are optional for the last item)
+    )
+    [^\S\n\r]*                  # any non-line-end whitespace
+    (\#.*)?                     # maybe a comment
+    $
+    ''',
+    flags=re.VERBOSE)
+
+
+def cpu_count():
+    """Return the number of usable CPUs, respecting the CPU affinity."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+def key_pattern(fields):
+    """Compile a pattern matching the entry block lines that may hold one of
+    ``fields`` (or close the block), for ``ROUTE_BLOCK_LINE`` syntax.
+
+    Other lines can be skipped without a full line match.
+    """
+    keys = '|'.join(re.escape(key) for key in sorted(fields))
+    return re.compile(r'^\s*(?:}|(?:' + keys + r')\s*=>)')
+
+
+def bytes_pattern(pattern):
+    """Compile a ``bytes`` counterpart of a ``str`` regular expression.
+
+    The counterpart is compiled in ``MULTILINE`` mode so that it can be
+    matched against a single line of a larger buffer with ``pos`` and
+    ``endpos``.
+    """
+    flags = (pattern.flags & ~re.UNICODE) | re.MULTILINE
+    return re.compile(pattern.pattern.encode('utf-8'), flags)
+
 
 class RouteParserError(Exception):
     pass
@@ -81,6 +150,28 @@ class RouteParser(object):
     The parser class is multiple inheritance safe and can be used as a mixin
     for other components.
 
+    Entry block lines are classified with a single ``block_line`` match per
+    line. Passing custom ``block_body`` or ``block_close`` patterns (or
+    ``block_line=None``) selects the two-pattern engine instead.
+
+    With ``use_mmap`` files are memory-mapped and scanned as bytes, only the
+    kept names, keys and values are decoded (with ``encoding``).
+
+    Entries are ``dict`` objects unless another ``record`` type (e.g. the
+    compact ``RouteRecord``) is given. With ``intern_values`` keys and
+    recurring values (see ``INTERNED_FIELDS``) share a single string object
+    across entries.
+
+    With ``jobs`` greater than one files are split in byte ranges parsed by
+    as many worker processes (see ``iter_chunks``).
+
+    Files are read under a shared lock (see ``lock_shared``), waiting up to
+    ``lock_timeout`` seconds for writers modifying them in place.
+
+    Parsing methods take an optional ``fields`` projection: only these keys
+    are extracted and kept in entries, lines of other keys are skipped
+    with a cheap prefix match where possible.
+
     See the `pydoc` generated docs for public API reference.
     """
     def __init__(self,
@@ -90,14 +181,32 @@ class RouteParser(object):
                  block_body=ROUTE_BLOCK_BODY,
                  block_close=CLOSE_BRACE,
                  file_header=ROUTE_FILE_HEADER,
-                 file_footer=CLOSE_BRACE):
+                 file_footer=CLOSE_BRACE,
+                 block_line=ROUTE_BLOCK_LINE,
+                 use_mmap=False,
+                 encoding='utf-8',
+                 record=dict,
+                 intern_values=False,
+                 jobs=None,
+                 lock_timeout=None):
         self.filename = filename
         self.__lines = iter(lines) if lines else lines
         self.__block_head = block_head
         self.__block_body = block_body
         self.__block_close = block_close
+        if block_body is not ROUTE_BLOCK_BODY or block_close is not CLOSE_BRACE:
+            # NOTE: honour custom body/close patterns over the classifier
+            block_line = None
+        self.__block_line = block_line
+        self.__use_mmap = use_mmap
+        self.__encoding = encoding
+        self.__bytes_patterns = None
+        self.__record = record
+        self.__interned = {} if intern_values else None
         self.__file_header = file_header
         self.__file_footer = file_footer
+        self.__jobs = jobs
+        self.__lock_timeout = lock_timeout
         self.__log = getLogger(__name__)
 
     def __open_file(self, filename=None):
@@ -109,6 +218,12 @@ class RouteParser(object):
         if self.filename and not self.__lines or getattr(self.__lines, 'closed', False):
             self.__log.debug(_('Opening file for reading'))
             self.__lines = open(self.filename, mode='r')
+            try:
+                lock_shared(self.__lines.fileno(), self.__lock_timeout,
+                            self.filename)
+            except Exception:
+                self.__lines.close()
+                raise
 
     def __close_file(self):
         """Close file if needed."""
@@ -154,8 +269,20 @@ class RouteParser(object):
         except RouteParserError:
             raise EndTokenNotFoundError(_('No match for file footer'))
 
-    def __parse_one(self):
+    def __prefilter(self, fields, bytes_mode=False):
+        """Return the line prefilter of a projection (see ``key_pattern``).
+
+        Only available for the default classifier, ``None`` otherwise.
+        """
+        if fields is None or self.__block_line is not ROUTE_BLOCK_LINE:
+            return None
+        pattern = key_pattern(fields)
+        return (bytes_pattern(pattern) if bytes_mode else pattern).match
+
+    def __parse_one(self, fields=None, prefilter=None):
         """Parse one entry block."""
+        if self.__block_line is not None:
+            return self.__classify_one(fields, prefilter)
         route = self.__find_block_start()
         # begin code block body parsing
         for line in self.__lines:
@@ -167,27 +294,485 @@ class RouteParser(object):
                 # NOTE: 'key' and 'value' named capture groups are expected
                 # in the regular expression pattern
                 key = item['key']
-                value = item['value']
-                route[key] = value
+                if fields is None or key in fields:
+                    route[key] = item['value']
+        else:
+            raise EndTokenNotFoundError(_('No match for code block end'))
+        return route if fields is None else self.__project_head(route, fields)
+
+    def __classify_one(self, fields=None, prefilter=None):
+        """Parse one entry block classifying each body line only once."""
+        route = self.__find_block_start()
+        classify = self.__block_line.match
+        for line in self.__lines:
+            # NOTE: cheap pre-dispatch: lines without an arrow or a brace
+            # (blank lines, comments) can never match
+            if '=>' not in line and '}' not in line:
+                continue
+            if prefilter is not None and prefilter(line) is None:
+                continue
+            line_match = classify(line)
+            if line_match is None:
+                continue
+            key = line_match.group('key')
+            if key is None:
+                break
+            if fields is None or key in fields:
+                route[key] = line_match.group('value')
         else:
             raise EndTokenNotFoundError(_('No match for code block end'))
+        return route if fields is None else self.__project_head(route, fields)
+
+    @staticmethod
+    def __project_head(route, fields):
+        """Drop the block head values (i.e. ``name``) not in ``fields``."""
+        for key in [key for key in route if key not in fields]:
+            del route[key]
+        return route
+
+    def build_record(self, route):
+        """Intern values of a parsed entry and convert it to a ``record``."""
+        interned = self.__interned
+        if interned is not None:
+            pool = interned.setdefault
+            route = dict(
+                (pool(key, key),
+                 pool(value, value) if key in INTERNED_FIELDS else value)
+                for key, value in route.items())
+        if self.__record is not dict:
+            route = self.__record(route)
         return route
 
-    def __parse_all(self):
+    def __parse_all(self, fields=None):
         """Itertively parse all entries."""
+        compact = self.__record is not dict or self.__interned is not None
+        prefilter = self.__prefilter(fields)
         try:
             self.__log.debug(_('Seeking file until header is found'))
             self.__find_file_header()
             self.__log.debug(_('Parsing all entries'))
             while True:
-                yield self.__parse_one()
+                route = self.__parse_one(fields, prefilter)
+                yield self.build_record(route) if compact else route
         except StartTokenNotFoundError:
             self.__log.debug(_('Finished parsing entries'))
             return
 
-    def parse(self, filename=None):
+    def __compile_bytes_patterns(self):
+        """Compile (once) the ``bytes`` counterparts of all patterns."""
+        if self.__bytes_patterns is None:
+            line = self.__block_line
+            self.__bytes_patterns = (
+                bytes_pattern(self.__file_header),
+                bytes_pattern(self.__block_head),
+                bytes_pattern(line) if line is not None else None,
+                bytes_pattern(self.__block_body),
+                bytes_pattern(self.__block_close),
+                bytes_pattern(self.__file_footer),
+            )
+        return self.__bytes_patterns
+
+    def __decode_groups(self, token_match):
+        """Decode the named match groups of a ``bytes`` match."""
+        encoding = self.__encoding
+        return dict(
+            (key, value if value is None else value.decode(encoding))
+            for key, value in token_match.groupdict().items())
+
+    def __scan(self, buf, pos=0, end=None, header=True, fields=None):
+        """Iteratively parse entries in a ``bytes`` buffer (e.g. ``mmap``).
+
+        Yields ``(route, start, stop)`` tuples where ``start`` and ``stop``
+        are the offsets of the entry block in the buffer. Lines are matched
+        in place with ``pos``/``endpos`` so that skipped lines are never
+        copied or decoded. Only entry blocks starting before ``end`` are
+        parsed, an entry block open at ``end`` is parsed to its close.
+        """
+        (file_header, block_head, block_line, block_body, block_close,
+         _file_footer) = self.__compile_bytes_patterns()
+        prefilter = self.__prefilter(fields, bytes_mode=True)
+        encoding = self.__encoding
+        keys = {}
+        find = buf.find
+        limit = len(buf)
+        end = limit if end is None else end
+        # NOTE: look for CRLF line endings once instead of on every line
+        crlf = find(b'\r', pos, end) >= 0
+        token = file_header if header else block_head
+        route = start = None
+        while True:
+            # NOTE: an entry block open at ``end`` is parsed to its close
+            bound = end if route is None else limit
+            if pos >= bound:
+                break
+            if route is None and not crlf:
+                # NOTE: let the regex engine skip to the next candidate line
+                token_match = token.search(buf, pos, end)
+                if token_match is None:
+                    break
+                pos = token_match.start()
+            eol = find(b'\n', pos, bound)
+            nxt = eol + 1
+            if eol < 0:
+                eol = nxt = bound
+            if (crlf or pos >= end) and eol > pos and buf[eol - 1:eol] == b'\r':
+                eol -= 1
+            if route is None:
+                if crlf or token_match.end() > eol:
+                    # NOTE: the candidate spans lines, match the line alone
+                    token_match = token.match(buf, pos, eol)
+                if token_match is not None:
+                    if token is file_header:
+                        token = block_head
+                    else:
+                        route = self.__decode_groups(token_match)
+                        start = pos
+                pos = nxt
+                continue
+            if prefilter is not None and prefilter(buf, pos, eol) is None:
+                pos = nxt
+                continue
+            if block_line is not None:
+                line_match = block_line.match(buf, pos, eol)
+                closed = (line_match is not None and
+                          line_match.group('key') is None)
+            else:
+                closed = block_close.match(buf, pos, eol) is not None
+                line_match = None if closed else block_body.match(buf, pos, eol)
+            if closed:
+                if fields is not None:
+                    route = self.__project_head(route, fields)
+                yield route, start, nxt
+                route = None
+            elif line_match is not None:
+                # NOTE: 'key' and 'value' named capture groups are expected
+                # in the regular expression pattern
+                key = line_match.group('key')
+                if key not in keys:
+                    keys[key] = key.decode(encoding)
+                key = keys[key]
+                if fields is None or key in fields:
+                    route[key] = line_match.group('value').decode(encoding)
+            pos = nxt
+        if route is not None:
+            raise EndTokenNotFoundError(_('No match for code block end'))
+
+    @contextmanager
+    def __mapped(self, filename=None):
+        """Memory-map a file for reading, ``None`` for empty files.
+
+        The file is kept open (and locked for reading) while mapped.
+        """
+        if filename is not None:
+            self.filename = filename
+        elif not self.filename:
+            raise RouteParserError(_('Nothing to parse'))
+        self.__log.debug(_('Memory-mapping file for reading'))
+        with open(self.filename, 'rb') as file_:
+            lock_shared(file_.fileno(), self.__lock_timeout, self.filename)
+            if not os.fstat(file_.fileno()).st_size:
+                # NOTE: empty files cannot be mapped
+                buf = None
+            else:
+                buf = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield buf
+            finally:
+                if buf is not None:
+                    buf.close()
+
+    def __parse_mapped(self, filename=None, spans=False, fields=None):
+        """Iteratively parse all entries of a memory-mapped file.
+
+        With ``spans`` yields ``(route, start, stop)`` tuples instead.
+        """
+        with self.__mapped(filename) as buf:
+            if buf is None:
+                return
+            if hasattr(buf, 'madvise'):
+                buf.madvise(mmap.MADV_SEQUENTIAL)
+            self.__log.debug(_('Parsing all entries'))
+            compact = self.__record is not dict or self.__interned is not None
+            for route, start, stop in self.__scan(buf, fields=fields):
+                if compact:
+                    route = self.build_record(route)
+                yield (route, start, stop) if spans else route
+            self.__log.debug(_('Finished parsing entries'))
+
+    @staticmethod
+    def __find_line(buf, token, pos, end):
+        """Return the ``(start, next)`` offsets of the first line in the
+        ``[pos, end)`` range of a buffer matching a token, or ``None``.
+        """
+        find = buf.find
+        while pos < end:
+            eol = find(b'\n', pos, end)
+            nxt = eol + 1
+            if eol < 0:
+                eol = nxt = end
+            if eol > pos and buf[eol - 1:eol] == b'\r':
+                eol -= 1
+            if token.match(buf, pos, eol) is not None:
+                return pos, nxt
+            pos = nxt
+        return None
+
+    def split(self, filename=None, chunks=2, min_size=1 << 20):
+        """Split a file in byte ranges aligned to entry blocks.
+
+        Returns up to ``chunks`` ``(start, end, header)`` tuples of ranges
+        at least ``min_size`` bytes long, for ``parse_range``. The first
+        range starts at the file header, the others at the first entry
+        block head line after each split point.
+        """
+        (file_header, block_head, _block_line, _block_body, _block_close,
+         _file_footer) = self.__compile_bytes_patterns()
+        with self.__mapped(filename) as buf:
+            if buf is None:
+                return []
+            size = len(buf)
+            found = self.__find_line(buf, file_header, 0, size)
+            if found is None:
+                return []
+            bounds = [found[0]]
+            pos = found[1]
+            chunks = max(1, min(chunks, (size - pos) // min_size))
+            step = (size - pos) // chunks
+            for number in range(1, chunks):
+                point = found[1] + number * step
+                # NOTE: the start of the first line at or after the point
+                point = buf.find(b'\n', point - 1, size) + 1 or size
+                found_head = self.__find_line(
+                    buf, block_head, max(point, pos), size)
+                if found_head is None:
+                    break
+                bounds.append(found_head[0])
+                pos = found_head[1]
+            bounds.append(size)
+        return [(start, end, number == 0) for number, (start, end)
+                in enumerate(zip(bounds, bounds[1:]))]
+
+    def parse_range(self, filename=None, start=0, end=None, header=True,
+                    fields=None):
+        """Iteratively parse entry blocks starting in a byte range of a file.
+
+        Yields ``(route, start, stop)`` tuples (see ``parse_spans``) of
+        plain ``dict`` entries. An entry block open at ``end`` is parsed to
+        its close. With ``header`` entries before the file header are
+        skipped.
+        """
+        with self.__mapped(filename) as buf:
+            if buf is None:
+                return
+            for span in self.__scan(buf, start, end, header, fields):
+                yield span
+
+    def __options(self):
+        """Return the parser options needed to parse in worker processes."""
+        return {
+            'block_head': self.__block_head,
+            'block_body': self.__block_body,
+            'block_close': self.__block_close,
+            'file_header': self.__file_header,
+            'file_footer': self.__file_footer,
+            'block_line': self.__block_line,
+            'encoding': self.__encoding,
+            'lock_timeout': self.__lock_timeout,
+        }
+
+    def iter_chunks(self, filename=None, jobs=None, chunks=None,
+                    min_size=1 << 20, fields=None):
+        """Iteratively parse a file in byte ranges in parallel.
+
+        The file is split (see ``split``) in ``chunks`` ranges (by default
+        four per job) parsed by ``jobs`` worker processes (by default the
+        parser ``jobs`` or one per usable CPU, see ``cpu_count``). Yields lists of entries in file
+        order, each as soon as it and all ranges before it are parsed.
+        Closing the iterator early cancels the ranges not started yet.
+
+        Example:
+
+        >>> for chunk in RouteParser(jobs=8).iter_chunks('routes.pp'):
+        ...     print(len(chunk))
+
+        """
+        jobs = jobs or self.__jobs or cpu_count()
+        ranges = self.split(filename, chunks or jobs * 4, min_size)
+        if not ranges:
+            return
+        futures = []
+        if jobs == 1 or len(ranges) == 1 or ProcessPoolExecutor is None:
+            executor = None
+            results = (list(self.parse_range(self.filename, *range_,
+                                             fields=fields))
+                       for range_ in ranges)
+        else:
+            self.__log.debug(_('Parsing %d byte ranges with %d jobs'),
+                             len(ranges), jobs)
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            task = partial(_parse_range, self.__options(), self.filename,
+                           fields=fields)
+            futures = [executor.submit(task, *range_) for range_ in ranges]
+            results = (future.result() for future in futures)
+        compact = self.__record is not dict or self.__interned is not None
+        last_stop = 0
+        try:
+            for spans in results:
+                chunk = []
+                for route, start, stop in spans:
+                    # NOTE: an entry block open at the end of the previous
+                    # range swallowed blocks starting before its close
+                    if start < last_stop:
+                        continue
+                    chunk.append(self.build_record(route) if compact else route)
+                    last_stop = stop
+                yield chunk
+        finally:
+            if executor is not None:
+                # NOTE: ranges not started yet are dropped when closed
+                # early, only the running ones are waited for
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=True)
+
+    def __head_before(self, buf, block_head, pos, floor):
+        """Return the start of the last entry block head line starting at or
+        before ``pos`` (and after ``floor``), or ``None``.
+        """
+        find, rfind = buf.find, buf.rfind
+        end = pos
+        while True:
+            start = rfind(b'\n', floor, end) + 1 or floor
+            eol = find(b'\n', start)
+            if eol < 0:
+                eol = len(buf)
+            if eol > start and buf[eol - 1:eol] == b'\r':
+                eol -= 1
+            if block_head.match(buf, start, eol) is not None:
+                return start
+            keyword = rfind(BLOCK_HEAD_KEYWORD, floor, start)
+            if keyword < 0:
+                return None
+            end = keyword
+
+    def __scan_containing(self, buf, needle, fields=None, min_blocks=16,
+                          density=0.25):
+        """Iteratively parse the entry blocks of a ``bytes`` buffer which
+        contain ``needle``, yielding ``(route, start, stop)`` tuples.
+
+        Occurrences are found with ``find``, each is located in its entry
+        block by scanning back to the block head line, and only these blocks
+        are parsed. Once more than ``density`` of the blocks seen (after
+        ``min_blocks``) contain the needle, the rest of the buffer is
+        scanned block by block instead.
+        """
+        (file_header, block_head, _block_line, _block_body, _block_close,
+         _file_footer) = self.__compile_bytes_patterns()
+        found = self.__find_line(buf, file_header, 0, len(buf))
+        if found is None:
+            return
+        floor = pos = found[1]
+        blocks = 0
+        block_bytes = 0
+        while True:
+            hit = buf.find(needle, pos)
+            if hit < 0:
+                return
+            head = self.__head_before(buf, block_head, hit, floor)
+            if head is None or head < pos:
+                # NOTE: not in an entry block (e.g. in a comment after a
+                # block close) or in a block already parsed
+                pos = hit + 1
+                continue
+            nxt = buf.find(b'\n', head) + 1 or len(buf)
+            for route, start, stop in self.__scan(buf, head, nxt, False,
+                                                  fields):
+                blocks += 1
+                block_bytes += stop - start
+                pos = max(stop, hit + 1)
+                if start <= hit < stop:
+                    yield route, start, stop
+            if (blocks >= min_blocks and
+                    block_bytes > density * (pos - floor)):
+                self.__log.debug(_('Needle is frequent, scanning all blocks'))
+                for span in self.__scan(buf, pos, None, False, fields):
+                    yield span
+                return
+
+    def parse_containing(self, needle, filename=None, fields=None):
+        """Iteratively parse the entries whose block contains a literal.
+
+        A "grep first" strategy: entries not containing ``needle`` in their
+        raw text are (mostly) skipped without being parsed, any entry whose
+        value of some key equals or contains ``needle`` is produced. Other
+        entries may be produced too and must be filtered by the caller.
+
+        Falls back to ``parse`` for iterables of lines, custom patterns and
+        empty needles. Entry block heads must only appear at the start of
+        entry blocks, as in any file written by route-ctl.
+        """
+        if (not needle or (self.__lines and filename is None) or
+                self.__block_head is not ROUTE_BLOCK_HEAD or
+                self.__block_line not in (ROUTE_BLOCK_LINE, None)):
+            for item in self.parse(filename, fields):
+                yield item
+            return
+        fields = frozenset(fields) if fields is not None else None
+        compact = self.__record is not dict or self.__interned is not None
+        with self.__mapped(filename) as buf:
+            if buf is None:
+                return
+            for route, _start, _stop in self.__scan_containing(
+                    buf, needle.encode(self.__encoding), fields):
+                yield self.build_record(route) if compact else route
+
+    def find_footer(self, filename=None, chunk_size=1 << 16):
+        """Find the byte offset of the file footer line.
+
+        Only blank and comment lines may follow the footer, and the footer
+        must follow an entry block close or the file header. Returns
+        ``None`` if the footer cannot be located this way.
+        """
+        (file_header, _block_head, _block_line, _block_body, block_close,
+         file_footer) = self.__compile_bytes_patterns()
+        with open(filename or self.filename, 'rb') as file_:
+            file_.seek(0, os.SEEK_END)
+            size = file_.tell()
+            start = size
+            while True:
+                start = max(0, start - chunk_size)
+                file_.seek(start)
+                buf = file_.read(size - start)
+                lines = buf.split(b'\n')
+                if start:
+                    # NOTE: the first line may be incomplete
+                    offset = start + len(lines.pop(0)) + 1
+                else:
+                    offset = 0
+                significant = []
+                for line in lines:
+                    stripped = line.strip()
+                    if stripped and not stripped.startswith(b'#'):
+                        significant = significant[-1:] + [(offset, line)]
+                    offset += len(line) + 1
+                if len(significant) == 2:
+                    break
+                if not start:
+                    return None
+                chunk_size *= 2
+        (_offset, previous), (footer, last) = significant
+        if not file_footer.match(last.rstrip(b'\r')):
+            return None
+        previous = previous.rstrip(b'\r')
+        if block_close.match(previous) or file_header.match(previous):
+            return footer
+        return None
+
+    def parse(self, filename=None, fields=None):
         """Itertively parse all entries in an iterable of strings or file.
 
+        With ``fields`` only these keys are kept in entries.
+
         Example:
 
         >>> parser = RouteParser()
@@ -195,13 +780,34 @@ class RouteParser(object):
         ...     print(route)
 
         """
+        fields = frozenset(fields) if fields is not None else None
+        if self.__jobs and self.__jobs > 1 and (
+                filename is not None or not self.__lines):
+            for chunk in self.iter_chunks(filename=filename, fields=fields):
+                for item in chunk:
+                    yield item
+            return
+        if self.__use_mmap and (filename is not None or not self.__lines):
+            for item in self.__parse_mapped(filename=filename, fields=fields):
+                yield item
+            return
         self.__open_file(filename=filename)
         try:
-            for item in self.__parse_all():
+            for item in self.__parse_all(fields):
                 yield item
         finally:
             self.__close_file()
 
+    def parse_spans(self, filename=None):
+        """Iteratively parse all entries of a file with their byte offsets.
+
+        Yields ``(route, start, stop)`` tuples where ``start`` and ``stop``
+        delimit the entry block (including the line end of the closing
+        brace) in the file.
+        """
+        for span in self.__parse_mapped(filename=filename, spans=True):
+            yield span
+
     @classmethod
     def read(cls, filename):
         """Iteratively parse all entries from a file (classmethod).
@@ -214,3 +820,9 @@ class RouteParser(object):
         """
         for item in cls().parse(filename):
             yield item
+
+
+def _parse_range(options, filename, start, end, header, fields=None):
+    """Parse a byte range of a file in a worker process."""
+    return list(RouteParser(**options).parse_range(
+        filename, start, end, header, fields))
@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+"""route-ctl query language for finding entries by many criteria.
+
+A query is a boolean expression of ``KEY OP VALUE`` comparisons:
+
+``=`` and ``!=``
+    the value is (not) equal;
+``~`` and ``!~``
+    the value (does not) match a regular expression (``re.search``).
+
+Comparisons are combined with ``and``, ``or``, ``not`` and parentheses.
+Values containing whitespace, parentheses or operator characters must be
+quoted with single or double quotes.
+
+Example:
+
+>>> query = Query("interface=eth1 and gateway~'^10\\.'")
+>>> list(query.filter(items))
+
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+import re
+from gettext import translation
+
+try:
+    unicode
+    basestring
+except NameError:
+    # NOTE: PY2 compat
+    unicode = basestring = str
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+OPERATORS = ('=', '!=', '~', '!~')
+
+KEYWORDS = ('and', 'or', 'not')
+
+TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<paren>[()])
+      | (?P<operator>!=|!~|=|~)
+      | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<word>[^\s()=!~"']+)
+    )
+''', re.VERBOSE)
+
+# NOTE: estimated fraction of entries with a given value of a key, names
+# and networks are (mostly) unique, ensure is present almost everywhere
+EQUAL_SELECTIVITY = {
+    'name': 0.001,
+    'network': 0.01,
+    'gateway': 0.05,
+    'interface': 0.1,
+    'netmask': 0.2,
+    'options': 0.5,
+    'ensure': 0.9,
+}
+
+DEFAULT_SELECTIVITY = 0.1
+
+MATCH_SELECTIVITY = 0.25
+
+# NOTE: relative cost of evaluating a comparison
+EQUAL_COST = 1.0
+
+MATCH_COST = 4.0
+
+
+class QueryError(Exception):
+    pass
+
+
+def tokenize(expression):
+    """Split an expression into ``(kind, text, position)`` tokens."""
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if match is None:
+            raise QueryError(_('invalid query at position %d: %r') % (
+                position, expression[position:]))
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'string':
+            quote = text[0]
+            text = text[1:-1].replace('\\' + quote, quote)
+        yield kind, text, match.start(kind)
+        position = match.end()
+
+
+def _text(item, key):
+    """Return the value of a key as text."""
+    value = item.get(key)
+    if value is None:
+        return ''
+    return value if isinstance(value, basestring) else '{0}'.format(value)
+
+
+def _union(lists):
+    merged = set()
+    for positions in lists:
+        merged.update(positions)
+    return sorted(merged)
+
+
+def _intersection(lists):
+    lists = sorted(lists, key=len)
+    common = set(lists[0])
+    for positions in lists[1:]:
+        common.intersection_update(positions)
+    return sorted(common)
+
+
+class Compare(object):
+    """Comparison of the value of a key."""
+
+    def __init__(self, key, operator, value):
+        self.key = key
+        self.operator = operator
+        self.value = value
+
+    @property
+    def selectivity(self):
+        if self.operator in ('=', '!='):
+            selectivity = EQUAL_SELECTIVITY.get(self.key, DEFAULT_SELECTIVITY)
+        else:
+            selectivity = MATCH_SELECTIVITY
+        return 1.0 - selectivity if self.operator.startswith('!') else selectivity
+
+    @property
+    def cost(self):
+        return EQUAL_COST if self.operator in ('=', '!=') else MATCH_COST
+
+    def compile(self, ignore_case=False):
+        key = self.key
+        if self.operator in ('~', '!~'):
+            try:
+                regexp = re.compile(self.value,
+                                    flags=re.IGNORECASE if ignore_case else 0)
+            except re.error as err:
+                raise QueryError(_('invalid regular expression %r: %s') % (
+                    self.value, err))
+            if self.operator == '~':
+                return lambda item: regexp.search(_text(item, key)) is not None
+            return lambda item: regexp.search(_text(item, key)) is None
+        if ignore_case:
+            value = self.value.lower()
+            if self.operator == '=':
+                return lambda item: _text(item, key).lower() == value
+            return lambda item: _text(item, key).lower() != value
+        value = self.value
+        if self.operator == '=':
+            return lambda item: item.get(key, '') == value
+        return lambda item: item.get(key, '') != value
+
+    def lookup(self, index):
+        if self.operator != '=':
+            return None
+        return index.positions(self.key, self.value)
+
+    def keys(self):
+        return set([self.key])
+
+    def literal(self):
+        return self.value if self.operator == '=' and self.value else None
+
+    def optimize(self):
+        return self
+
+    def __str__(self):
+        return '{0}{1}{2!r}'.format(self.key, self.operator, self.value)
+
+
+class Not(object):
+    """Negation of a condition."""
+
+    def __init__(self, term):
+        self.term = term
+
+    @property
+    def selectivity(self):
+        return 1.0 - self.term.selectivity
+
+    @property
+    def cost(self):
+        return self.term.cost
+
+    def compile(self, ignore_case=False):
+        predicate = self.term.compile(ignore_case)
+        return lambda item: not predicate(item)
+
+    def lookup(self, index):
+        return None
+
+    def keys(self):
+        return self.term.keys()
+
+    def literal(self):
+        return None
+
+    def optimize(self):
+        self.term = self.term.optimize()
+        return self
+
+    def __str__(self):
+        return 'not {0}'.format(self.term)
+
+
+class And(object):
+    """Conjunction of conditions, evaluated until one fails."""
+
+    def __init__(self, terms):
+        self.terms = terms
+
+    @property
+    def selectivity(self):
+        selectivity = 1.0
+        for term in self.terms:
+            selectivity *= term.selectivity
+        return selectivity
+
+    @property
+    def cost(self):
+        # NOTE: later terms are only evaluated for entries passing the
+        # earlier ones
+        cost = 0.0
+        passing = 1.0
+        for term in self.terms:
+            cost += passing * term.cost
+            passing *= term.selectivity
+        return cost
+
+    def compile(self, ignore_case=False):
+        predicates = [term.compile(ignore_case) for term in self.terms]
+        first = predicates[0]
+        for second in predicates[1:]:
+            first = (lambda first, second:
+                     lambda item: first(item) and second(item))(first, second)
+        return first
+
+    def lookup(self, index):
+        lists = [positions for positions in
+                 (term.lookup(index) for term in self.terms)
+                 if positions is not None]
+        return _intersection(lists) if lists else None
+
+    def keys(self):
+        return set().union(*(term.keys() for term in self.terms))
+
+    def literal(self):
+        # NOTE: any of the terms' literals is required, longer ones are rarer
+        literals = [literal for literal in
+                    (term.literal() for term in self.terms) if literal]
+        return max(literals, key=len) if literals else None
+
+    def optimize(self):
+        # NOTE: the terms most likely to fail for the least cost go first
+        self.terms = sorted(
+            (term.optimize() for term in self.terms),
+            key=lambda term: term.cost / max(1.0 - term.selectivity, 1e-9))
+        return self
+
+    def __str__(self):
+        return '({0})'.format(' and '.join(map(unicode, self.terms)))
+
+
+class Or(object):
+    """Disjunction of conditions, evaluated until one succeeds."""
+
+    def __init__(self, terms):
+        self.terms = terms
+
+    @property
+    def selectivity(self):
+        failing = 1.0
+        for term in self.terms:
+            failing *= 1.0 - term.selectivity
+        return 1.0 - failing
+
+    @property
+    def cost(self):
+        cost = 0.0
+        failing = 1.0
+        for term in self.terms:
+            cost += failing * term.cost
+            failing *= 1.0 - term.selectivity
+        return cost
+
+    def compile(self, ignore_case=False):
+        predicates = [term.compile(ignore_case) for term in self.terms]
+        first = predicates[0]
+        for second in predicates[1:]:
+            first = (lambda first, second:
+                     lambda item: first(item) or second(item))(first, second)
+        return first
+
+    def lookup(self, index):
+        lists = [term.lookup(index) for term in self.terms]
+        if any(positions is None for positions in lists):
+            return None
+        return _union(lists)
+
+    def keys(self):
+        return set().union(*(term.keys() for term in self.terms))
+
+    def literal(self):
+        return None
+
+    def optimize(self):
+        # NOTE: the terms most likely to succeed for the least cost go first
+        self.terms = sorted(
+            (term.optimize() for term in self.terms),
+            key=lambda term: term.cost / max(term.selectivity, 1e-9))
+        return self
+
+    def __str__(self):
+        return '({0})'.format(' or '.join(map(unicode, self.terms)))
+
+
+class QueryParser(object):
+    """Recursive descent parser of query expressions.
+
+    Grammar::
+
+        query       := conjunction ('or' conjunction)*
+        conjunction := negation ('and' negation)*
+        negation    := 'not' negation | '(' query ')' | KEY OP VALUE
+
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.__tokens = list(tokenize(expression))
+        self.__position = 0
+
+    def __peek(self):
+        if self.__position < len(self.__tokens):
+            return self.__tokens[self.__position]
+        return None, None, len(self.expression)
+
+    def __next(self):
+        token = self.__peek()
+        self.__position += 1
+        return token
+
+    def __keyword(self, keyword):
+        kind, text, _position = self.__peek()
+        if kind == 'word' and text.lower() == keyword:
+            self.__position += 1
+            return True
+        return False
+
+    def __error(self, message, position):
+        return QueryError(_('%s at position %d: %r') % (
+            message, position, self.expression))
+
+    def parse(self):
+        """Return the syntax tree of the expression."""
+        if not self.__tokens:
+            raise QueryError(_('empty query'))
+        tree = self.__query()
+        kind, text, position = self.__peek()
+        if kind is not None:
+            raise self.__error(_('unexpected %r') % (text,), position)
+        return tree
+
+    def __query(self):
+        terms = [self.__conjunction()]
+        while self.__keyword('or'):
+            terms.append(self.__conjunction())
+        return terms[0] if len(terms) == 1 else Or(self.__flatten(terms, Or))
+
+    def __conjunction(self):
+        terms = [self.__negation()]
+        while self.__keyword('and'):
+            terms.append(self.__negation())
+        return terms[0] if len(terms) == 1 else And(self.__flatten(terms, And))
+
+    @staticmethod
+    def __flatten(terms, kind):
+        flat = []
+        for term in terms:
+            flat.extend(term.terms if isinstance(term, kind) else [term])
+        return flat
+
+    def __negation(self):
+        if self.__keyword('not'):
+            return Not(self.__negation())
+        kind, text, position = self.__next()
+        if kind == 'paren' and text == '(':
+            tree = self.__query()
+            kind, text, position = self.__next()
+            if kind != 'paren' or text != ')':
+                raise self.__error(_("expected ')'"), position)
+            return tree
+        if kind != 'word' or text.lower() in KEYWORDS:
+            raise self.__error(_('expected a key'), position)
+        key = text
+        kind, operator, position = self.__next()
+        if kind != 'operator':
+            raise self.__error(
+                _('expected one of %s') % (', '.join(OPERATORS),), position)
+        kind, value, position = self.__next()
+        if kind not in ('word', 'string'):
+            raise self.__error(_('expected a value'), position)
+        return Compare(key, operator, value)
+
+
+class Query(object):
+    """Query compiled once into a short-circuiting predicate.
+
+    Conditions are reordered by their estimated selectivity and cost, so
+    that conjunctions fail and disjunctions succeed as early as possible.
+    ``str`` of a query shows the planned evaluation order, ``keys`` are
+    the keys the query depends on and ``literal`` (if any) is a value
+    every matching entry contains.
+    """
+
+    def __init__(self, expression, ignore_case=False):
+        self.expression = expression
+        self.ignore_case = ignore_case
+        self.tree = QueryParser(expression).parse().optimize()
+        self.predicate = self.tree.compile(ignore_case)
+        self.keys = frozenset(self.tree.keys())
+        self.literal = None if ignore_case else self.tree.literal()
+
+    def __call__(self, item):
+        return self.predicate(item)
+
+    def filter(self, items):
+        """Iterate over matching entries in a single pass."""
+        return (item for item in items if self.predicate(item))
+
+    def select(self, items, index=None):
+        """Return matching entries of a list.
+
+        With a ``FieldIndex`` of ``items`` equality conditions are looked up
+        in the index and only the candidate entries are checked.
+        """
+        if index is None or self.ignore_case:
+            return list(self.filter(items))
+        positions = self.tree.lookup(index)
+        if positions is None:
+            return list(self.filter(items))
+        predicate = self.predicate
+        return [items[position] for position in positions
+                if predicate(items[position])]
+
+    def __str__(self):
+        return unicode(self.tree)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""route-ctl compact route entry records."""
+
+from __future__ import absolute_import, unicode_literals
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    # NOTE: PY2 compat
+    from collections import MutableMapping
+
+FIELDS = (
+    'name',
+    'ensure',
+    'gateway',
+    'interface',
+    'netmask',
+    'network',
+    'options',
+)
+
+FIELD_SET = frozenset(FIELDS)
+
+
+def project(item, fields):
+    """Return a ``dict`` of the ``fields`` of an entry, in ``fields`` order.
+
+    Missing fields are left out.
+    """
+    return dict((key, item[key]) for key in fields if key in item)
+
+
+# NOTE: values of these keys repeat a lot across entries and are worth
+# interning, names and networks are (mostly) unique.
+INTERNED_FIELDS = frozenset([
+    'ensure',
+    'gateway',
+    'interface',
+    'netmask',
+    'options',
+])
+
+
+class RouteRecord(MutableMapping):
+    """Compact route entry record with a ``dict``-like interface.
+
+    Known ``FIELDS`` are stored in slots, any other keys in an ``extra``
+    dictionary which is only allocated when needed. Keys are iterated in
+    ``FIELDS`` order followed by extra keys.
+    """
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, *args, **kwargs):
+        self._extra = None
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        if key in FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __iter__(self):
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            for key in self._extra:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, dict(self))
+
+    def copy(self):
+        return type(self)(self)
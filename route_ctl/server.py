@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""route-ctl resident daemon serving route queries over a Unix socket."""
+
+from __future__ import absolute_import, unicode_literals, with_statement
+
+import errno
+import json
+import os
+import socket
+import stat
+import threading
+from gettext import translation
+from logging import getLogger
+
+from .fsutil import file_stat
+from .index import FieldIndex, RouteIndex
+from .lock import LockError
+from .manager import RouteError, matcher
+from .parser import RouteParserError
+from .query import Query, QueryError
+from .record import project
+from .trie import RouteTrieError
+
+try:
+    import socketserver
+except ImportError:
+    # NOTE: PY2 compat
+    import SocketServer as socketserver
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+JSONRPC_VERSION = '2.0'
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+ROUTE_ERROR = -32000
+NOT_SERVED = -32001
+
+
+class RPCError(Exception):
+    """JSON-RPC error response."""
+
+    def __init__(self, code, message, data=None):
+        super(RPCError, self).__init__(message)
+        self.code = code
+        self.data = data
+
+    def as_dict(self):
+        error = {'code': self.code, 'message': '{0}'.format(self)}
+        if self.data is not None:
+            error['data'] = self.data
+        return error
+
+
+def _is_count(value):
+    """Check if a parameter is a non-negative integer."""
+    return (isinstance(value, int) and not isinstance(value, bool) and
+            value >= 0)
+
+
+class RouteTable(object):
+    """Parsed and indexed entries of a route file kept in memory.
+
+    Entries are reloaded when the file identity (inode, size or
+    modification time) changes. A lock serializes reloads and writes.
+    Equality conditions of queries are looked up in field indexes built
+    on demand.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.lock = threading.RLock()
+        self.__identity = None
+        self.__items = []
+        self.__index = RouteIndex()
+        self.__fields = FieldIndex(self.__items)
+        self.__trie = None
+        self.__log = getLogger(__name__)
+
+    def refresh(self):
+        """Reload the entries if the file has changed."""
+        with self.lock:
+            identity = file_stat(self.manager.filename)
+            if identity == self.__identity:
+                return
+            self.__log.info(_('loading route file: %r'), self.manager.filename)
+            self.__items = list(self.manager.parse())
+            self.__index = RouteIndex(self.__items)
+            self.__fields = FieldIndex(self.__items)
+            self.__trie = None
+            self.__identity = identity
+
+    def items(self, fields=None):
+        """Return all entries, only their ``fields`` if given."""
+        with self.lock:
+            self.refresh()
+            return self.__project(self.__items, fields)
+
+    @staticmethod
+    def __project(items, fields):
+        if fields is None:
+            return list(items)
+        return [project(item, fields) for item in items]
+
+    def find(self, value=None, key='name', ignore_case=False,
+             exact_match=True, contains=None, within=None, query=None,
+             offset=0, limit=None, fields=None):
+        """Return entries matching a criteria (see ``find_items``).
+
+        Only up to ``limit`` entries after skipping ``offset`` are returned,
+        only their ``fields`` if given.
+        """
+        if not _is_count(offset) or not (limit is None or _is_count(limit)):
+            raise RPCError(INVALID_PARAMS, _(
+                'offset and limit must be non-negative integers'))
+        found = self.__find(value, key, ignore_case, exact_match, contains,
+                            within, query)
+        return self.__project(
+            found[offset:None if limit is None else offset + limit], fields)
+
+    def __find(self, value, key, ignore_case, exact_match, contains, within,
+               query):
+        with self.lock:
+            self.refresh()
+            if query is not None:
+                return Query(query, ignore_case).select(
+                    self.__items, self.__fields)
+            if contains is not None or within is not None:
+                if self.__trie is None:
+                    self.__trie = self.manager.build_trie(self.__items)
+                if contains is not None:
+                    return self.__trie.covering(contains)
+                return self.__trie.within(within)
+            if value is None:
+                raise RPCError(INVALID_PARAMS, _('nothing to find: value is required'))
+            if key == 'name' and exact_match and not ignore_case:
+                return self.__index.by_name(value)
+            return list(filter(
+                matcher(value, key, ignore_case, exact_match), self.__items))
+
+    def create(self, item, force=False):
+        """Create an entry, writes are serialized.
+
+        The entry is checked for conflicts against the entries in memory,
+        which are kept current under the writer lock of the file, and
+        added to them after the write, so the file is not parsed again.
+        """
+        if not isinstance(item, dict) or not item.get('name'):
+            raise RPCError(INVALID_PARAMS,
+                           _('item must be an object with a name'))
+        with self.lock:
+            with self.manager.lock:
+                self.manager.recover()
+                self.refresh()
+                self.manager.create_item(item, force=force, items=self.__items)
+                self.__items = self.__items + [item]
+                self.__index.add(item)
+                self.__fields = FieldIndex(self.__items)
+                self.__trie = None
+                self.__identity = file_stat(self.manager.filename)
+
+
+class RouteRequestHandler(socketserver.StreamRequestHandler):
+    """Line-delimited JSON-RPC 2.0 request handler.
+
+    Each request and response is a single line of JSON. Supported methods
+    are ``list``, ``find`` and ``create``, all taking an optional ``file``
+    parameter to select one of the served route files.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.dispatch(line.decode('utf-8'))
+            self.wfile.write(json.dumps(
+                response, separators=(',', ':'), default=dict).encode('utf-8'))
+            self.wfile.write(b'\n')
+            self.wfile.flush()
+
+
+class RouteServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server for one or more route files."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, managers,
+                 handler=RouteRequestHandler):
+        self.__log = getLogger(__name__)
+        self.tables = {}
+        for manager in managers:
+            self.tables[os.path.realpath(manager.filename)] = RouteTable(manager)
+        self.default = managers[0].filename if len(managers) == 1 else None
+        self.socket_path = socket_path
+        self.__remove_stale_socket()
+        socketserver.UnixStreamServer.__init__(self, socket_path, handler)
+
+    def __remove_stale_socket(self):
+        """Remove a socket file left behind by a daemon that is gone.
+
+        Anything else found at the socket path is left alone.
+        """
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return
+        if not stat.S_ISSOCK(mode):
+            raise RouteError(
+                _('not a socket, refusing to replace it: %r') % (
+                    self.socket_path,))
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except socket.error as err:
+            if err.errno not in (errno.ECONNREFUSED, errno.ENOENT):
+                raise
+            self.__log.debug(_('removing stale socket: %r'), self.socket_path)
+            os.unlink(self.socket_path)
+        else:
+            raise RouteError(
+                _('a daemon is already listening on %r') % (self.socket_path,))
+        finally:
+            probe.close()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def table(self, filename=None):
+        """Return the table of a served route file.
+
+        Files are matched by their real path, relative paths are resolved
+        in the working directory of the daemon, so clients should send
+        absolute ones.
+        """
+        filename = filename or self.default
+        if filename is None:
+            raise RPCError(INVALID_PARAMS, _('file parameter is required'))
+        try:
+            return self.tables[os.path.realpath(filename)]
+        except KeyError:
+            raise RPCError(NOT_SERVED,
+                           _('route file not served: %r') % (filename,))
+
+    def call(self, method, params):
+        """Run a method and return its result."""
+        params = dict(params)
+        table = self.table(params.pop('file', None))
+        try:
+            if method == 'list':
+                return {'routes': table.items(**params)}
+            elif method == 'find':
+                return {'routes': table.find(**params)}
+            elif method == 'create':
+                return table.create(**params)
+        except TypeError as err:
+            raise RPCError(INVALID_PARAMS, '{0}'.format(err))
+        raise RPCError(METHOD_NOT_FOUND,
+                       _('method not found: %r') % (method,))
+
+    def dispatch(self, line):
+        """Handle a single JSON-RPC request line, return the response."""
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as err:
+                raise RPCError(PARSE_ERROR, '{0}'.format(err))
+            if not isinstance(request, dict) or 'method' not in request:
+                raise RPCError(INVALID_REQUEST, _('invalid request'))
+            request_id = request.get('id')
+            params = request.get('params') or {}
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, _('params must be an object'))
+            result = self.call(request['method'], params)
+        except RPCError as err:
+            return {'jsonrpc': JSONRPC_VERSION, 'id': request_id,
+                    'error': err.as_dict()}
+        except (RouteError, RouteParserError, RouteTrieError, QueryError,
+                LockError, EnvironmentError) as err:
+            self.__log.warning(_('request failed: %s'), err)
+            error = RPCError(ROUTE_ERROR, '{0}'.format(err),
+                             {'type': type(err).__name__})
+            return {'jsonrpc': JSONRPC_VERSION, 'id': request_id,
+                    'error': error.as_dict()}
+        except Exception as err:
+            self.__log.exception(_('request failed: %s'), err)
+            error = RPCError(INTERNAL_ERROR, _('internal error: %s') % (err,),
+                             {'type': type(err).__name__})
+            return {'jsonrpc': JSONRPC_VERSION, 'id': request_id,
+                    'error': error.as_dict()}
+        return {'jsonrpc': JSONRPC_VERSION, 'id': request_id, 'result': result}
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""route-ctl prefix trie for CIDR queries."""
+
+from __future__ import absolute_import, unicode_literals
+
+import binascii
+import socket
+from gettext import translation
+
+try:
+    unicode
+    basestring
+except NameError:
+    # NOTE: PY2 compat
+    unicode = basestring = str
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+FAMILIES = ((socket.AF_INET, 32), (socket.AF_INET6, 128))
+
+DEFAULT_NETWORK = 'default'
+
+
+class RouteTrieError(Exception):
+    pass
+
+
+class InvalidPrefixError(RouteTrieError):
+    pass
+
+
+def parse_address(address):
+    """Return the ``(bits, integer)`` pair of an IPv4 or IPv6 address."""
+    if isinstance(address, basestring):
+        for family, bits in FAMILIES:
+            try:
+                packed = socket.inet_pton(family, str(address.strip()))
+            except (socket.error, ValueError, UnicodeError):
+                continue
+            return bits, int(binascii.hexlify(packed), 16)
+    raise InvalidPrefixError(_('invalid address: %r') % (address,))
+
+
+def parse_prefixlen(netmask, bits):
+    """Return the prefix length of a netmask or a prefix length string."""
+    netmask = netmask.strip() if isinstance(netmask, basestring) else netmask
+    if isinstance(netmask, basestring) and netmask.isdigit():
+        prefixlen = int(netmask)
+    else:
+        mask_bits, mask = parse_address(netmask)
+        if mask_bits != bits:
+            raise InvalidPrefixError(_('invalid netmask: %r') % (netmask,))
+        inverted = mask ^ ((1 << bits) - 1)
+        if inverted & (inverted + 1):
+            raise InvalidPrefixError(_('non-contiguous netmask: %r') % (netmask,))
+        prefixlen = bits - len(bin(inverted)) + 2 if inverted else bits
+    if not 0 <= prefixlen <= bits:
+        raise InvalidPrefixError(_('invalid prefix length: %r') % (netmask,))
+    return prefixlen
+
+
+def parse_prefix(network, netmask=None):
+    """Return the ``(bits, integer, prefixlen)`` triple of a network.
+
+    The network is either given in CIDR notation or with a separate netmask
+    (dotted quad or prefix length). ``default`` is ``0.0.0.0/0``.
+    """
+    if network == DEFAULT_NETWORK:
+        network, netmask = '0.0.0.0', '0'
+    elif netmask is None and isinstance(network, basestring) and '/' in network:
+        network, netmask = network.split('/', 1)
+    bits, address = parse_address(network)
+    prefixlen = bits if netmask is None else parse_prefixlen(netmask, bits)
+    return bits, address, prefixlen
+
+
+class _Node(object):
+    """Binary trie node."""
+
+    __slots__ = ('children', 'items')
+
+    def __init__(self):
+        self.children = [None, None]
+        self.items = []
+
+
+class RouteTrie(object):
+    """Binary radix trie of route entries keyed on their network prefix.
+
+    ``covering`` (longest-prefix match) and ``within`` queries walk at most
+    one node per prefix bit. IPv4 and IPv6 prefixes live in separate trees.
+    """
+
+    def __init__(self, items=()):
+        self.__roots = dict((bits, _Node()) for _family, bits in FAMILIES)
+        self.skipped = 0
+        for item in items:
+            self.add(item)
+
+    def insert(self, bits, address, prefixlen, item):
+        """Insert an entry under a parsed prefix."""
+        node = self.__roots[bits]
+        for shift in range(bits - 1, bits - prefixlen - 1, -1):
+            bit = (address >> shift) & 1
+            child = node.children[bit]
+            if child is None:
+                child = node.children[bit] = _Node()
+            node = child
+        node.items.append(item)
+
+    def add(self, item):
+        """Insert an entry by its ``network`` and ``netmask`` values.
+
+        Returns ``False`` (and counts it as skipped) if the entry has no
+        literal prefix, e.g. it uses variables.
+        """
+        try:
+            bits, address, prefixlen = parse_prefix(
+                item.get('network'), item.get('netmask'))
+        except InvalidPrefixError:
+            self.skipped += 1
+            return False
+        self.insert(bits, address, prefixlen, item)
+        return True
+
+    def covering(self, address):
+        """Return entries whose prefix contains the address.
+
+        Ordered by the longest prefix first (longest-prefix match).
+        """
+        bits, address, prefixlen = parse_prefix(address)
+        node = self.__roots[bits]
+        found = [node.items]
+        for shift in range(bits - 1, bits - prefixlen - 1, -1):
+            node = node.children[(address >> shift) & 1]
+            if node is None:
+                break
+            found.append(node.items)
+        return [item for items in reversed(found) for item in items]
+
+    def within(self, network, netmask=None):
+        """Return entries whose prefix lies inside a network.
+
+        Ordered by prefix length first, then by address.
+        """
+        bits, address, prefixlen = parse_prefix(network, netmask)
+        node = self.__roots[bits]
+        for shift in range(bits - 1, bits - prefixlen - 1, -1):
+            node = node.children[(address >> shift) & 1]
+            if node is None:
+                return []
+        found = []
+        level = [node]
+        while level:
+            for node in level:
+                found.extend(node.items)
+            level = [child for node in level
+                     for child in node.children if child is not None]
+        return found
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""route-ctl buffered bulk output writer."""
+
+from __future__ import absolute_import, unicode_literals, with_statement
+
+import os
+import time
+from gettext import translation
+from logging import getLogger
+
+from .fsutil import fsync_dir
+
+# l18n
+_ = translation(__name__, 'locale', fallback=True).gettext
+
+DURABILITY = ('none', 'fsync-file', 'fsync-file-and-dir')
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+class BulkWriter(object):
+    """Buffered writer of rendered text to a file descriptor.
+
+    Text is encoded and collected until ``buffer_size`` bytes are pending,
+    then written with a single ``os.write`` call (or as few as the system
+    allows). On ``close`` the file is synced according to the
+    ``durability`` policy:
+
+    ``none``
+        leave it to the operating system;
+    ``fsync-file``
+        ``fsync`` the file;
+    ``fsync-file-and-dir``
+        also ``fsync`` the directory of ``path`` (e.g. to persist a new
+        directory entry).
+
+    ``bytes``, ``writes`` and ``seconds`` report the amount of data
+    written, the number of write calls and the time spent. A ``digest``
+    (a ``hashlib`` object) is updated with the data written.
+    """
+
+    def __init__(self, fd, path=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 durability='none', encoding='utf-8', digest=None):
+        if durability not in DURABILITY:
+            raise ValueError(_('unknown durability policy: %r') % (durability,))
+        self.fd = fd
+        self.path = path
+        self.buffer_size = buffer_size
+        self.durability = durability
+        self.encoding = encoding
+        self.digest = digest
+        self.bytes = 0
+        self.writes = 0
+        self.seconds = 0.0
+        self.__chunks = []
+        self.__pending = 0
+        self.__started = time.time()
+        self.__log = getLogger(__name__)
+
+    def write(self, text):
+        """Buffer text, write the buffer once it is full."""
+        data = text.encode(self.encoding)
+        self.__chunks.append(data)
+        self.__pending += len(data)
+        if self.__pending >= self.buffer_size:
+            self.flush()
+
+    def writelines(self, lines):
+        for text in lines:
+            self.write(text)
+
+    def flush(self):
+        """Write the buffered data."""
+        if not self.__chunks:
+            return
+        data = b''.join(self.__chunks)
+        self.__chunks = []
+        self.__pending = 0
+        if self.digest is not None:
+            self.digest.update(data)
+        view = memoryview(data)
+        written = 0
+        while written < len(data):
+            written += os.write(self.fd, view[written:])
+            self.writes += 1
+        self.bytes += written
+
+    def sync(self):
+        """Sync the file (and directory) according to the ``durability``."""
+        if self.durability != 'none':
+            os.fsync(self.fd)
+        if self.durability == 'fsync-file-and-dir' and self.path is not None:
+            fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+
+    def close(self):
+        """Flush, sync and close the file descriptor."""
+        try:
+            self.flush()
+            self.sync()
+        finally:
+            os.close(self.fd)
+        self.seconds = time.time() - self.__started
+        self.__log.debug(_('wrote %d bytes in %d writes (%.3f s)'),
+                         self.bytes, self.writes, self.seconds)
+
+    def stats(self):
+        """Return the ``bytes``, ``writes`` and ``seconds`` written."""
+        return {
+            'bytes': self.bytes,
+            'writes': self.writes,
+            'seconds': self.seconds,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
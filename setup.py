@@ -9,10 +9,13 @@ setup(
     url='https://github.com/lukassup/route-ctl.git',
     version='0.1.9',
     name='route-ctl',
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
     entry_points={
         'console_scripts': ['route-ctl = route_ctl.cli:main'],
     },
+    extras_require={
+        'zstd': ['zstandard'],
+    },
     test_suite='tests',
     zip_safe=True,
 )
@@ -7,9 +7,84 @@ from __future__ import (
     with_statement,
 )
 
+import json
+import os
+import shutil
+import tempfile
 import unittest
 
+try:
+    from io import StringIO
+except ImportError:
+    # NOTE: PY2 compat
+    from cStringIO import StringIO
+
 from route_ctl import actions
+from route_ctl.manager import InvalidOperation, RouteManager
+
+ROUTE_FILE = os.path.join(os.path.dirname(__file__), 'files', 'routes')
+
 
 class TestActions(unittest.TestCase):
-    pass  # TODO
+    """Test actions writing to an output file."""
+
+    def test_list_items(self):
+        out = StringIO()
+        actions.list_items(ROUTE_FILE, out_file=out)
+        routes = json.loads(out.getvalue())['routes']
+        self.assertEqual([route['name'] for route in routes],
+                         ['172.17.67.0/24', 'default'])
+
+    def test_find_items_ndjson(self):
+        out = StringIO()
+        actions.find_items(ROUTE_FILE, 'interface', '$appout', False, True,
+                           out_file=out, output_format='ndjson')
+        routes = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([route['name'] for route in routes], ['default'])
+
+    def test_file_field(self):
+        """Should only output the file field for many route files."""
+        self.assertRaises(InvalidOperation, actions.list_items, ROUTE_FILE,
+                          out_file=StringIO(), fields=('name', 'file'))
+        out = StringIO()
+        actions.find_items(os.path.dirname(ROUTE_FILE) + '/rout[e]s', 'name',
+                           'default', False, True, out_file=out,
+                           output_format='ndjson', fields=('file', 'name'),
+                           jobs=1)
+        self.assertEqual([json.loads(line) for line in
+                          out.getvalue().splitlines()],
+                         [{'file': ROUTE_FILE, 'name': 'default'}])
+
+
+class TestExec(unittest.TestCase):
+    """Test running scripts of operations."""
+
+    SCRIPT = (
+        '# provisioning\n'
+        '{"op": "create", "name": "10.1.0.0/16", "network": "10.1.0.0",'
+        ' "netmask": "255.255.0.0"}\n'
+        '\n'
+        '{"op": "delete", "value": "default"}\n'
+    )
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        shutil.copy(ROUTE_FILE, self.file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def names(self):
+        return [route['name'] for route in RouteManager(self.file_path).parse()]
+
+    def test_exec_operations(self):
+        actions.exec_operations(self.file_path, StringIO(self.SCRIPT))
+        self.assertEqual(self.names(), ['172.17.67.0/24', '10.1.0.0/16'])
+
+    def test_exec_invalid_operation(self):
+        script = StringIO(self.SCRIPT + '{"op": "rename"}\n')
+        with self.assertRaises(InvalidOperation) as context:
+            actions.exec_operations(self.file_path, script)
+        self.assertIn('line 5', str(context.exception))
+        self.assertEqual(self.names(), ['172.17.67.0/24', 'default'])
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""Backup strategy tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from route_ctl.backup import Backup, BackupError
+
+CONTENT = "class netroutes::routes {\n}\n"
+
+
+class TestBackup(unittest.TestCase):
+    """Test backup strategies, compression and retention."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        with open(self.file_path, 'w') as route_file:
+            route_file.write(CONTENT)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, path):
+        with open(path) as file_:
+            return file_.read()
+
+    def replace(self, content):
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w') as file_:
+            file_.write(content)
+        os.rename(tmp_path, self.file_path)
+
+    def test_copy(self):
+        """Should copy the file."""
+        path = Backup().create(self.file_path)
+        self.assertEqual(self.read(path), CONTENT)
+        self.assertNotEqual(os.stat(path).st_ino,
+                            os.stat(self.file_path).st_ino)
+
+    def test_reflink(self):
+        """Should clone the file contents."""
+        path = Backup('reflink').create(self.file_path)
+        self.assertEqual(self.read(path), CONTENT)
+
+    def test_hardlink(self):
+        """Should keep the old content once the file is replaced."""
+        path = Backup('hardlink').create(self.file_path)
+        self.assertEqual(os.stat(path).st_ino, os.stat(self.file_path).st_ino)
+        self.replace('changed\n')
+        self.assertEqual(self.read(path), CONTENT)
+
+    def test_hardlink_in_place(self):
+        """Should copy the file if it is modified in place."""
+        path = Backup('hardlink').create(self.file_path, replaced=False)
+        self.assertNotEqual(os.stat(path).st_ino,
+                            os.stat(self.file_path).st_ino)
+
+    def test_none(self):
+        """Should not create backups."""
+        self.assertIsNone(Backup('none').create(self.file_path))
+        self.assertEqual(os.listdir(self.dir), ['routes.pp'])
+
+    def test_gzip(self):
+        """Should compress the backup in the background."""
+        backup = Backup(compression='gzip')
+        path = backup.create(self.file_path)
+        backup.wait()
+        self.assertFalse(os.path.exists(path))
+        with gzip.open(path + '.gz', 'rb') as backup_file:
+            self.assertEqual(backup_file.read().decode('utf-8'), CONTENT)
+
+    def test_keep(self):
+        """Should keep only the most recent backups."""
+        for stamp in ('1', '2', '3'):
+            Backup(stamp=stamp).create(self.file_path)
+            time.sleep(0.01)
+        Backup(keep=2, stamp='4').create(self.file_path)
+        self.assertEqual(
+            [os.path.basename(path)
+             for path in Backup().backups(self.file_path)],
+            ['routes.pp.4.backup', 'routes.pp.3.backup'])
+
+    def test_keep_compressed(self):
+        """Should prune compressed backups once compressed."""
+        backup = Backup(keep=2, compression='gzip', stamp='%H%M%S%f')
+        for _ in range(4):
+            backup.create(self.file_path)
+            time.sleep(0.01)
+        backup.wait()
+        names = sorted(os.listdir(self.dir))
+        self.assertEqual(names[0], 'routes.pp')
+        self.assertEqual(len(names), 3)
+        self.assertTrue(all(name.endswith('.backup.gz')
+                            for name in names[1:]))
+
+    def test_max_age(self):
+        """Should remove backups older than the maximum age."""
+        Backup(stamp='1').create(self.file_path)
+        backup = Backup(max_age=60)
+        self.assertEqual(backup.prune(self.file_path), [])
+        removed = backup.prune(self.file_path, now=time.time() + 120)
+        self.assertEqual([os.path.basename(path) for path in removed],
+                         ['routes.pp.1.backup'])
+
+    def test_unknown_strategy(self):
+        """Should reject unknown strategies."""
+        self.assertRaises(BackupError, Backup, 'tape')
@@ -9,12 +9,16 @@ from __future__ import (
 
 import os
 import shutil
+import stat
 import tempfile
 import unittest
 
 from datetime import datetime
 
-from route_ctl.builder import RouteBuilder
+from route_ctl.backup import Backup
+from route_ctl.builder import TEMPLATE, RouteBuilder, RouteFormatter
+from route_ctl.fsutil import copy_range
+from route_ctl.record import RouteRecord
 
 
 class TestBackup(unittest.TestCase):
@@ -28,4 +32,224 @@ class TestBackup(unittest.TestCase):
         shutil.rmtree(self.dir)
 
     def test_backup(self):
-        pass  # test
\ No newline at end of file
+        pass  # test
+
+
+class TestAppend(unittest.TestCase):
+    """Test in-place appends and their rollback."""
+
+    CONTENT = "class netroutes::routes {\n}  # end\n"
+    ROUTE = {'name': 'default', 'network': 'default'}
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        with open(self.file_path, 'w') as route_file:
+            route_file.write(self.CONTENT)
+        self.builder = RouteBuilder(self.file_path)
+        self.offset = self.CONTENT.index('}')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.file_path) as route_file:
+            return route_file.read()
+
+    def test_append(self):
+        """Should insert the rendered entry before the footer."""
+        self.builder.append([self.ROUTE], self.offset)
+        self.assertEqual(
+            self.read(),
+            self.CONTENT[:self.offset] + self.builder.render(self.ROUTE) +
+            self.CONTENT[self.offset:])
+        self.assertFalse(os.path.exists(self.builder.journal))
+
+    def test_recover_interrupted_append(self):
+        """Should restore the original file from the journal."""
+        with open(self.builder.journal, 'wb') as journal:
+            journal.write('{0} {1}\n'.format(
+                self.offset, len(self.CONTENT)).encode('ascii'))
+            journal.write(self.CONTENT[self.offset:].encode('ascii'))
+        with open(self.file_path, 'a') as route_file:
+            route_file.seek(self.offset)
+            route_file.write("  network_route { 'torn':\n    ensure")
+        self.assertTrue(self.builder.recover())
+        self.assertEqual(self.read(), self.CONTENT)
+        self.assertFalse(os.path.exists(self.builder.journal))
+
+    def test_incomplete_journal_is_dropped(self):
+        """Should leave the file alone if the journal was not completed."""
+        with open(self.builder.journal, 'wb') as journal:
+            journal.write(b'7 100\n}')
+        self.assertFalse(self.builder.recover())
+        self.assertEqual(self.read(), self.CONTENT)
+        self.assertFalse(os.path.exists(self.builder.journal))
+
+
+class TestSplice(unittest.TestCase):
+    """Test splicing entries into an existing file."""
+
+    HEAD = "# keep me\nclass netroutes::routes {\n"
+    FIRST = "  network_route { 'first':  # keep me\n    network => 'a',\n  }\n"
+    GAP = "  # about the second route\n"
+    SECOND = "  network_route { 'second':\n    network => 'b',\n  }\n"
+    TAIL = "}  # end\n"
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        self.content = self.HEAD + self.FIRST + self.GAP + self.SECOND + self.TAIL
+        with open(self.file_path, 'w') as route_file:
+            route_file.write(self.content)
+        self.builder = RouteBuilder(self.file_path)
+        start = len(self.HEAD)
+        second = start + len(self.FIRST) + len(self.GAP)
+        self.spans = [
+            ({'name': 'first', 'network': 'a'}, start, start + len(self.FIRST)),
+            ({'name': 'second', 'network': 'b'}, second,
+             second + len(self.SECOND)),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.file_path) as route_file:
+            return route_file.read()
+
+    def test_unchanged(self):
+        """Should copy the file verbatim."""
+        self.builder.splice([span[0] for span in self.spans], self.spans)
+        self.assertEqual(self.read(), self.content)
+
+    def test_changed_and_added(self):
+        """Should only render changed and new entries."""
+        changed = {'name': 'second', 'network': 'c'}
+        added = {'name': 'third', 'network': 'd'}
+        self.builder.splice(
+            [self.spans[0][0], changed, added], self.spans)
+        self.assertEqual(
+            self.read(),
+            self.HEAD + self.FIRST + self.GAP + self.builder.render(changed) +
+            self.builder.render(added) + self.TAIL)
+
+    def test_removed(self):
+        """Should drop removed blocks with the text preceding them."""
+        self.builder.splice([self.spans[0][0]], self.spans)
+        self.assertEqual(self.read(), self.HEAD + self.FIRST + self.TAIL)
+
+    def test_no_entries(self):
+        """Should insert entries before the footer offset."""
+        added = {'name': 'third', 'network': 'd'}
+        footer = len(self.HEAD)
+        with open(self.file_path, 'w') as route_file:
+            route_file.write(self.HEAD + self.TAIL)
+        self.builder.splice([added], [], footer=footer)
+        self.assertEqual(
+            self.read(), self.HEAD + self.builder.render(added) + self.TAIL)
+
+    def test_copy_range(self):
+        """Should copy a byte range at the destination position."""
+        dest_path = os.path.join(self.dir, 'dest')
+        with open(self.file_path, 'rb') as src:
+            with open(dest_path, 'wb') as dst:
+                dst.write(b'>')
+                dst.flush()
+                copy_range(src.fileno(), dst.fileno(), 2, 4)
+        with open(dest_path, 'rb') as dst:
+            self.assertEqual(dst.read(), b'>keep')
+
+
+class TestCompile(unittest.TestCase):
+    """Test compiled templates against ``RouteFormatter.format``."""
+
+    ITEMS = [
+        {'name': 'default', 'ensure': 'present', 'gateway': '10.0.2.2',
+         'interface': '$appout', 'netmask': '0.0.0.0', 'network': 'default'},
+        {'name': "it's", 'options': None, 'ensure': 1},
+        RouteRecord(name='record', gateway='10.0.0.1'),
+        {},
+    ]
+
+    def assertSameOutput(self, template, formatter=None):
+        formatter = formatter or RouteFormatter()
+        render = formatter.compile(template)
+        for item in self.ITEMS:
+            self.assertEqual(render(item), formatter.format(template, **item))
+
+    def test_template(self):
+        self.assertSameOutput(TEMPLATE)
+
+    def test_spec_and_conversion(self):
+        self.assertSameOutput('{{literal}} {name!r:>20} {ensure:>4} {gateway!s}')
+
+    def test_fallback(self):
+        """Should fall back to ``format`` for complex fields."""
+        self.assertSameOutput('{ensure.real} {name}')
+
+    def test_subclass(self):
+        """Should honour overridden field hooks."""
+        class UpperFormatter(RouteFormatter):
+            def format_field(self, value, format_spec):
+                return super(UpperFormatter, self).format_field(
+                    value, format_spec).upper()
+        self.assertSameOutput(TEMPLATE, UpperFormatter())
+        self.assertEqual(UpperFormatter().compile('{name}')({'name': 'x'}),
+                         "'X'")
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """Test the same-directory atomic commit path."""
+
+    ROUTE = {'name': 'default', 'network': 'default'}
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        with open(self.file_path, 'w') as route_file:
+            route_file.write("class netroutes::routes {\n}\n")
+        os.chmod(self.file_path, 0o640)
+        self.builder = RouteBuilder(self.file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_rename_in_directory(self):
+        """Should rename a temporary file from the same directory."""
+        renamed = []
+
+        def move(src, dst):
+            self.assertEqual(os.path.dirname(src), self.dir)
+            self.assertEqual(os.stat(src).st_dev, os.stat(dst).st_dev)
+            renamed.append(src)
+            os.rename(src, dst)
+
+        self.builder.write([self.ROUTE], move=move)
+        self.assertEqual(len(renamed), 1)
+        self.assertFalse(os.path.exists(renamed[0]))
+
+    def test_no_copy(self):
+        """Should replace the file without copying its contents."""
+        inode = os.stat(self.file_path).st_ino
+        originals = shutil.copyfile, shutil.move
+
+        def fail(*args, **kwargs):
+            raise AssertionError('file copied')
+
+        builder = RouteBuilder(self.file_path, backup=Backup('none'))
+        shutil.copyfile = shutil.move = fail
+        try:
+            builder.write([self.ROUTE])
+        finally:
+            shutil.copyfile, shutil.move = originals
+        self.assertNotEqual(os.stat(self.file_path).st_ino, inode)
+        self.assertIn(self.builder.render(self.ROUTE),
+                      open(self.file_path).read())
+
+    def test_keep_mode(self):
+        """Should keep the permission bits of the original file."""
+        self.builder.write([self.ROUTE])
+        self.assertEqual(stat.S_IMODE(os.stat(self.file_path).st_mode), 0o640)
+        self.builder.splice([self.ROUTE], [], footer=26)
+        self.assertEqual(stat.S_IMODE(os.stat(self.file_path).st_mode), 0o640)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""Parse cache tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from route_ctl.cache import ParseCache
+from route_ctl.manager import RouteManager
+from route_ctl.parser import RouteParser
+
+ROUTE_FILE = os.path.join(os.path.dirname(__file__), 'files', 'routes')
+
+
+class TestParseCache(unittest.TestCase):
+    """Test cache storage and invalidation."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        shutil.copy(ROUTE_FILE, self.file_path)
+        self.cache = ParseCache(os.path.join(self.dir, 'cache'))
+        self.routes = list(RouteParser.read(self.file_path))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_miss_when_empty(self):
+        """Should miss when nothing was stored."""
+        self.assertEqual(self.cache.load(self.file_path), None)
+
+    def test_hit_after_store(self):
+        """Should return the stored entries."""
+        self.cache.store(self.file_path, self.routes)
+        self.assertEqual(self.cache.load(self.file_path), self.routes)
+
+    def test_miss_when_content_changes(self):
+        """Should miss when the content changes, even with same stat."""
+        self.cache.store(self.file_path, self.routes)
+        stat = os.stat(self.file_path)
+        with open(self.file_path, 'r+') as route_file:
+            route_file.write('X')
+        os.utime(self.file_path, (stat.st_atime, stat.st_mtime))
+        self.assertEqual(self.cache.load(self.file_path), None)
+
+    def test_miss_when_corrupt(self):
+        """Should miss when the cache file is unreadable."""
+        self.cache.store(self.file_path, self.routes)
+        with open(self.cache.path(self.file_path), 'w') as cache_file:
+            cache_file.write('{"routes": [')
+        self.assertEqual(self.cache.load(self.file_path), None)
+
+    def test_not_stored_when_file_changed(self):
+        """Should not store entries parsed from an older file version."""
+        stat = [self.file_path, 0, 0, 0]
+        self.cache.store(self.file_path, self.routes, stat=stat)
+        self.assertEqual(self.cache.load(self.file_path), None)
+
+
+class TestManagerCache(unittest.TestCase):
+    """Test the parse cache use in ``RouteManager``."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        shutil.copy(ROUTE_FILE, self.file_path)
+        self.cache = ParseCache(os.path.join(self.dir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_list_items_from_cache(self):
+        """Should not parse the file again on a cache hit."""
+        expected = RouteManager(self.file_path, cache=self.cache).list_items()
+        mgr = RouteManager(self.file_path, cache=self.cache)
+        mgr._RouteParser__open_file = None  # parsing would fail
+        self.assertEqual(mgr.list_items(), expected)
+
+    def test_write_refreshes_cache(self):
+        """Should refresh the cache when writing."""
+        mgr = RouteManager(self.file_path, cache=self.cache)
+        routes = mgr.list_items()['routes']
+        routes[0]['gateway'] = '10.0.3.3'
+        mgr.write(routes)
+        cached = self.cache.load(self.file_path)
+        self.assertEqual(cached, list(RouteParser.read(self.file_path)))
+        self.assertEqual(cached[0]['gateway'], '10.0.3.3')
@@ -118,3 +118,69 @@ class TestCLI(unittest.TestCase):
                     cli.parser.parse_args(shlex.split(command))
                 except SystemExit as err:
                     self.assertEqual(err.code, 0)
+
+    def test_rejects_negative_counts(self):
+        """CLI should reject negative offsets and limits."""
+        commands = [
+            'find --limit -1 default',
+            'find --offset -2 default',
+            'find --limit x default',
+        ]
+        for command in commands:
+            with suppress_output():
+                self.assertRaises(SystemExit,
+                                  cli.parser.parse_args,
+                                  shlex.split(command))
+        args = cli.parser.parse_args(
+            shlex.split('find --offset 0 --limit 2 default'))
+        self.assertEqual((args.offset, args.limit), (0, 2))
+
+    def test_rejects_invalid_sizes(self):
+        """CLI should reject negative backup counts, buffer sizes and jobs."""
+        create = ('create -e present -g 10.0.0.1 -i eth0 -m 255.255.255.255 '
+                  '-n 10.0.0.2 {0} 10.0.0.2/32')
+        commands = [
+            create.format('--keep-backups -1'),
+            create.format('--buffer-size 0'),
+            create.format('--buffer-size -4096'),
+            'list --jobs 0',
+            'list --jobs -2',
+        ]
+        for command in commands:
+            with suppress_output():
+                self.assertRaises(SystemExit,
+                                  cli.parser.parse_args,
+                                  shlex.split(command))
+        args = cli.parser.parse_args(shlex.split(
+            create.format('--keep-backups 0 --buffer-size 4096')))
+        self.assertEqual((args.keep_backups, args.buffer_size), (0, 4096))
+        args = cli.parser.parse_args(shlex.split('list --jobs 2'))
+        self.assertEqual(args.jobs, 2)
+
+    def test_find_value_or_selector(self):
+        """CLI should require exactly one of VALUE and the find selectors."""
+        commands = [
+            'find',
+            'find -k interface',
+            "find -Q 'interface=eth0' default",
+            'find --contains 10.0.0.1 default',
+            'find --within 10.0.0.0/8 default',
+        ]
+        for command in commands:
+            with suppress_output():
+                self.assertRaises(SystemExit, cli.parse_args,
+                                  shlex.split(command))
+        self.assertEqual(cli.parse_args(shlex.split('find default')).value,
+                         'default')
+        args = cli.parse_args(shlex.split("find -Q 'interface=eth0'"))
+        self.assertEqual((args.value, args.query), (None, 'interface=eth0'))
+        self.assertEqual(cli.parse_args(shlex.split('list')).fields, None)
+
+    def test_rejects_unknown_fields(self):
+        """CLI should reject unknown field names."""
+        with suppress_output():
+            self.assertRaises(SystemExit, cli.parser.parse_args,
+                              shlex.split('find --fields nope default'))
+        args = cli.parser.parse_args(
+            shlex.split('find --fields file,name default'))
+        self.assertEqual(args.fields, ('file', 'name'))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""Input decoder tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import io
+import json
+import os
+import unittest
+
+try:
+    from io import StringIO
+except ImportError:
+    # NOTE: PY2 compat
+    from cStringIO import StringIO
+
+from route_ctl.decoders import decode, iter_json_array
+
+from .test_parser import VALID_ROUTES
+
+JSON_FILE = os.path.join(os.path.dirname(__file__), 'files', 'routes.json')
+
+
+class TestIterJSONArray(unittest.TestCase):
+    """Test incremental decoding of the entry array."""
+
+    def test_any_chunk_size(self):
+        """Should decode the same entries regardless of chunk boundaries."""
+        with io.open(JSON_FILE) as json_file:
+            expected = json.load(json_file)['routes']
+        for chunk_size in (1, 2, 3, 7, 64, 1 << 16):
+            with io.open(JSON_FILE) as json_file:
+                self.assertEqual(
+                    list(iter_json_array(json_file, chunk_size=chunk_size)),
+                    expected)
+
+    def test_skips_other_keys(self):
+        """Should skip other values, including numbers split across chunks."""
+        document = json.dumps({'count': 123456789, 'other': [{'a': 1}]})
+        document = document[:-1] + ', "routes": [1, 22, 333]}'
+        self.assertEqual(
+            list(iter_json_array(StringIO(document), chunk_size=2)),
+            [1, 22, 333])
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(StringIO('{"routes": []}'))), [])
+
+    def test_missing_key(self):
+        for document in ('{}', '{"items": []}'):
+            self.assertRaises(KeyError, list,
+                              iter_json_array(StringIO(document)))
+
+    def test_malformed(self):
+        for document in ('[]', '{"routes": [{"name": 1}', '{"routes": [1 2]}'):
+            self.assertRaises(ValueError, list,
+                              iter_json_array(StringIO(document)))
+
+    def test_large_value(self):
+        """Should decode a value spanning many chunks in a few reads."""
+        reads = []
+
+        class CountingIO(StringIO):
+            def read(self, size=-1):
+                reads.append(size)
+                return StringIO.read(self, size)
+
+        routes = [{'name': 'x' * 100000}, 1]
+        document = json.dumps({'routes': routes})
+        self.assertEqual(
+            list(iter_json_array(CountingIO(document), chunk_size=16)),
+            routes)
+        self.assertLess(len(reads), 32)
+
+    def test_malformed_early(self):
+        """Should not read past malformed input."""
+        document = StringIO('{"routes": [{"name" 1}, ' + ' ' * 100000 + ']}')
+        self.assertRaises(ValueError, list,
+                          iter_json_array(document, chunk_size=64))
+        self.assertLess(document.tell(), 1024)
+
+    def test_ndjson(self):
+        lines = '\n'.join(json.dumps(route) for route in VALID_ROUTES)
+        self.assertEqual(list(decode(StringIO(lines + '\n\n'), 'ndjson')),
+                         VALID_ROUTES)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Output encoder tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import csv
+import json
+import unittest
+
+try:
+    from io import StringIO
+except ImportError:
+    # NOTE: PY2 compat
+    from cStringIO import StringIO
+
+from route_ctl.encoders import encode
+
+from .test_parser import VALID_ROUTES
+
+
+def encoded(items, output_format):
+    out = StringIO()
+    encode(items, out, output_format)
+    return out.getvalue()
+
+
+class TestEncoders(unittest.TestCase):
+    """Test streaming output encoders."""
+
+    def test_json_same_as_dumps(self):
+        """Should write the same document as ``json.dumps``."""
+        for count in range(len(VALID_ROUTES) + 1):
+            routes = VALID_ROUTES[:count]
+            self.assertEqual(
+                encoded(iter(routes), 'json'),
+                json.dumps({'routes': routes}, indent=2) + '\n')
+
+    def test_json_compact(self):
+        for count in range(len(VALID_ROUTES) + 1):
+            routes = VALID_ROUTES[:count]
+            text = encoded(iter(routes), 'json-compact')
+            self.assertFalse(' ' in text.replace('table 200', ''))
+            self.assertEqual(json.loads(text), {'routes': routes})
+
+    def test_ndjson(self):
+        lines = encoded(iter(VALID_ROUTES), 'ndjson').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], VALID_ROUTES)
+
+    def test_csv(self):
+        text = encoded(iter(VALID_ROUTES), 'csv')
+        rows = list(csv.DictReader(StringIO(text)))
+        self.assertEqual(rows[1]['interface'], '$appout')
+        self.assertEqual(rows[1]['options'], '')
+        self.assertEqual(rows[0]['options'], 'table 200')
+
+    def test_fields(self):
+        """Should only write the requested fields, in the requested order."""
+        fields = ('gateway', 'name')
+        for output_format in ('json', 'json-compact', 'ndjson'):
+            out = StringIO()
+            encode(iter(VALID_ROUTES), out, output_format, fields=fields)
+            self.assertTrue(out.getvalue().index('gateway') <
+                            out.getvalue().index('name'))
+            self.assertFalse('interface' in out.getvalue())
+        out = StringIO()
+        encode(iter(VALID_ROUTES), out, 'csv', fields=fields)
+        self.assertEqual(out.getvalue().splitlines()[0], 'gateway,name')
+
+    def test_streams_entries(self):
+        """Should write entries as soon as they are produced."""
+        out = StringIO()
+
+        def routes():
+            yield VALID_ROUTES[0]
+            self.assertTrue(VALID_ROUTES[0]['name'] in out.getvalue())
+            yield VALID_ROUTES[1]
+
+        for output_format in ('json', 'json-compact', 'ndjson', 'csv'):
+            encode(routes(), out, output_format)
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, encode, [], StringIO(), 'xml')
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""Fleet mode tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from io import StringIO
+except ImportError:
+    # NOTE: PY2 compat
+    from cStringIO import StringIO
+
+from route_ctl import actions, fleet
+
+ROUTE_FILE = os.path.join(os.path.dirname(__file__), 'files', 'routes')
+
+QUERY_FILE = fleet.query_file
+
+
+def recording_query_file(filename, *args, **kwargs):
+    """Query a file, leaving a marker file behind (in worker processes)."""
+    with open(filename + '.queried', 'w'):
+        pass
+    return QUERY_FILE(filename, *args, **kwargs)
+
+
+class TestFleet(unittest.TestCase):
+    """Test querying a directory of route files."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.files = []
+        for host in ('host-b', 'host-a', 'host-c'):
+            filename = os.path.join(self.dir, host + '.pp')
+            shutil.copy(ROUTE_FILE, filename)
+            self.files.append(filename)
+        with open(os.path.join(self.dir, 'notes.txt'), 'w') as notes:
+            notes.write('not a route file\n')
+        self.files.sort()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_is_fleet(self):
+        self.assertTrue(fleet.is_fleet(self.dir))
+        self.assertTrue(fleet.is_fleet(os.path.join(self.dir, '*.pp')))
+        self.assertFalse(fleet.is_fleet(ROUTE_FILE))
+
+    def test_expand(self):
+        """Should find sorted route files of a directory or glob."""
+        self.assertEqual(fleet.expand(self.dir), self.files)
+        self.assertEqual(
+            fleet.expand(os.path.join(self.dir, 'host-[ab].pp')),
+            self.files[:2])
+
+    def test_query(self):
+        """Should tag entries with their file in file order."""
+        for jobs in (1, 2):
+            items = list(fleet.query(
+                self.files, 'find', {'key': 'name', 'value': 'default'},
+                jobs=jobs))
+            self.assertEqual([item['file'] for item in items], self.files)
+            self.assertEqual(set(item['name'] for item in items),
+                             set(['default']))
+
+    def test_query_prefix(self):
+        items = list(fleet.query(self.files, 'find',
+                                 {'within': '172.16.0.0/12'}, jobs=2))
+        self.assertEqual(len(items), 3)
+
+    def queried(self):
+        return [filename for filename in self.files
+                if os.path.exists(filename + '.queried')]
+
+    def add_files(self, count=40):
+        for number in range(len(self.files), count):
+            filename = os.path.join(self.dir, 'host-{0:02d}.pp'.format(number))
+            shutil.copy(ROUTE_FILE, filename)
+            self.files.append(filename)
+        self.files.sort()
+
+    def test_close_early(self):
+        """Should stop querying files once the results are closed."""
+        self.add_files()
+        fleet.query_file = recording_query_file
+        try:
+            for jobs in (1, 2):
+                items = fleet.query(self.files, 'list', jobs=jobs,
+                                    chunksize=1, window=1)
+                self.assertEqual(next(items)['file'], self.files[0])
+                items.close()
+                self.assertTrue(0 < len(self.queried()) < len(self.files) // 2)
+                for filename in self.queried():
+                    os.unlink(filename + '.queried')
+        finally:
+            fleet.query_file = QUERY_FILE
+
+    def test_find_first(self):
+        """Should stop querying files after the first match."""
+        self.add_files(200)
+        fleet.query_file = recording_query_file
+        try:
+            out = StringIO()
+            actions.find_items(self.dir, 'name', 'default', False, True,
+                               limit=1, out_file=out, output_format='ndjson',
+                               jobs=2)
+        finally:
+            fleet.query_file = QUERY_FILE
+        self.assertEqual([json.loads(line)['file']
+                          for line in out.getvalue().splitlines()],
+                         [self.files[0]])
+        # NOTE: at most a window of batches of files is queried
+        self.assertTrue(len(self.queried()) < len(self.files))
+
+    def test_skip_broken(self):
+        """Should skip files that fail to parse."""
+        with open(self.files[1], 'w') as route_file:
+            route_file.write("class netroutes::routes {\n"
+                             "  network_route { 'broken':\n")
+        items = list(fleet.query(self.files, 'list', jobs=2))
+        self.assertEqual(sorted(set(item['file'] for item in items)),
+                         [self.files[0], self.files[2]])
+
+    def test_skip_undecodable(self):
+        """Should skip files that are not valid UTF-8."""
+        with open(self.files[1], 'wb') as route_file:
+            route_file.write(b"class netroutes::routes {\n"
+                             b"  network_route { '\xff\xfe':\n")
+        for jobs in (1, 2):
+            items = list(fleet.query(self.files, 'list', jobs=jobs))
+            self.assertEqual(sorted(set(item['file'] for item in items)),
+                             [self.files[0], self.files[2]])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""Route index tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import unittest
+
+from route_ctl.index import RouteIndex, net_key
+
+ROUTE = {
+    'name': '172.17.67.0/24',
+    'network': '172.17.67.0',
+    'netmask': '255.255.255.0',
+}
+
+
+class TestRouteIndex(unittest.TestCase):
+    """Test name and network/netmask indexes."""
+
+    def test_has_name(self):
+        """Should find entries with the same name."""
+        index = RouteIndex([ROUTE])
+        self.assertTrue(index.has_name({'name': '172.17.67.0/24'}))
+        self.assertFalse(index.has_name({'name': 'default'}))
+
+    def test_has_net(self):
+        """Should find entries with a normalized network/netmask pair."""
+        index = RouteIndex([ROUTE])
+        self.assertTrue(index.has_net({'network': ' 172.17.67.0',
+                                       'netmask': '255.255.255.0 '}))
+        self.assertFalse(index.has_net({'network': '172.17.68.0',
+                                        'netmask': '255.255.255.0'}))
+
+    def test_variables_are_case_sensitive(self):
+        """Should not lowercase variables."""
+        self.assertEqual(net_key({'network': 'FE80::', 'netmask': '$Mask'}),
+                         ('fe80::', '$Mask'))
+
+    def test_add_and_discard(self):
+        """Should keep the indexes in sync with added and removed entries."""
+        index = RouteIndex()
+        other = dict(ROUTE)
+        index.add(ROUTE)
+        index.add(other)
+        self.assertEqual(len(index), 2)
+        index.discard(ROUTE)
+        self.assertEqual(index.by_name(ROUTE['name']), [other])
+        index.discard(other)
+        self.assertFalse(index.has_name(ROUTE))
+        self.assertFalse(index.has_net(ROUTE))
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""Writer lock tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from route_ctl.backup import Backup
+from route_ctl.lock import (
+    FileLock,
+    LockError,
+    LockTimeoutError,
+    fcntl,
+    lock_exclusive,
+)
+from route_ctl.manager import RouteManager
+
+ROUTE_FILE = os.path.join(os.path.dirname(__file__), 'files', 'routes')
+
+WRITERS = 8
+
+ROUTES_PER_WRITER = 5
+
+
+def route(writer, number):
+    network = '10.{0}.{1}.0'.format(writer, number)
+    return {
+        'name': '{0}/24'.format(network),
+        'ensure': 'present',
+        'gateway': '10.0.2.2',
+        'interface': 'eth1',
+        'netmask': '255.255.255.0',
+        'network': network,
+    }
+
+
+def create_routes(filename, writer):
+    """Create routes one by one, each in its own read-modify-write cycle."""
+    mgr = RouteManager(filename, backup=Backup('none'), lock_timeout=60)
+    for number in range(ROUTES_PER_WRITER):
+        if number % 2:
+            mgr.create_item(route(writer, number))
+        else:
+            mgr.create_items([route(writer, number)])
+
+
+class LockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        shutil.copy(ROUTE_FILE, self.file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+class TestFileLock(LockTestCase):
+    """Test the file lock itself."""
+
+    def test_timeout(self):
+        """Should give up when another writer holds the lock."""
+        with FileLock(self.file_path):
+            lock = FileLock(self.file_path, timeout=0.1)
+            self.assertRaises(LockTimeoutError, lock.acquire)
+            self.assertFalse(lock.locked)
+        with FileLock(self.file_path, timeout=0.1) as lock:
+            self.assertTrue(lock.locked)
+
+    def test_reentrant(self):
+        """Should only unlock on the outermost release."""
+        lock = FileLock(self.file_path)
+        with lock:
+            with lock:
+                pass
+            self.assertTrue(lock.locked)
+            self.assertRaises(LockTimeoutError,
+                              FileLock(self.file_path, timeout=0).acquire)
+        self.assertFalse(lock.locked)
+        self.assertRaises(LockError, lock.release)
+
+    def test_manager(self):
+        """Should refuse to write while another writer holds the lock."""
+        mgr = RouteManager(self.file_path, lock_timeout=0.1)
+        with FileLock(self.file_path):
+            self.assertRaises(LockTimeoutError, mgr.create_item, route(1, 1))
+            self.assertRaises(LockTimeoutError, mgr.transaction)
+            # readers take no lock
+            self.assertEqual(len(list(mgr.parse())), 2)
+        with mgr.transaction() as tx:
+            tx.create(route(1, 1))
+            self.assertTrue(mgr.lock.locked)
+        self.assertFalse(mgr.lock.locked)
+
+    @unittest.skipIf(fcntl is None, 'file locking not supported')
+    def test_in_place_writer(self):
+        """Should make readers wait for writers modifying the file in place."""
+        names = []
+        for use_mmap in (False, True):
+            mgr = RouteManager(self.file_path, use_mmap=use_mmap)
+            reader = threading.Thread(
+                target=lambda: names.extend(item['name']
+                                            for item in mgr.parse()))
+            with open(self.file_path, 'r+b') as route_file:
+                lock_exclusive(route_file.fileno())
+                reader.start()
+                reader.join(0.2)
+                self.assertTrue(reader.is_alive())
+            reader.join()
+            self.assertEqual(len(names), 2)
+            del names[:]
+
+    @unittest.skipIf(fcntl is None, 'file locking not supported')
+    def test_in_place_writer_timeout(self):
+        """Should make readers give up waiting after the lock timeout."""
+        for use_mmap in (False, True):
+            mgr = RouteManager(self.file_path, use_mmap=use_mmap,
+                               lock_timeout=0.1)
+            with open(self.file_path, 'r+b') as route_file:
+                lock_exclusive(route_file.fileno())
+                self.assertRaises(LockTimeoutError, list, mgr.parse())
+                # NOTE: the writer waits for readers up to the timeout too
+                self.assertRaises(LockTimeoutError, mgr.append,
+                                  [route(1, 1)], 0)
+            self.assertEqual(len(list(mgr.parse())), 2)
+
+    def test_parallel_writers(self):
+        """Should not lose entries written by concurrent processes."""
+        processes = [
+            multiprocessing.Process(target=create_routes,
+                                    args=(self.file_path, writer))
+            for writer in range(WRITERS)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        names = [item['name'] for item in RouteManager(self.file_path).parse()]
+        self.assertEqual(len(names), 2 + WRITERS * ROUTES_PER_WRITER)
+        self.assertEqual(
+            set(names[2:]),
+            set(route(writer, number)['name']
+                for writer in range(WRITERS)
+                for number in range(ROUTES_PER_WRITER)))
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+"""Route manager tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from io import StringIO
+except ImportError:
+    # NOTE: PY2 compat
+    from cStringIO import StringIO
+
+from route_ctl.manager import (
+    EntryAlreadyExistsError,
+    EntryNotFoundError,
+    RouteManager,
+    paginate,
+    select,
+)
+from route_ctl.parser import RouteParserError
+
+ROUTE_FILE = os.path.join(os.path.dirname(__file__), 'files', 'routes')
+
+NEW_ROUTE = {
+    'name': '10.1.0.0/16',
+    'ensure': 'present',
+    'gateway': '10.0.2.2',
+    'interface': 'eth1',
+    'netmask': '255.255.0.0',
+    'network': '10.1.0.0',
+}
+
+
+class ManagerTestCase(unittest.TestCase):
+    """Run manager tests against a copy of the test route file."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        shutil.copy(ROUTE_FILE, self.file_path)
+        self.mgr = RouteManager(self.file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def names(self):
+        return [route['name'] for route in RouteManager(self.file_path).parse()]
+
+
+class TestCreate(ManagerTestCase):
+    """Test entry creation and conflict checks."""
+
+    def test_create_item(self):
+        """Should append a new entry."""
+        self.mgr.create_item(dict(NEW_ROUTE))
+        self.assertEqual(self.names(),
+                         ['172.17.67.0/24', 'default', '10.1.0.0/16'])
+
+    def test_create_existing_item(self):
+        """Should refuse to create an entry with the same name."""
+        route = dict(NEW_ROUTE, name='default')
+        self.assertRaises(EntryAlreadyExistsError, self.mgr.create_item, route)
+
+    def test_create_items_skips_conflicts(self):
+        """Should skip entries conflicting by name or network/netmask."""
+        self.mgr.create_items(items=[
+            dict(NEW_ROUTE),
+            dict(NEW_ROUTE, name='10.1.0.0/16 duplicate net'),
+            dict(NEW_ROUTE, name='10.1.0.0/16', network='10.2.0.0'),
+            dict(NEW_ROUTE, name='10.3.0.0/16', network='10.3.0.0'),
+        ])
+        self.assertEqual(
+            self.names(),
+            ['172.17.67.0/24', 'default', '10.1.0.0/16', '10.3.0.0/16'])
+
+
+class TestFindPrefix(ManagerTestCase):
+    """Test CIDR queries."""
+
+    def test_find_covering(self):
+        """Should list routes containing an address, longest prefix first."""
+        routes = self.mgr.find_covering('172.17.67.1')['routes']
+        self.assertEqual([route['name'] for route in routes],
+                         ['172.17.67.0/24', 'default'])
+
+    def test_find_within(self):
+        """Should list routes inside a network."""
+        routes = self.mgr.find_within('172.16.0.0/12')['routes']
+        self.assertEqual([route['name'] for route in routes],
+                         ['172.17.67.0/24'])
+
+
+class TestCompact(ManagerTestCase):
+    """Test compact records in the manager."""
+
+    def test_list_and_write_records(self):
+        """Should list records equal to dicts and write them back."""
+        expected = self.mgr.list_items()
+        mgr = RouteManager(self.file_path, compact=True)
+        self.assertEqual(mgr.list_items(), expected)
+        mgr.create_item(dict(NEW_ROUTE))
+        self.assertEqual(self.names(),
+                         ['172.17.67.0/24', 'default', '10.1.0.0/16'])
+
+
+class TestJSONInput(ManagerTestCase):
+    """Test streaming JSON input."""
+
+    def test_create_items_from_ndjson(self):
+        """Should insert entries from an NDJSON file."""
+        mgr = RouteManager(self.file_path, input_format='ndjson')
+        json_file = StringIO(json.dumps(NEW_ROUTE) + '\n')
+        mgr.create_items(json_file=json_file)
+        self.assertEqual(self.names(),
+                         ['172.17.67.0/24', 'default', '10.1.0.0/16'])
+
+    def test_replace_from_json(self):
+        """Should replace all entries with the streamed ones."""
+        json_file = StringIO(json.dumps({'routes': [NEW_ROUTE]}))
+        self.mgr.replace(json_file=json_file)
+        self.assertEqual(self.names(), ['10.1.0.0/16'])
+
+
+class TestAppend(ManagerTestCase):
+    """Test in-place creation."""
+
+    def test_create_item_in_place(self):
+        """Should append the entry without rewriting the other entries."""
+        with open(self.file_path) as route_file:
+            original = route_file.read()
+        RouteManager(self.file_path, append=True).create_item(dict(NEW_ROUTE))
+        with open(self.file_path) as route_file:
+            content = route_file.read()
+        footer = original.rindex('}  # end file')
+        self.assertTrue(content.startswith(original[:footer]))
+        self.assertTrue(content.endswith(original[footer:]))
+        self.assertEqual(self.names(),
+                         ['172.17.67.0/24', 'default', '10.1.0.0/16'])
+        # NOTE: no full backup copy is made, only the writer lock file
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['routes.pp', 'routes.pp.lock'])
+
+    def test_create_item_crlf(self):
+        """Should append the entry with the line ending of the file."""
+        with open(self.file_path, 'rb') as route_file:
+            original = route_file.read().replace(b'\n', b'\r\n')
+        with open(self.file_path, 'wb') as route_file:
+            route_file.write(original)
+        RouteManager(self.file_path, append=True).create_item(dict(NEW_ROUTE))
+        with open(self.file_path, 'rb') as route_file:
+            content = route_file.read()
+        self.assertEqual(content.count(b'\n'), content.count(b'\r\n'))
+        self.assertGreater(len(content), len(original))
+        self.assertEqual(self.names(),
+                         ['172.17.67.0/24', 'default', '10.1.0.0/16'])
+
+
+class TestSplice(ManagerTestCase):
+    """Test writes reusing unchanged entry blocks."""
+
+    def test_create_items_keeps_comments(self):
+        """Should keep the original text of existing entries."""
+        with open(self.file_path) as route_file:
+            original = route_file.read()
+        mgr = RouteManager(self.file_path, splice=True)
+        mgr.create_items([dict(NEW_ROUTE)])
+        with open(self.file_path) as route_file:
+            content = route_file.read()
+        footer = original.rindex('}  # end file')
+        self.assertEqual(
+            content,
+            original[:footer] + mgr.render(NEW_ROUTE) + original[footer:])
+
+    def test_replace(self):
+        """Should drop entries missing from the replacement."""
+        routes = list(self.mgr.parse())
+        RouteManager(self.file_path, splice=True).replace(
+            [routes[1], dict(NEW_ROUTE)])
+        self.assertEqual(self.names(), ['default', '10.1.0.0/16'])
+
+    def test_single_scan(self):
+        """Should reuse the entry block spans of the writer's parse."""
+        scans = []
+
+        class CountingManager(RouteManager):
+            def parse_spans(self, filename=None):
+                scans.append(filename)
+                return RouteManager.parse_spans(self, filename)
+
+        CountingManager(self.file_path, splice=True).create_items(
+            [dict(NEW_ROUTE)])
+        self.assertEqual(len(scans), 1)
+        with CountingManager(self.file_path, splice=True).transaction() as tx:
+            tx.delete('name', 'default')
+        self.assertEqual(len(scans), 2)
+        self.assertEqual(self.names(), ['172.17.67.0/24', '10.1.0.0/16'])
+
+    def test_stale_spans(self):
+        """Should scan the file again if it changed after the parse."""
+        mgr = RouteManager(self.file_path, splice=True)
+        items = mgr._parse_for_write()
+        RouteManager(self.file_path).create_item(dict(NEW_ROUTE))
+        mgr.write(items[1:])
+        self.assertEqual(self.names(), ['default'])
+
+
+class TestTransaction(ManagerTestCase):
+    """Test batching changes into a single write."""
+
+    def backups(self):
+        return [name for name in os.listdir(self.dir) if name.endswith('.backup')]
+
+    def test_single_write(self):
+        """Should apply all changes with one backup and write."""
+        with self.mgr.transaction() as tx:
+            tx.create(dict(NEW_ROUTE))
+            tx.update({'name': 'default', 'gateway': '10.0.3.3'})
+            self.assertEqual(tx.delete('name', '172.17.67.0/24'), 1)
+        self.assertEqual(self.names(), ['default', '10.1.0.0/16'])
+        routes = list(RouteManager(self.file_path).parse())
+        self.assertEqual(routes[0]['gateway'], '10.0.3.3')
+        self.assertEqual(routes[0]['interface'], '$appout')
+        self.assertEqual(len(self.backups()), 1)
+
+    def test_discard_on_error(self):
+        """Should not write anything if an operation fails."""
+        with open(self.file_path) as route_file:
+            original = route_file.read()
+        def run():
+            with self.mgr.transaction() as tx:
+                tx.create(dict(NEW_ROUTE))
+                tx.create(dict(NEW_ROUTE))
+        self.assertRaises(EntryAlreadyExistsError, run)
+        with open(self.file_path) as route_file:
+            self.assertEqual(route_file.read(), original)
+        self.assertEqual(self.backups(), [])
+
+    def test_nothing_changed(self):
+        """Should not write if nothing changed."""
+        with self.mgr.transaction() as tx:
+            tx.update({'name': 'default', 'ensure': 'present'})
+        self.assertEqual(self.backups(), [])
+
+    def test_update_missing(self):
+        """Should only create missing entries on request."""
+        self.assertRaises(EntryNotFoundError, self.mgr.update_item,
+                          dict(NEW_ROUTE))
+        self.mgr.update_item(dict(NEW_ROUTE), create=True)
+        self.assertEqual(self.names(),
+                         ['172.17.67.0/24', 'default', '10.1.0.0/16'])
+
+    def test_delete_items(self):
+        """Should delete matching entries."""
+        self.mgr.delete_items('interface', 'eth', exact_match=False)
+        self.assertEqual(self.names(), ['default'])
+
+
+class TestReplace(ManagerTestCase):
+    """Test replacement planning and no-op replacements."""
+
+    def backups(self):
+        return [name for name in os.listdir(self.dir) if name.endswith('.backup')]
+
+    def assert_no_op(self, mgr):
+        routes = list(mgr.parse()) + [dict(NEW_ROUTE)]
+        mgr.replace(routes)
+        for name in self.backups():
+            os.unlink(os.path.join(self.dir, name))
+        inode = os.stat(self.file_path).st_ino
+        mgr.replace(routes)
+        self.assertEqual(os.stat(self.file_path).st_ino, inode)
+        self.assertEqual(self.backups(), [])
+
+    def test_no_op(self):
+        """Should not write nor back up a file with the same content."""
+        self.assert_no_op(self.mgr)
+
+    def test_no_op_splice(self):
+        """Should not write nor back up a spliced file without changes."""
+        self.assert_no_op(RouteManager(self.file_path, splice=True))
+
+    def test_plan(self):
+        """Should list added, removed and changed entries."""
+        default = dict(next(self.mgr.iter_found('default', 'name')))
+        default['gateway'] = '10.0.3.3'
+        plan = self.mgr.plan([default, dict(NEW_ROUTE)])
+        self.assertEqual(plan['added'], [NEW_ROUTE])
+        self.assertEqual([item['name'] for item in plan['removed']],
+                         ['172.17.67.0/24'])
+        self.assertEqual(len(plan['changed']), 1)
+        self.assertEqual(plan['changed'][0]['old']['gateway'], '10.0.2.2')
+        self.assertEqual(plan['changed'][0]['new'], default)
+        self.assertEqual(self.backups(), [])
+
+    def test_plan_unchanged(self):
+        """Should find no differences in the current entries."""
+        plan = self.mgr.plan(list(self.mgr.parse()))
+        self.assertEqual(plan, {'added': [], 'removed': [], 'changed': []})
+
+    def test_plan_rendered_same(self):
+        """Should agree with replace on entries rendering the same."""
+        routes = [dict(route) for route in self.mgr.parse()]
+        routes[1]['options'] = None
+        routes[0]['extra'] = ''
+        self.mgr.replace([dict(route) for route in self.mgr.parse()])
+        self.assertEqual(self.mgr.plan(routes)['changed'], [])
+        inode = os.stat(self.file_path).st_ino
+        self.mgr.replace(list(routes))
+        self.assertEqual(os.stat(self.file_path).st_ino, inode)
+
+    def test_plan_duplicates(self):
+        """Should match entries sharing a name in order."""
+        routes = [dict(route) for route in self.mgr.parse()]
+        second = dict(routes[1], gateway='10.0.3.3')
+        plan = self.mgr.plan([routes[0], routes[1], second])
+        self.assertEqual(plan['added'], [second])
+        self.assertEqual(plan['changed'], [])
+        self.mgr.replace([routes[0], routes[1], second])
+        plan = self.mgr.plan(routes)
+        self.assertEqual([item['gateway'] for item in plan['removed']],
+                         ['10.0.3.3'])
+        self.assertEqual(plan['changed'], [])
+
+
+class TestLimit(ManagerTestCase):
+    """Test early-terminating searches."""
+
+    def setUp(self):
+        super(TestLimit, self).setUp()
+        with open(ROUTE_FILE) as route_file:
+            content = route_file.read()
+        # NOTE: the file is broken after the first entry block
+        head = content[:content.index("  network_route { 'default'")]
+        with open(self.file_path, 'w') as route_file:
+            route_file.write(head + "  network_route { 'broken':\n")
+
+    def test_first(self):
+        """Should stop parsing after the last entry needed."""
+        for use_mmap in (False, True):
+            mgr = RouteManager(self.file_path, use_mmap=use_mmap)
+            found = mgr.iter_found('eth0', 'interface', limit=1)
+            self.assertEqual([item['name'] for item in found],
+                             ['172.17.67.0/24'])
+            found = mgr.iter_query('interface=eth0', limit=1)
+            self.assertEqual(len(list(found)), 1)
+            self.assertRaises(RouteParserError, list,
+                              mgr.iter_found('eth0', 'interface',
+                                             ignore_case=True))
+
+    def test_offset(self):
+        """Should skip entries before the offset."""
+        shutil.copy(ROUTE_FILE, self.file_path)
+        found = self.mgr.iter_found('present', 'ensure', offset=1, limit=5)
+        self.assertEqual([item['name'] for item in found], ['default'])
+
+    def test_close(self):
+        """Should close the parser as soon as the limit is reached."""
+        items = self.mgr.parse()
+        found = paginate(select(lambda item: True, items), limit=1)
+        self.assertEqual(len(list(found)), 1)
+        self.assertIsNone(items.gi_frame)
+
+
+class TestFields(ManagerTestCase):
+    """Test parsing only the requested fields."""
+
+    def test_fields(self):
+        """Should keep the requested fields and the searched keys."""
+        self.assertEqual(list(self.mgr.iter_items(fields=['gateway'])),
+                         [{'gateway': '10.0.2.2'}, {'gateway': '10.0.2.2'}])
+        found = self.mgr.iter_found('eth0', 'interface', fields=['name'])
+        self.assertEqual(list(found),
+                         [{'name': '172.17.67.0/24', 'interface': 'eth0'}])
+        found = self.mgr.iter_query('ensure=present and network=default',
+                                    fields=['name'])
+        self.assertEqual(sorted(next(found)),
+                         ['ensure', 'name', 'network'])
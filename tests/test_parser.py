@@ -9,6 +9,11 @@ from __future__ import (
     with_statement,
 )
 
+import io
+import os
+import re
+import shutil
+import tempfile
 import unittest
 
 try:
@@ -18,9 +23,11 @@ except ImportError:
     from cStringIO import StringIO
 
 from route_ctl.parser import (
+    ROUTE_BLOCK_BODY,
     RouteParser,
     StartTokenNotFoundError,
     EndTokenNotFoundError,
+    cpu_count,
 )
 
 
@@ -212,3 +219,311 @@ class TestParseRoutes(unittest.TestCase):
         with StringIO(VALID_ROUTE_FILE) as route_file:
             parser = RouteParser(route_file)
             self.assertEqual(list(parser.parse()), VALID_ROUTES)
+
+
+class TestBlockLineClassifier(unittest.TestCase):
+    """Test the single-dispatch block line classifier."""
+
+    EDGE_CASE_FILE = '''\
+class netroutes::routes {
+  network_route { "edge":
+    ensure=>"present"
+    #gateway => '10.0.3.3',
+    interface =>   eth0 ,   # comment
+    netmask   => '255.255.255.0',  extra
+    options   => 'a => b',
+    }=> 'brace',
+    empty     =>
+  }
+}
+'''
+
+    def parse(self, text, **kwargs):
+        with StringIO(text) as route_file:
+            return list(RouteParser(route_file, **kwargs).parse())
+
+    def test_same_result_as_two_pattern_engine(self):
+        """Should produce exactly the same entries as the legacy engine."""
+        for text in (VALID_ROUTE_FILE, SINGLE_VALID_ROUTE_FILE,
+                     self.EDGE_CASE_FILE):
+            self.assertEqual(self.parse(text),
+                             self.parse(text, block_line=None))
+
+    def test_custom_body_pattern_selects_legacy_engine(self):
+        """Custom ``block_body`` patterns should still be honoured."""
+        body = re.compile(ROUTE_BLOCK_BODY.pattern.replace('=>', '->'),
+                          flags=ROUTE_BLOCK_BODY.flags)
+        text = VALID_ROUTE_FILE.replace('=>', '->')
+        self.assertEqual(self.parse(text, block_body=body), VALID_ROUTES)
+
+    def test_missing_close_brace(self):
+        """Should raise the correct exception when missing a close brace."""
+        with StringIO(MISSING_CLOSE_BRACE_FILE) as route_file:
+            parser = RouteParser(route_file)
+            self.assertRaises(EndTokenNotFoundError,
+                              parser._RouteParser__parse_one)
+
+
+class TestMappedParser(unittest.TestCase):
+    """Test the memory-mapped bytes parsing mode."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def parse(self, text, newline='\n', **kwargs):
+        with io.open(self.file_path, 'w', newline=newline) as route_file:
+            route_file.write(text)
+        return list(RouteParser(filename=self.file_path, **kwargs).parse())
+
+    def test_same_result_as_text_mode(self):
+        """Should produce exactly the same entries as the text mode."""
+        for text in (VALID_ROUTE_FILE,
+                     SINGLE_VALID_ROUTE_FILE,
+                     MISSING_HEADER_FILE,
+                     TestBlockLineClassifier.EDGE_CASE_FILE):
+            for newline in ('\n', '\r\n'):
+                expected = self.parse(text, newline)
+                self.assertEqual(self.parse(text, newline, use_mmap=True),
+                                 expected)
+                self.assertEqual(
+                    self.parse(text, newline, use_mmap=True, block_line=None),
+                    expected)
+
+    def test_parse_all_routes(self):
+        """Should parse all routes correctly."""
+        self.assertEqual(self.parse(VALID_ROUTE_FILE, use_mmap=True),
+                         VALID_ROUTES)
+
+    def test_empty_file(self):
+        """Should parse nothing from an empty file."""
+        self.assertEqual(self.parse('', use_mmap=True), [])
+
+    def test_missing_close_brace(self):
+        """Should raise the correct exception when missing a close brace."""
+        self.assertRaises(EndTokenNotFoundError, self.parse,
+                          MISSING_CLOSE_BRACE_FILE, use_mmap=True)
+
+
+class TestProjection(unittest.TestCase):
+    """Test parsing only some fields of entries."""
+
+    FIELDS = [
+        ('name', 'gateway'),
+        ('interface',),
+        ('ensure', 'empty', 'options'),
+        ('unknown',),
+    ]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def parse(self, text, newline='\n', fields=None, **kwargs):
+        with io.open(self.file_path, 'w', newline=newline) as route_file:
+            route_file.write(text)
+        parser = RouteParser(filename=self.file_path, **kwargs)
+        return list(parser.parse(fields=fields))
+
+    def test_same_result_as_full_parse(self):
+        """Should keep the same values of the projected fields."""
+        for text in (VALID_ROUTE_FILE,
+                     TestBlockLineClassifier.EDGE_CASE_FILE):
+            for newline in ('\n', '\r\n'):
+                routes = self.parse(text, newline)
+                for fields in self.FIELDS:
+                    expected = [
+                        dict((key, value) for key, value in route.items()
+                             if key in fields)
+                        for route in routes]
+                    for options in ({}, {'use_mmap': True},
+                                    {'block_line': None},
+                                    {'use_mmap': True, 'block_line': None},
+                                    {'jobs': 2}):
+                        self.assertEqual(
+                            self.parse(text, newline, fields, **options),
+                            expected)
+
+
+class TestParseContaining(unittest.TestCase):
+    """Test parsing only the entry blocks containing a literal."""
+
+    TRICKY_FILE = '''\
+# preamble mentioning eth0 and 10.0.2.2
+  network_route { 'before-header':
+    interface => 'eth0',
+  }
+class netroutes::routes {  # eth0
+  # a comment with network_route { 'x': and eth0
+  network_route { 'eth0-route':
+    ensure    => 'present',
+    interface => 'eth0',
+  }
+  # eth1 between blocks
+  network_route { 'second':
+    # interface => 'eth1',
+    interface => 'eth2',
+    gateway   => '10.0.2.2',
+  }
+}  # end file, eth2
+'''
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, text, newline='\n'):
+        with io.open(self.file_path, 'w', newline=newline) as route_file:
+            route_file.write(text)
+
+    def test_same_matches(self):
+        """Should find the same entries containing a value as a full parse."""
+        parser = RouteParser(filename=self.file_path)
+        for text in (VALID_ROUTE_FILE * 2, self.TRICKY_FILE,
+                     TestBlockLineClassifier.EDGE_CASE_FILE):
+            for newline in ('\n', '\r\n'):
+                self.write(text, newline)
+                routes = list(parser.parse())
+                for needle in ('eth0', 'eth1', 'eth2', '10.0.2.2', 'present',
+                               'default', 'route', 'network_route', 'b',
+                               "'", '}', 'missing'):
+                    expected = [route for route in routes if any(
+                        needle in value for value in route.values() if value)]
+                    found = [route for route in parser.parse_containing(needle)
+                             if route in expected]
+                    self.assertEqual(found, expected)
+
+    def test_skips_blocks(self):
+        """Should only parse the blocks containing the literal."""
+        self.write(self.TRICKY_FILE)
+        self.assertEqual(
+            [route['name'] for route in
+             RouteParser().parse_containing('eth2', self.file_path)],
+            ['second'])
+
+    def test_frequent(self):
+        """Should produce all entries when the literal is everywhere."""
+        self.write(VALID_ROUTE_FILE.replace('}  # end file', '') * 20 +
+                   '}\n')
+        parser = RouteParser(filename=self.file_path)
+        self.assertEqual(list(parser.parse_containing('present')),
+                         list(parser.parse()))
+
+
+class TestFindFooter(unittest.TestCase):
+    """Test the file footer lookup."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def find_footer(self, text, chunk_size=1 << 16):
+        with io.open(self.file_path, 'w') as route_file:
+            route_file.write(text)
+        return RouteParser().find_footer(self.file_path, chunk_size=chunk_size)
+
+    def test_footer_present(self):
+        """Should return the offset of the footer line."""
+        text = VALID_ROUTE_FILE + '\n# trailing comment\n'
+        for chunk_size in (1, 16, 1 << 16):
+            self.assertEqual(self.find_footer(text, chunk_size),
+                             text.rindex('}  # end file'))
+
+    def test_empty_class(self):
+        self.assertEqual(self.find_footer('class netroutes::routes {\n}\n'), 26)
+
+    def test_footer_missing(self):
+        """Should not mistake the last entry block close for the footer."""
+        self.assertEqual(self.find_footer(MISSING_HEADER_FILE), None)
+        self.assertEqual(
+            self.find_footer(SINGLE_VALID_ROUTE_FILE.rstrip('}\n') + '\n'),
+            None)
+
+
+class TestChunkedParser(unittest.TestCase):
+    """Test parsing byte ranges of a file in parallel."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, text):
+        with io.open(self.file_path, 'w', newline='') as route_file:
+            route_file.write(text)
+
+    def chunked(self, jobs=1, chunks=4):
+        parser = RouteParser()
+        return [item for chunk in parser.iter_chunks(
+            self.file_path, jobs=jobs, chunks=chunks, min_size=1)
+            for item in chunk]
+
+    def test_split(self):
+        """Should split at the header and entry block heads."""
+        self.write(VALID_ROUTE_FILE)
+        self.assertEqual(
+            RouteParser().split(self.file_path, chunks=4, min_size=1),
+            [(VALID_ROUTE_FILE.index('class'),
+              VALID_ROUTE_FILE.index("  network_route { 'default'"), True),
+             (VALID_ROUTE_FILE.index("  network_route { 'default'"),
+              len(VALID_ROUTE_FILE), False)])
+
+    def test_missing_header(self):
+        self.write(MISSING_HEADER_FILE)
+        self.assertEqual(RouteParser().split(self.file_path), [])
+        self.assertEqual(self.chunked(), [])
+
+    def test_same_entries(self):
+        """Should parse the same entries as the sequential parser."""
+        for text in (VALID_ROUTE_FILE * 3,
+                     VALID_ROUTE_FILE.replace('\n', '\r\n'),
+                     SINGLE_VALID_ROUTE_FILE):
+            self.write(text)
+            expected = list(RouteParser.read(self.file_path))
+            for jobs in (1, 2):
+                self.assertEqual(self.chunked(jobs), expected)
+
+    def test_unterminated_block(self):
+        """Should let an unterminated block swallow the next range."""
+        text = VALID_ROUTE_FILE.replace('  }  # comment\n', '')
+        self.write(text)
+        self.assertEqual(self.chunked(),
+                         list(RouteParser.read(self.file_path)))
+
+    def test_missing_close_brace(self):
+        self.write(MISSING_CLOSE_BRACE_FILE)
+        self.assertRaises(EndTokenNotFoundError, self.chunked)
+
+    def test_parse_jobs(self):
+        """Should parse in byte ranges with jobs."""
+        self.write(VALID_ROUTE_FILE)
+        self.assertEqual(list(RouteParser(jobs=2).parse(self.file_path)),
+                         VALID_ROUTES)
+
+    def test_close_early(self):
+        """Should stop parsing when closed early."""
+        self.write(VALID_ROUTE_FILE * 8)
+        chunks = RouteParser().iter_chunks(self.file_path, jobs=2, chunks=8,
+                                           min_size=1)
+        self.assertTrue(next(chunks))
+        chunks.close()
+
+    @unittest.skipUnless(hasattr(os, 'sched_getaffinity'),
+                         'CPU affinity not supported')
+    def test_cpu_count(self):
+        """Should only count the CPUs the process may run on."""
+        self.assertEqual(cpu_count(), len(os.sched_getaffinity(0)))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""Query language tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import unittest
+
+from route_ctl.index import FieldIndex
+from route_ctl.query import And, Compare, Query, QueryError
+
+ITEMS = [
+    {'name': 'default', 'ensure': 'present', 'gateway': '10.0.2.2',
+     'interface': 'eth0', 'network': 'default'},
+    {'name': '10.1.0.0/16', 'ensure': 'present', 'gateway': '10.0.2.2',
+     'interface': 'eth1', 'network': '10.1.0.0'},
+    {'name': '192.168.0.0/24', 'ensure': 'absent', 'gateway': '192.168.1.1',
+     'interface': 'eth1', 'network': '192.168.0.0', 'options': None},
+]
+
+
+def names(items):
+    return [item['name'] for item in items]
+
+
+class CountingIndex(FieldIndex):
+    """Field index recording the keys looked up."""
+
+    def __init__(self, items):
+        super(CountingIndex, self).__init__(items)
+        self.keys = []
+
+    def positions(self, key, value):
+        self.keys.append(key)
+        return super(CountingIndex, self).positions(key, value)
+
+
+class TestQuery(unittest.TestCase):
+    """Test query parsing, planning and evaluation."""
+
+    def find(self, expression, ignore_case=False):
+        return names(Query(expression, ignore_case).filter(ITEMS))
+
+    def test_operators(self):
+        self.assertEqual(self.find('interface=eth1'),
+                         ['10.1.0.0/16', '192.168.0.0/24'])
+        self.assertEqual(self.find('interface!=eth1'), ['default'])
+        self.assertEqual(self.find('gateway~^10\\.'),
+                         ['default', '10.1.0.0/16'])
+        self.assertEqual(self.find('gateway!~^10\\.'), ['192.168.0.0/24'])
+        self.assertEqual(self.find('options=""'), ['default', '10.1.0.0/16'])
+
+    def test_boolean(self):
+        self.assertEqual(
+            self.find('interface=eth1 and gateway~^10\\. and ensure=present'),
+            ['10.1.0.0/16'])
+        self.assertEqual(self.find('name=default or ensure=absent'),
+                         ['default', '192.168.0.0/24'])
+        self.assertEqual(
+            self.find('not (interface=eth0 OR ensure = "absent")'),
+            ['10.1.0.0/16'])
+
+    def test_quoted(self):
+        self.assertEqual(self.find("name='10.1.0.0/16'"), ['10.1.0.0/16'])
+        self.assertEqual(self.find('gateway~"^(10|192)\\."'),
+                         ['default', '10.1.0.0/16', '192.168.0.0/24'])
+
+    def test_ignore_case(self):
+        self.assertEqual(self.find('interface=ETH0', ignore_case=True),
+                         ['default'])
+        self.assertEqual(self.find('name~^DEF', ignore_case=True),
+                         ['default'])
+
+    def test_plan(self):
+        """Should check selective and cheap conditions first."""
+        query = Query('ensure=present and interface~eth and name=default')
+        self.assertIsInstance(query.tree, And)
+        self.assertEqual([term.key for term in query.tree.terms],
+                         ['name', 'interface', 'ensure'])
+        self.assertIsInstance(Query('name=default').tree, Compare)
+
+    def test_index(self):
+        """Should look up equality conditions in the index."""
+        index = CountingIndex(ITEMS)
+        query = Query('interface=eth1 and gateway~^10\\.')
+        self.assertEqual(names(query.select(ITEMS, index)), ['10.1.0.0/16'])
+        self.assertEqual(index.keys, ['interface'])
+        query = Query('name=default or name="10.1.0.0/16"')
+        self.assertEqual(names(query.select(ITEMS, index)),
+                         ['default', '10.1.0.0/16'])
+        query = Query('name=default or interface~1')
+        self.assertEqual(names(query.select(ITEMS, index)),
+                         ['default', '10.1.0.0/16', '192.168.0.0/24'])
+
+    def test_literal(self):
+        """Should pick the longest value every match contains."""
+        self.assertEqual(Query('interface=eth1 and gateway=10.0.2.2').literal,
+                         '10.0.2.2')
+        self.assertEqual(Query('name~x and interface=eth1').literal, 'eth1')
+        self.assertIsNone(Query('name=a or name=b').literal)
+        self.assertIsNone(Query('not name=a').literal)
+        self.assertIsNone(Query('name=a', ignore_case=True).literal)
+        self.assertIsNone(Query('name=""').literal)
+
+    def test_errors(self):
+        for expression in ('', 'name', 'name=', 'name=a and', '(name=a',
+                           'name=a)', 'and=a', 'name=a b=c', 'name~(',
+                           'name=a !'):
+            self.assertRaises(QueryError, Query, expression)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Compact route record tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import json
+import unittest
+
+try:
+    from io import StringIO
+except ImportError:
+    # NOTE: PY2 compat
+    from cStringIO import StringIO
+
+from route_ctl.parser import RouteParser
+from route_ctl.record import RouteRecord
+
+from .test_parser import VALID_ROUTE_FILE, VALID_ROUTES
+
+
+class TestRouteRecord(unittest.TestCase):
+    """Test the mapping interface of ``RouteRecord``."""
+
+    def test_mapping_access(self):
+        record = RouteRecord(name='default', gateway='10.0.2.2', metric='10')
+        self.assertEqual(record['name'], 'default')
+        self.assertEqual(record.get('options'), None)
+        self.assertEqual(record.get('metric'), '10')
+        self.assertRaises(KeyError, lambda: record['options'])
+        self.assertEqual(list(record), ['name', 'gateway', 'metric'])
+        self.assertEqual(len(record), 3)
+
+    def test_equals_dict(self):
+        self.assertEqual(RouteRecord(VALID_ROUTES[0]), VALID_ROUTES[0])
+        self.assertEqual(VALID_ROUTES[1], RouteRecord(VALID_ROUTES[1]))
+
+    def test_delete(self):
+        record = RouteRecord(VALID_ROUTES[0])
+        del record['options']
+        self.assertFalse('options' in record)
+        self.assertRaises(KeyError, record.__delitem__, 'options')
+
+    def test_has_no_instance_dict(self):
+        self.assertFalse(hasattr(RouteRecord(), '__dict__'))
+
+    def test_json(self):
+        record = RouteRecord(VALID_ROUTES[1])
+        self.assertEqual(json.loads(json.dumps(record, default=dict)),
+                         VALID_ROUTES[1])
+
+
+class TestCompactParsing(unittest.TestCase):
+    """Test parsing into interned compact records."""
+
+    def parse(self, **kwargs):
+        with StringIO(VALID_ROUTE_FILE) as route_file:
+            return list(RouteParser(route_file, **kwargs).parse())
+
+    def test_same_entries(self):
+        routes = self.parse(record=RouteRecord, intern_values=True)
+        self.assertTrue(all(isinstance(r, RouteRecord) for r in routes))
+        self.assertEqual(routes, VALID_ROUTES)
+
+    def test_interned_values(self):
+        first, second = self.parse(intern_values=True)
+        self.assertTrue(first['gateway'] is second['gateway'])
+        self.assertTrue(first['ensure'] is second['ensure'])
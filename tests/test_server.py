@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""Resident daemon tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+try:
+    from io import StringIO
+except ImportError:
+    # NOTE: PY2 compat
+    from cStringIO import StringIO
+
+from route_ctl import actions
+from route_ctl.client import RouteClient, RouteClientError
+from route_ctl.manager import RouteError, RouteManager
+from route_ctl.server import (
+    INTERNAL_ERROR,
+    INVALID_PARAMS,
+    METHOD_NOT_FOUND,
+    RouteServer,
+)
+
+ROUTE_FILE = os.path.join(os.path.dirname(__file__), 'files', 'routes')
+
+NEW_ROUTE = {
+    'name': '10.1.0.0/16',
+    'ensure': 'present',
+    'gateway': '10.0.2.2',
+    'interface': 'eth1',
+    'netmask': '255.255.0.0',
+    'network': '10.1.0.0',
+}
+
+
+class TestServer(unittest.TestCase):
+    """Test the daemon and its client over a Unix socket."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+        self.socket_path = os.path.join(self.dir, 'route-ctl.sock')
+        shutil.copy(ROUTE_FILE, self.file_path)
+        self.server = RouteServer(self.socket_path,
+                                  [RouteManager(self.file_path)])
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.start()
+        self.client = RouteClient(self.socket_path, timeout=5).connect()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.dir)
+
+    def names(self, result):
+        return [route['name'] for route in result['routes']]
+
+    def test_list(self):
+        self.assertEqual(self.names(self.client.call('list')),
+                         ['172.17.67.0/24', 'default'])
+
+    def test_find(self):
+        result = self.client.call('find', value='default')
+        self.assertEqual(self.names(result), ['default'])
+        result = self.client.call('find', key='interface', value='eth',
+                                  exact_match=False)
+        self.assertEqual(self.names(result), ['172.17.67.0/24'])
+        result = self.client.call('find', contains='172.17.67.1')
+        self.assertEqual(self.names(result), ['172.17.67.0/24', 'default'])
+        result = self.client.call(
+            'find', query='ensure=present and not interface~^eth')
+        self.assertEqual(self.names(result), ['default'])
+        with self.assertRaises(RouteClientError) as context:
+            self.client.call('find', query='name=')
+        self.assertEqual(context.exception.data, {'type': 'QueryError'})
+        for params in ({'offset': -2}, {'limit': -1}, {'limit': '1'}):
+            with self.assertRaises(RouteClientError) as context:
+                self.client.call('find', value='default', **params)
+            self.assertEqual(context.exception.code, INVALID_PARAMS)
+
+    def test_create(self):
+        """Should write the entry and serve it."""
+        self.client.call('create', item=NEW_ROUTE, file=self.file_path)
+        self.assertEqual(self.names(self.client.call('list')),
+                         ['172.17.67.0/24', 'default', '10.1.0.0/16'])
+        with self.assertRaises(RouteClientError) as context:
+            self.client.call('create', item=NEW_ROUTE)
+        self.assertEqual(context.exception.data,
+                         {'type': 'EntryAlreadyExistsError'})
+
+    def test_create_invalid(self):
+        """Should reject entries without a name and leave the file alone."""
+        with open(self.file_path) as route_file:
+            before = route_file.read()
+        for item in ({'nonsense': 1}, {'name': ''}, 'default', None):
+            with self.assertRaises(RouteClientError) as context:
+                self.client.call('create', item=item)
+            self.assertEqual(context.exception.code, INVALID_PARAMS)
+        with open(self.file_path) as route_file:
+            self.assertEqual(route_file.read(), before)
+
+    def test_internal_error(self):
+        """Should respond to requests failing unexpectedly."""
+        with self.assertRaises(RouteClientError) as context:
+            self.client.call('find', value='(', exact_match=False,
+                             ignore_case=True)
+        self.assertEqual(context.exception.code, INTERNAL_ERROR)
+        self.assertEqual(self.names(self.client.call('find', value='default')),
+                         ['default'])
+
+    def test_reload(self):
+        """Should reload the file once it is replaced."""
+        self.client.call('list')
+        RouteManager(self.file_path).replace([NEW_ROUTE])
+        self.assertEqual(self.names(self.client.call('list')),
+                         ['10.1.0.0/16'])
+
+    def test_unknown_method(self):
+        with self.assertRaises(RouteClientError) as context:
+            self.client.call('drop')
+        self.assertEqual(context.exception.code, METHOD_NOT_FOUND)
+
+    def test_forward(self):
+        """Should forward CLI actions to the daemon."""
+        out = StringIO()
+        actions.find_items(None, 'name', 'default', False, True,
+                           out_file=out, output_format='ndjson',
+                           socket_path=self.socket_path)
+        self.assertEqual([json.loads(line)['name']
+                          for line in out.getvalue().splitlines()],
+                         ['default'])
+
+    def test_forward_write_options(self):
+        """Should write locally with write options the daemon would drop."""
+        route = dict(NEW_ROUTE)
+        route.update(route_file=self.file_path, socket_path=self.socket_path,
+                     backup='none')
+        actions.create_or_update_item(**route)
+        self.assertEqual([name for name in os.listdir(self.dir)
+                          if name.endswith('.backup')], [])
+        route = dict(NEW_ROUTE, name='10.2.0.0/16', network='10.2.0.0')
+        route.update(route_file=self.file_path, socket_path=self.socket_path)
+        actions.create_or_update_item(**route)
+        self.assertEqual(len([name for name in os.listdir(self.dir)
+                              if name.endswith('.backup')]), 1)
+
+    def test_relative_path(self):
+        """Should send an absolute route file path to the daemon."""
+        cwd = os.getcwd()
+        os.chdir(self.dir)
+        try:
+            served, result = actions._remote(self.socket_path, 'routes.pp',
+                                             'find', value='default')
+        finally:
+            os.chdir(cwd)
+        self.assertTrue(served)
+        self.assertEqual(self.names(result), ['default'])
+
+    def test_not_served(self):
+        """Should run locally if the daemon does not serve the file."""
+        self.assertEqual(
+            actions._remote(self.socket_path, ROUTE_FILE, 'list'),
+            (False, None))
+        out = StringIO()
+        actions.list_items(ROUTE_FILE, out_file=out, output_format='ndjson',
+                           socket_path=self.socket_path)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_already_running(self):
+        """Should refuse to take over the socket of a running daemon."""
+        self.assertRaises(RouteError, RouteServer, self.socket_path,
+                          [RouteManager(self.file_path)])
+
+
+class TestStaleSocket(unittest.TestCase):
+    """Test starting over a socket left behind."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.dir, 'route-ctl.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_stale_socket(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.socket_path)
+        sock.close()
+        server = RouteServer(self.socket_path, [RouteManager(ROUTE_FILE)])
+        server.server_close()
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_not_a_socket(self):
+        """Should refuse to replace a file that is not a socket."""
+        with open(self.socket_path, 'w') as not_socket:
+            not_socket.write('keep me\n')
+        self.assertRaises(RouteError, RouteServer, self.socket_path,
+                          [RouteManager(ROUTE_FILE)])
+        with open(self.socket_path) as not_socket:
+            self.assertEqual(not_socket.read(), 'keep me\n')
+
+    def test_no_daemon(self):
+        """Should run locally if the daemon is not running."""
+        out = StringIO()
+        actions.list_items(ROUTE_FILE, out_file=out, output_format='ndjson',
+                           socket_path=self.socket_path)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
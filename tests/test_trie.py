@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""Prefix trie tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import unittest
+
+from route_ctl.trie import InvalidPrefixError, RouteTrie, parse_prefix
+
+
+def route(name, network, netmask):
+    return {'name': name, 'network': network, 'netmask': netmask}
+
+
+ROUTES = [
+    route('default', 'default', '0.0.0.0'),
+    route('10/8', '10.0.0.0', '255.0.0.0'),
+    route('10.20/16', '10.20.0.0', '255.255.0.0'),
+    route('10.20.30/24', '10.20.30.0', '24'),
+    route('10.21/16', '10.21.0.0', '255.255.0.0'),
+    route('192.168/16', '192.168.0.0', '255.255.0.0'),
+    route('var', '$network', '255.255.0.0'),
+    route('v6', '2001:DB8::', '32'),
+]
+
+
+def names(routes):
+    return [item['name'] for item in routes]
+
+
+class TestParsePrefix(unittest.TestCase):
+    """Test network prefix parsing."""
+
+    def test_dotted_netmask(self):
+        self.assertEqual(parse_prefix('10.0.0.0', '255.255.240.0'),
+                         (32, 10 << 24, 20))
+
+    def test_cidr(self):
+        self.assertEqual(parse_prefix('10.0.0.0/8'), (32, 10 << 24, 8))
+
+    def test_default(self):
+        self.assertEqual(parse_prefix('default', '0.0.0.0'), (32, 0, 0))
+
+    def test_invalid(self):
+        self.assertRaises(InvalidPrefixError, parse_prefix, '$net', '8')
+        self.assertRaises(InvalidPrefixError,
+                          parse_prefix, '10.0.0.0', '255.0.255.0')
+
+
+class TestRouteTrie(unittest.TestCase):
+    """Test covering and within queries."""
+
+    def setUp(self):
+        self.trie = RouteTrie(ROUTES)
+
+    def test_skips_variables(self):
+        self.assertEqual(self.trie.skipped, 1)
+
+    def test_covering_longest_prefix_first(self):
+        self.assertEqual(names(self.trie.covering('10.20.30.40')),
+                         ['10.20.30/24', '10.20/16', '10/8', 'default'])
+        self.assertEqual(names(self.trie.covering('172.16.0.1')), ['default'])
+
+    def test_within(self):
+        self.assertEqual(names(self.trie.within('10.0.0.0/8')),
+                         ['10/8', '10.20/16', '10.21/16', '10.20.30/24'])
+        self.assertEqual(names(self.trie.within('10.20.31.0/24')), [])
+
+    def test_ipv6(self):
+        self.assertEqual(names(self.trie.covering('2001:db8::1')), ['v6'])
+        self.assertEqual(names(self.trie.within('2001::/16')), ['v6'])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""Bulk writer tests."""
+
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+    with_statement,
+)
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from route_ctl.builder import FOOTER, HEADER, RouteBuilder
+from route_ctl.writer import DURABILITY, BulkWriter
+
+
+class TestBulkWriter(unittest.TestCase):
+    """Test buffering and durability policies."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'routes.pp')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open(self):
+        return os.open(self.file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+
+    def read(self):
+        with io.open(self.file_path, encoding='utf-8') as route_file:
+            return route_file.read()
+
+    def test_buffering(self):
+        """Should write full buffers with single calls."""
+        with BulkWriter(self.open(), buffer_size=10) as writer:
+            for _ in range(5):
+                writer.write('0123é')
+            self.assertEqual(writer.writes, 2)
+        self.assertEqual(writer.writes, 3)
+        self.assertEqual(writer.bytes, 30)
+        self.assertEqual(self.read(), '0123é' * 5)
+
+    def test_durability(self):
+        for durability in DURABILITY:
+            with BulkWriter(self.open(), self.file_path,
+                            durability=durability) as writer:
+                writer.write(durability)
+            self.assertEqual(self.read(), durability)
+            self.assertEqual(writer.stats()['bytes'], len(durability))
+
+    def test_unknown_durability(self):
+        self.assertRaises(ValueError, BulkWriter, None, durability='maybe')
+
+    def test_builder_write(self):
+        """Should write the rendered file and report statistics."""
+        route = {'name': 'default', 'network': 'default'}
+        with open(self.file_path, 'w') as route_file:
+            route_file.write('')
+        for atomic in (True, False):
+            builder = RouteBuilder(self.file_path, buffer_size=64,
+                                   durability='fsync-file-and-dir')
+            stats = builder.write([route] * 3, atomic=atomic)
+            expected = HEADER + builder.render(route) * 3 + FOOTER
+            self.assertEqual(self.read(), expected)
+            self.assertEqual(stats['bytes'], len(expected.encode('utf-8')))
+            self.assertTrue(stats['writes'] > 1)